@@ -0,0 +1,43 @@
+"""Async workshop entrypoint (step 04 served over ASGI).
+
+Run it with an ASGI server instead of gunicorn's sync workers:
+`uvicorn app_step_04_async:app --workers 2`
+
+The implementation lives in the `src/` package.
+"""
+
+from __future__ import annotations
+
+import importlib
+import sys
+from pathlib import Path
+from typing import TYPE_CHECKING, cast
+
+SRC_DIR = Path(__file__).resolve().parent / "src"
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
+
+if TYPE_CHECKING:
+    from quart import Quart
+else:
+    Quart = object  # type: ignore[assignment]
+
+try:
+    _module = importlib.import_module(
+        "scientific_programming_workshop.apps.step_04_async"
+    )
+except ModuleNotFoundError as e:
+    raise ModuleNotFoundError(
+        "A required dependency is missing while starting the app.\n\n"
+        f"Missing module: {e.name or '<unknown>'}\n"
+        f"Python executable: {sys.executable}\n\n"
+        "Fix:\n"
+        "- Activate your virtualenv/conda env\n"
+        "- Install dependencies: pip install -r requirements.txt\n"
+    ) from e
+
+app = cast(Quart, getattr(_module, "app"))
+
+
+if __name__ == "__main__":
+    app.run(debug=True)
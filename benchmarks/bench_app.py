@@ -0,0 +1,281 @@
+"""Load-test the step 04 app against the local fake LLM server.
+
+Starts `create_app()` from `apps/step_04.py` on a threaded local HTTP
+server, points it at `FakeLLMServer` (canned code answers, configurable
+latency) and drives `POST /` at fixed concurrency levels. For each level
+it reports requests/sec and p50/p95/p99 latency, plus per-stage p50/p95
+(load, prompt, llm, exec, render) from the app's `Server-Timing` header.
+
+The response cache, the execution result cache and single-flight
+coalescing are disabled unless `--cache` is given, so every request waits
+on the stub model and the "exec" stage really runs the code.
+`--routed 0.5` makes half of the questions ones the intent router answers
+locally (see `intent_router`).
+
+Run from the repository root:
+
+    python benchmarks/bench_app.py --output bench.json
+    python benchmarks/bench_app.py --baseline bench.json  # exit 1 on regression
+"""
+
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+from urllib.parse import urlencode
+
+SRC_DIR = Path(__file__).resolve().parents[1] / "src"
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
+
+from werkzeug.serving import make_server  # noqa: E402
+
+from scientific_programming_workshop.fake_llm import FakeLLMServer  # noqa: E402
+from scientific_programming_workshop.timing import (  # noqa: E402
+    STAGES,
+    parse_server_timing,
+)
+
+ANSWERS = (
+    "```python\n"
+    "print(data.groupby('fuel_type', observed=True)['price'].mean().round(2))\n"
+    "```",
+    "```python\nprint(data['make'].value_counts().head(10))\n```",
+    "```python\nprint(data[['price', 'mileage', 'hp']].describe())\n```",
+    "```python\n"
+    "data.groupby('init_regist_year')['price'].median().plot(kind='bar')\n"
+    "plt.title('Median price by year')\n"
+    "```",
+)
+
+
+ROUTED_PROMPTS = (
+    "What is the average price by fuel type?",
+    "How many cars are there per make?",
+    "top 5 makes by price",
+)
+
+
+def _answer(prompt: str) -> str:
+    number = int(prompt.rsplit(" ", 1)[-1]) if prompt[-1:].isdigit() else 0
+    return ANSWERS[number % len(ANSWERS)]
+
+
+def _percentiles(samples: list[float]) -> dict[str, float]:
+    if len(samples) < 2:
+        value = samples[0] if samples else 0.0
+        return {"p50": value, "p95": value, "p99": value, "mean": value}
+    cuts = statistics.quantiles(samples, n=100)
+    return {
+        "p50": round(cuts[49], 3),
+        "p95": round(cuts[94], 3),
+        "p99": round(cuts[98], 3),
+        "mean": round(statistics.fmean(samples), 3),
+    }
+
+
+def _prompt(number: int, routed: float) -> str:
+    if number % 100 < routed * 100:
+        return ROUTED_PROMPTS[number % len(ROUTED_PROMPTS)]
+    return f"benchmark question {number}"
+
+
+def _post(
+    host: str, port: int, number: int, routed: float = 0.0
+) -> tuple[float, int, dict[str, float]]:
+    body = urlencode({"prompt": _prompt(number, routed)})
+    connection = http.client.HTTPConnection(host, port, timeout=60)
+    start = time.perf_counter()
+    try:
+        connection.request(
+            "POST",
+            "/",
+            body=body,
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+        )
+        response = connection.getresponse()
+        response.read()
+        elapsed = (time.perf_counter() - start) * 1000
+        stages = parse_server_timing(response.getheader("Server-Timing") or "")
+        return elapsed, response.status, stages
+    finally:
+        connection.close()
+
+
+def run_level(
+    host: str, port: int, concurrency: int, requests: int, routed: float = 0.0
+) -> dict[str, Any]:
+    """Send `requests` POSTs with `concurrency` clients; return the stats."""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(
+            pool.map(lambda n: _post(host, port, n, routed), range(requests))
+        )
+    duration = time.perf_counter() - start
+
+    latencies = [elapsed for elapsed, status, _ in results if status == 200]
+    stages = {
+        stage: _percentiles(
+            [timings[stage] for _, _, timings in results if stage in timings]
+        )
+        for stage in STAGES
+    }
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": sum(status != 200 for _, status, _ in results),
+        "rps": round(requests / duration, 2),
+        "latency_ms": _percentiles(latencies),
+        "stages_ms": {
+            stage: {"p50": stats["p50"], "p95": stats["p95"]}
+            for stage, stats in stages.items()
+        },
+    }
+
+
+def compare(
+    results: dict[str, Any], baseline: dict[str, Any], tolerance: float
+) -> list[str]:
+    """Return regressions in p95 latency or throughput beyond `tolerance`."""
+    previous = {level["concurrency"]: level for level in baseline["levels"]}
+    regressions = []
+    for level in results["levels"]:
+        old = previous.get(level["concurrency"])
+        if old is None:
+            continue
+        p95, old_p95 = level["latency_ms"]["p95"], old["latency_ms"]["p95"]
+        if p95 > old_p95 * (1 + tolerance):
+            regressions.append(
+                f"c={level['concurrency']}: p95 {old_p95:.1f} -> {p95:.1f} ms"
+            )
+        if level["rps"] < old["rps"] * (1 - tolerance):
+            regressions.append(
+                f"c={level['concurrency']}: rps {old['rps']:.1f} -> {level['rps']:.1f}"
+            )
+        if level["errors"] > old["errors"]:
+            regressions.append(
+                f"c={level['concurrency']}: errors {old['errors']} -> {level['errors']}"
+            )
+    return regressions
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=SRC_DIR.parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _print_level(level: dict[str, Any]) -> None:
+    latency = level["latency_ms"]
+    stages = "  ".join(
+        f"{stage} {stats['p50']:.1f}" for stage, stats in level["stages_ms"].items()
+    )
+    print(
+        f"c={level['concurrency']:<3} {level['rps']:8.1f} req/s  "
+        f"p50 {latency['p50']:7.1f}  p95 {latency['p95']:7.1f}  "
+        f"p99 {latency['p99']:7.1f} ms  errors {level['errors']}"
+    )
+    print(f"      stage p50 ms: {stages}")
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run the benchmark; return 1 if a regression against the baseline is found."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--concurrency", type=int, nargs="+", default=[1, 4, 16], metavar="N"
+    )
+    parser.add_argument("--requests", type=int, default=200, help="per level")
+    parser.add_argument(
+        "--llm-latency", type=float, default=0.05, help="stub seconds/reply"
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="keep the LLM and exec caches and single-flight coalescing on",
+    )
+    parser.add_argument(
+        "--routed", type=float, default=0.0, help="share of routable questions"
+    )
+    parser.add_argument("--output", type=Path, help="write results as JSON")
+    parser.add_argument("--baseline", type=Path, help="JSON from an earlier run")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    if not args.cache:
+        os.environ["LLM_CACHE_SIZE"] = "0"
+        os.environ.pop("LLM_CACHE_PATH", None)
+        os.environ["EXEC_CACHE_BYTES"] = "0"
+        os.environ["SINGLE_FLIGHT"] = "off"
+    print(
+        "LLM cache, exec cache and single flight: "
+        + ("on (--cache)" if args.cache else "off; every request runs its code")
+    )
+
+    with FakeLLMServer(answer=_answer, latency=args.llm_latency) as llm:
+        os.environ["OPENAI_API_KEY"] = "bench"
+        os.environ["OPENAI_BASE_URL"] = llm.base_url
+
+        from scientific_programming_workshop.apps.step_04 import (  # noqa: PLC0415
+            create_app,
+        )
+
+        server = make_server("127.0.0.1", 0, create_app(), threaded=True)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        host, port = "127.0.0.1", server.server_port
+        try:
+            _post(host, port, 0)  # warm up: dataset load, imports, first plot
+            levels = []
+            for concurrency in args.concurrency:
+                level = run_level(host, port, concurrency, args.requests, args.routed)
+                _print_level(level)
+                levels.append(level)
+        finally:
+            server.shutdown()
+
+    results = {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "llm_latency_s": args.llm_latency,
+            "cache": args.cache,
+            "routed": args.routed,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "levels": levels,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
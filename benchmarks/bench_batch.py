@@ -0,0 +1,67 @@
+"""Measure batch throughput against a slow model at several concurrencies.
+
+Runs `batch.run_batch` on `--questions` distinct questions against
+`FakeLLMServer` with `--latency` seconds per answer and reports
+questions per minute for each `--concurrency` level. Code runs on
+`--processes` executor processes.
+
+Run from the repository root:
+
+    python benchmarks/bench_batch.py --questions 24 --latency 1 --processes 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parents[1] / "src"
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
+
+from scientific_programming_workshop.batch import Question, run_batch  # noqa: E402
+from scientific_programming_workshop.fake_llm import FakeLLMServer  # noqa: E402
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Print questions per minute for each concurrency level."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", type=int, default=24)
+    parser.add_argument("--latency", type=float, default=1.0)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args(argv)
+
+    with FakeLLMServer(latency=args.latency) as llm:
+        os.environ.update(
+            OPENAI_API_KEY="bench",
+            OPENAI_BASE_URL=llm.base_url,
+            INTENT_ROUTER="off",
+            LLM_CACHE="off",
+            SINGLE_FLIGHT="off",
+            EXEC_POOL_SIZE=str(args.processes),
+        )
+        from scientific_programming_workshop.executor import get_executor_pool
+
+        get_executor_pool()
+        print(f"{'concurrency':>11} {'seconds':>8} {'per minute':>11} {'failed':>7}")
+        for concurrency in args.concurrency:
+            questions = [
+                Question(f"q{i}", f"Question {i} at concurrency {concurrency}")
+                for i in range(args.questions)
+            ]
+            with tempfile.TemporaryDirectory() as output:
+                summary = run_batch(questions, output, concurrency=concurrency)
+            print(
+                f"{concurrency:11} {summary['seconds']:8.2f} "
+                f"{summary['questions_per_minute']:11.1f} {summary['failed']:7}"
+            )
+        get_executor_pool().close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
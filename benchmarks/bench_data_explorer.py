@@ -0,0 +1,114 @@
+"""Compare data explorer pages from `DataIndex` with pandas filtering.
+
+For each query, the baseline is what `/data` would otherwise do per
+request: boolean masks over the frame, `sort_values` and `iloc` for the
+page. The workshop dataset is repeated `--repeat` times so the frame is
+large enough for scans to matter.
+
+Run from the repository root:
+
+    python benchmarks/bench_data_explorer.py --repeat 250
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Callable
+
+import pandas as pd
+
+SRC_DIR = Path(__file__).resolve().parents[1] / "src"
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
+
+from scientific_programming_workshop.data_explorer import (  # noqa: E402
+    DataIndex,
+    ExplorerQuery,
+)
+from scientific_programming_workshop.data_loading import (  # noqa: E402
+    read_autoscout_csv,
+)
+from scientific_programming_workshop.paths import CSV_PATH  # noqa: E402
+
+QUERIES = {
+    "first page": {},
+    "deep page": {"offset": "-100"},
+    "deep page by -price": {"sort": "-price", "offset": "-100"},
+    "make=AUDI, price<=20000, by hp": {
+        "make": "AUDI",
+        "price_max": "20000",
+        "sort": "hp",
+    },
+    "one dealer_plz": {"dealer_plz": "8488"},
+    "narrow price range, by -mileage": {
+        "price_min": "5000",
+        "price_max": "5050",
+        "sort": "-mileage",
+    },
+}
+
+
+def pandas_page(frame: pd.DataFrame, query: ExplorerQuery) -> pd.DataFrame:
+    """Return the page the way a per-request scan would."""
+    mask = pd.Series(True, index=frame.index)
+    for name, low, high in query.ranges:
+        if low is not None:
+            mask &= frame[name] >= low
+        if high is not None:
+            mask &= frame[name] <= high
+    for name, values in query.equals:
+        column = frame[name]
+        if pd.api.types.is_numeric_dtype(column):
+            mask &= column.isin([float(value) for value in values])
+        else:
+            mask &= column.isin(values)
+    rows = frame[mask]
+    if query.sort is not None:
+        rows = rows.sort_values(query.sort, ascending=not query.descending)
+    return rows.iloc[query.offset : query.offset + query.limit]
+
+
+def best_us(function: Callable[[], object], number: int) -> float:
+    """Return the best of three timings of `function`, in microseconds."""
+    timings = []
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        timings.append((time.perf_counter() - start) / number)
+    return min(timings) * 1e6
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Print microseconds per page for pandas and the index."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=250)
+    parser.add_argument("--number", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    data = read_autoscout_csv(CSV_PATH)
+    frame = pd.concat([data] * args.repeat, ignore_index=True)
+    start = time.perf_counter()
+    index = DataIndex(frame)
+    print(f"{len(frame):,} rows; index built in {time.perf_counter() - start:.2f} s")
+
+    print(f"{'query':34} {'matches':>9} {'pandas us':>10} {'index us':>9}")
+    for label, query_args in QUERIES.items():
+        query_args = dict(query_args)
+        if query_args.get("offset") == "-100":
+            query_args["offset"] = str(len(frame) - 100)
+        query = ExplorerQuery.from_args(query_args)
+        page = index.query(query)
+        expected = pandas_page(frame, query)
+        assert len(page.rows) == len(expected), label
+        baseline = best_us(lambda: pandas_page(frame, query), args.number)
+        indexed = best_us(lambda: index.query(query), args.number * 10)
+        print(f"{label:34} {page.total:9,} {baseline:10.0f} {indexed:9.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,72 @@
+"""Compare CSV parsing, snapshot loading and the cached dataset store.
+
+Also times building the aggregate cube and answering a group-by from it.
+
+Run from the repository root:
+
+    python benchmarks/bench_data_loading.py
+"""
+
+from __future__ import annotations
+
+import sys
+import tempfile
+import timeit
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parents[1] / "src"
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
+
+import pandas as pd  # noqa: E402
+
+from scientific_programming_workshop.aggregate_cube import AggregateCube  # noqa: E402
+from scientific_programming_workshop.data_loading import (  # noqa: E402
+    get_dataset_store,
+    load_autoscout_data,
+    read_autoscout_csv,
+)
+from scientific_programming_workshop.paths import CSV_PATH  # noqa: E402
+from scientific_programming_workshop.snapshot import (  # noqa: E402
+    build_snapshot,
+    load_snapshot,
+)
+
+
+def _best_ms(stmt, number: int) -> float:
+    return min(timeit.repeat(stmt, number=number, repeat=5)) / number * 1000
+
+
+def main() -> None:
+    """Print the per-call cost of each loading strategy."""
+    number = 20
+    uncached = _best_ms(lambda: pd.read_csv(CSV_PATH), number)
+    typed = _best_ms(read_autoscout_csv, number)
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot_dir = build_snapshot(read_autoscout_csv(), Path(tmp) / "snap")
+        mapped = _best_ms(lambda: load_snapshot(snapshot_dir), number)
+    get_dataset_store().clear()
+    load_autoscout_data()
+    cached = _best_ms(load_autoscout_data, number * 50)
+    print(f"pd.read_csv per request : {uncached:8.3f} ms")
+    print(f"typed CSV parse         : {typed:8.3f} ms")
+    print(f"snapshot memory-map     : {mapped:8.3f} ms")
+    print(f"DatasetStore.get()      : {cached:8.3f} ms")
+    print(f"speedup (cached)        : {uncached / cached:8.0f}x")
+
+    data = get_dataset_store().frame()
+    cube = get_dataset_store().current().cube
+    build = _best_ms(lambda: AggregateCube.build(data), 5)
+    for by in ("fuel_type", ["make", "fuel_type"]):
+        grouped = _best_ms(
+            lambda by=by: data.groupby(by, observed=True)["price"].mean(), number
+        )
+        lookup = _best_ms(lambda by=by: cube.query(by, "price", "mean"), number * 50)
+        label = by if isinstance(by, str) else "+".join(by)
+        print(f"{'groupby ' + label:<24}: {grouped:8.3f} ms")
+        print(f"{'cube ' + label:<24}: {lookup:8.3f} ms")
+    print(f"AggregateCube.build     : {build:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Compare answering slow questions synchronously with the job queue.
+
+Runs the step 04 app in-process against `FakeLLMServer` with a slow
+model. The synchronous baseline holds each `POST /` until the answer is
+rendered; with jobs, `POST /jobs` returns as soon as the job is queued
+and clients poll `GET /jobs/<id>` until it is done. Reports the time a
+client waits for the first response (what a proxy timeout applies to)
+and the time until all answers are available.
+
+Run from the repository root:
+
+    python benchmarks/bench_jobs.py --questions 8 --latency 2 --workers 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parents[1] / "src"
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
+
+from scientific_programming_workshop.fake_llm import FakeLLMServer  # noqa: E402
+
+
+def synchronous(app, prompts: list[str]) -> tuple[list[float], float]:
+    """POST every prompt concurrently; return response times and the total."""
+
+    def ask(prompt: str) -> float:
+        start = time.perf_counter()
+        app.test_client().post("/", data={"prompt": prompt})
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(len(prompts)) as pool:
+        waits = list(pool.map(ask, prompts))
+    return waits, time.perf_counter() - start
+
+
+def with_jobs(app, prompts: list[str]) -> tuple[list[float], float]:
+    """Submit every prompt as a job and poll; return submit times and the total."""
+    client = app.test_client()
+    start = time.perf_counter()
+    waits, locations = [], []
+    for prompt in prompts:
+        submitted = time.perf_counter()
+        response = client.post("/jobs", data={"prompt": prompt})
+        waits.append(time.perf_counter() - submitted)
+        locations.append(response.headers["Location"])
+    pending = set(locations)
+    while pending:
+        for location in list(pending):
+            if client.get(location).get_json()["status"] in ("done", "failed"):
+                pending.discard(location)
+        time.sleep(0.05)
+    return waits, time.perf_counter() - start
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Print response and completion times for both modes."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=2.0)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    with (
+        FakeLLMServer(latency=args.latency) as llm,
+        tempfile.TemporaryDirectory() as directory,
+    ):
+        os.environ.update(
+            OPENAI_API_KEY="bench",
+            OPENAI_BASE_URL=llm.base_url,
+            INTENT_ROUTER="off",
+            LLM_CACHE="off",
+            SINGLE_FLIGHT="off",
+            JOB_DB=str(Path(directory) / "jobs.sqlite3"),
+            JOB_WORKERS=str(args.workers),
+        )
+        from scientific_programming_workshop.apps.step_04 import create_app
+
+        app = create_app()
+        for mode, run in (("POST /", synchronous), ("POST /jobs", with_jobs)):
+            prompts = [f"{mode} question {i}" for i in range(args.questions)]
+            waits, total = run(app, prompts)
+            print(
+                f"{mode:11} first response p50 {statistics.median(waits):7.3f} s"
+                f"  max {max(waits):7.3f} s   all answers after {total:6.2f} s"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,65 @@
+"""Compare a fresh OpenAI client per request against the shared pooled client.
+
+Both variants talk to the local stub server in `fake_llm.py`, so the numbers
+show client construction and connection setup cost, not model latency.
+Against the real API each fresh client also pays a TLS handshake.
+
+Run from the repository root:
+
+    python benchmarks/bench_llm_client.py
+"""
+
+from __future__ import annotations
+
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parents[1] / "src"
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
+
+from openai import OpenAI  # noqa: E402
+
+from scientific_programming_workshop import llm_client  # noqa: E402
+from scientific_programming_workshop.fake_llm import FakeLLMServer  # noqa: E402
+
+MESSAGES = [{"role": "user", "content": "average price by fuel type"}]
+
+
+def _latencies_ms(make_client, n: int) -> list[float]:
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        client = make_client()
+        client.chat.completions.create(model="gpt-4.1-mini", messages=MESSAGES)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def _report(label: str, samples: list[float]) -> None:
+    p95 = statistics.quantiles(samples, n=20)[-1]
+    print(f"{label:<24} p50 {statistics.median(samples):7.3f} ms  p95 {p95:7.3f} ms")
+
+
+def main(n: int = 200) -> None:
+    """Print per-request latency for both client strategies."""
+    with FakeLLMServer() as server:
+        os.environ["OPENAI_API_KEY"] = "bench"
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+
+        fresh = _latencies_ms(
+            lambda: OpenAI(api_key="bench", base_url=server.base_url), n
+        )
+        llm_client.reset_openai_client()
+        pooled = _latencies_ms(llm_client.get_openai_client, n)
+
+        _report("new client per request", fresh)
+        _report("shared pooled client", pooled)
+        print(f"connections opened: {server.connection_count} for {2 * n} requests")
+
+
+if __name__ == "__main__":
+    main()
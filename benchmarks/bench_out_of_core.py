@@ -0,0 +1,98 @@
+"""Compare peak memory of in-memory and out-of-core group-bys.
+
+Writes the workshop CSV repeated `--copies` times (about 4k rows per
+copy), converts it into partitions with `out_of_core.write_partitions`,
+and runs `groupby("make")["price"].mean()` plus a filtered count in a
+fresh process per mode, so each reports its own peak RSS:
+
+- pandas: read the whole CSV, then aggregate
+- chunked: stream the partitions with `ChunkedFrame`
+
+Run from the repository root:
+
+    python benchmarks/bench_out_of_core.py --copies 250
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parents[1] / "src"
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
+
+import pandas as pd  # noqa: E402
+
+from scientific_programming_workshop.out_of_core import (  # noqa: E402
+    ChunkedFrame,
+    write_partitions,
+)
+from scientific_programming_workshop.paths import CSV_PATH  # noqa: E402
+
+
+def _run(mode: str, path: str) -> dict[str, float]:
+    start = time.perf_counter()
+    if mode == "pandas":
+        data = pd.read_csv(path)
+    else:
+        data = ChunkedFrame.open(path)
+    means = data.groupby("make")["price"].mean()
+    expensive = len(data[data["price"] > 50000])
+    return {
+        "seconds": round(time.perf_counter() - start, 3),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024),
+        "groups": len(means),
+        "expensive": expensive,
+    }
+
+
+def _measure(mode: str, path: Path) -> dict[str, float]:
+    output = subprocess.run(
+        [sys.executable, __file__, "--child", mode, str(path)],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output)
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Print time and peak RSS of both modes."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--copies", type=int, default=250)
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "PATH"))
+    args = parser.parse_args(argv)
+    if args.child:
+        print(json.dumps(_run(*args.child)))
+        return 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        big = Path(tmp) / "big.csv"
+        source = CSV_PATH.read_text(encoding="utf-8").splitlines(keepends=True)
+        with open(big, "w", encoding="utf-8") as handle:
+            handle.write(source[0])
+            for _ in range(args.copies):
+                handle.writelines(source[1:])
+        rows = (len(source) - 1) * args.copies
+        start = time.perf_counter()
+        parts = write_partitions(big, Path(tmp) / "big.parts")
+        print(f"{rows} rows; partitioned in {time.perf_counter() - start:.1f} s")
+        for mode, path in (("pandas", big), ("chunked", parts)):
+            result = _measure(mode, path)
+            print(
+                f"{mode:8} {result['seconds']:6.2f} s  "
+                f"peak RSS {result['peak_rss_mb']:5.0f} MB  "
+                f"groups={result['groups']} expensive={result['expensive']}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
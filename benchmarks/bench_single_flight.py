@@ -0,0 +1,111 @@
+"""Count model calls for a burst of identical questions under gunicorn.
+
+Starts `gunicorn app_step_04:app` (several gthread workers) against
+`FakeLLMServer`, sends one burst of identical concurrent `POST /`
+requests per `SINGLE_FLIGHT` mode and reports how many requests reached
+the model and the latency of the burst.
+
+Run from the repository root (needs gunicorn):
+
+    python benchmarks/bench_single_flight.py --modes workers,process,off
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlencode
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC_DIR = ROOT / "src"
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
+
+from scientific_programming_workshop.fake_llm import FakeLLMServer  # noqa: E402
+
+
+def wait_until_up(url: str, timeout: float = 60.0) -> None:
+    """Poll `url` until it answers."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with urllib.request.urlopen(url) as response:
+                response.read()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+def burst(mode: str, args: argparse.Namespace) -> tuple[int, list[float]]:
+    """Return (model calls, sorted latencies) for one burst in `mode`."""
+    url = f"http://127.0.0.1:{args.port}/"
+    with (
+        FakeLLMServer(latency=args.latency) as llm,
+        tempfile.TemporaryDirectory() as flights,
+    ):
+        env = dict(
+            os.environ,
+            SINGLE_FLIGHT=mode,
+            SINGLE_FLIGHT_DIR=flights,
+            OPENAI_API_KEY="bench",
+            OPENAI_BASE_URL=llm.base_url,
+            INTENT_ROUTER="off",
+        )
+        command = ["gunicorn", "-b", f"127.0.0.1:{args.port}"]
+        command += ["-w", str(args.workers), "--threads", str(args.threads)]
+        server = subprocess.Popen(
+            [*command, "app_step_04:app"],
+            cwd=ROOT,
+            env=env,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            wait_until_up(url)
+            body = urlencode({"prompt": f"Describe the fuel types ({mode})"})
+
+            def ask(_: int) -> float:
+                start = time.perf_counter()
+                with urllib.request.urlopen(url, data=body.encode()) as response:
+                    response.read()
+                return time.perf_counter() - start
+
+            with ThreadPoolExecutor(args.requests) as pool:
+                latencies = sorted(pool.map(ask, range(args.requests)))
+        finally:
+            server.terminate()
+            server.wait()
+        return llm.request_count, latencies
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Print model calls and latency per mode."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", default="workers,off")
+    parser.add_argument("--requests", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=1.0)
+    parser.add_argument("--port", type=int, default=8124)
+    args = parser.parse_args(argv)
+
+    for mode in args.modes.split(","):
+        calls, latencies = burst(mode, args)
+        median = latencies[len(latencies) // 2]
+        print(
+            f"SINGLE_FLIGHT={mode:8} {args.requests} identical questions: "
+            f"{calls:3} model calls, p50 {median:.2f} s, max {latencies[-1]:.2f} s"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
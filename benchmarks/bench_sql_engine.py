@@ -0,0 +1,99 @@
+"""Compare pandas with the embedded SQL engines on larger copies of the data.
+
+Times a group-by, a two-key group-by and a join of per-make averages back
+onto the rows, each in pandas and through `sql_engine.SqlSession` (SQLite,
+plus DuckDB if it is installed), and the one-off cost of registering the
+frame with each engine.
+
+Run from the repository root:
+
+    python benchmarks/bench_sql_engine.py --copies 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+import timeit
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parents[1] / "src"
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
+
+import pandas as pd  # noqa: E402
+
+from scientific_programming_workshop.data_loading import (  # noqa: E402
+    read_autoscout_csv,
+)
+from scientific_programming_workshop.sql_engine import (  # noqa: E402
+    SqlSession,
+    duckdb_installed,
+)
+
+QUERIES = {
+    "group by make": "SELECT make, AVG(price) AS price FROM data GROUP BY make",
+    "group by make, fuel": (
+        "SELECT make, fuel_type, COUNT(*) AS n, AVG(price) AS price, "
+        "MAX(hp) AS hp FROM data GROUP BY make, fuel_type"
+    ),
+    "join on make average": (
+        "SELECT COUNT(*) AS n FROM data JOIN "
+        "(SELECT make, AVG(price) AS average FROM data GROUP BY make) AS m "
+        "USING (make) WHERE data.price > m.average"
+    ),
+}
+
+
+def _pandas(name: str, data: pd.DataFrame) -> object:
+    if name == "group by make":
+        return data.groupby("make", observed=True)["price"].mean()
+    if name == "group by make, fuel":
+        return data.groupby(["make", "fuel_type"], observed=True).agg(
+            n=("price", "size"), price=("price", "mean"), hp=("hp", "max")
+        )
+    average = data.groupby("make", observed=True)["price"].transform("mean")
+    return int((data["price"] > average).sum())
+
+
+def _best_ms(stmt, number: int = 3) -> float:
+    return min(timeit.repeat(stmt, number=number, repeat=3)) / number * 1000
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Print per-query times for pandas and each available engine."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--copies", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    base = read_autoscout_csv()
+    data = pd.concat([base] * args.copies, ignore_index=True)
+    for column in base.select_dtypes("category"):
+        data[column] = data[column].astype(base[column].dtype)
+    print(f"{len(data)} rows")
+
+    engines = ["sqlite"] + (["duckdb"] if duckdb_installed() else [])
+    sessions = {}
+    for engine in engines:
+        start = time.perf_counter()
+        sessions[engine] = SqlSession(engine, data)
+        print(f"register with {engine:7}: {time.perf_counter() - start:8.3f} s")
+    if not duckdb_installed():
+        print("(duckdb is not installed; only SQLite is measured)")
+
+    header = f"{'query':22}{'pandas':>10}" + "".join(f"{e:>10}" for e in engines)
+    print(header + "   (ms)")
+    for name, query in QUERIES.items():
+        row = f"{name:22}{_best_ms(lambda: _pandas(name, data)):10.1f}"
+        for engine in engines:
+            session = sessions[engine]
+            row += f"{_best_ms(lambda: session.query(query)):10.1f}"
+        print(row)
+    for session in sessions.values():
+        session.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
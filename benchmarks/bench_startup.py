@@ -0,0 +1,97 @@
+"""Measure cold start: import time per package and time to first response.
+
+Each measurement runs in a fresh interpreter. `python -X importtime`
+reports the self time of every imported module; they are summed per
+top-level package (and per module of this package with `--modules`).
+The second measurement is the wall time from interpreter start to the
+end of the first `GET /` (which loads the dataset), using the Flask test
+client.
+
+Run from the repository root:
+
+    python benchmarks/bench_startup.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import subprocess
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+PACKAGE = "scientific_programming_workshop"
+
+FIRST_REQUEST = """
+import time
+start = time.perf_counter()
+import app_step_04
+imported = time.perf_counter()
+response = app_step_04.app.test_client().get("/")
+assert response.status_code == 200, response.status_code
+print(imported - start, time.perf_counter() - imported)
+"""
+
+
+def import_times(module: str, *, by_module: bool) -> Counter[str]:
+    """Return microseconds of self import time, summed per package."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+    totals: Counter[str] = Counter()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:") :].split("|")
+        name = name.strip()
+        if by_module and name.startswith(PACKAGE + "."):
+            key = name
+        else:
+            key = name.split(".")[0]
+        totals[key] += int(self_us)
+    return totals
+
+
+def first_request() -> tuple[float, float, float]:
+    """Return (interpreter start, import, first GET /) seconds."""
+    start = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", FIRST_REQUEST],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    total = time.perf_counter() - start
+    imported, requested = (float(value) for value in output.split())
+    return total - imported - requested, imported, requested
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Print the slowest imports and the time to the first response."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="app_step_04")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--modules", action="store_true", help="split this package")
+    args = parser.parse_args(argv)
+
+    totals = import_times(args.module, by_module=args.modules)
+    print(f"import {args.module}: {sum(totals.values()) / 1000:8.1f} ms in total")
+    for name, micros in totals.most_common(args.top):
+        print(f"  {name:45} {micros / 1000:8.1f} ms")
+
+    interpreter, imported, requested = first_request()
+    print(f"interpreter start       : {interpreter * 1000:8.1f} ms")
+    print(f"import app_step_04      : {imported * 1000:8.1f} ms")
+    print(f"first GET /             : {requested * 1000:8.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
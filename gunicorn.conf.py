@@ -0,0 +1,37 @@
+"""Gunicorn settings, read automatically by `gunicorn app_step_04:app`.
+
+The app is imported once in the master (`preload_app`) and warmed up
+there (see `scientific_programming_workshop.startup`) before workers are
+forked, so every worker starts with the dataset, pyplot and fonts already
+in shared copy-on-write memory instead of loading them itself. Set
+`GUNICORN_PRELOAD=0` to import the app in each worker instead (e.g. for
+`--reload` during development). Workers, bind address etc. come from the
+usual `WEB_CONCURRENCY`, `PORT` and `GUNICORN_CMD_ARGS` variables.
+"""
+
+from __future__ import annotations
+
+import os
+
+preload_app = os.getenv("GUNICORN_PRELOAD", "1").strip().lower() not in (
+    "0",
+    "false",
+    "off",
+)
+
+
+def when_ready(server):
+    """Warm up the preloaded app in the master, before workers fork."""
+    if not server.cfg.preload_app:
+        return
+    from scientific_programming_workshop.startup import (
+        preload_modules_from_env,
+        warm_up,
+    )
+
+    timings = warm_up(modules=preload_modules_from_env())
+    server.log.info(
+        "Warmed up in %.2f s (%s)",
+        sum(timings.values()),
+        ", ".join(f"{name} {seconds:.2f} s" for name, seconds in timings.items()),
+    )
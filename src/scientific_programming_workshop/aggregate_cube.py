@@ -0,0 +1,160 @@
+"""Precomputed group-by aggregates of the workshop dataset.
+
+Most questions are simple aggregates ("average price by fuel type"). An
+`AggregateCube` holds, for every combination of the dimension columns,
+the count/sum/min/max/mean of each measure column, so such questions are
+answered with a dictionary lookup instead of a scan of the full frame:
+
+    cube.query("fuel_type", "price", "mean")   # == data.groupby(...).mean()
+    cube.value("price", "max", make="AUDI")    # one cell
+    cube.size(["make", "transmission"])        # rows per group
+
+The finest grouping (all dimensions) and the single-dimension groupings
+are computed when the cube is built; other combinations are rolled up
+from the smallest grouping computed so far on first use and kept. None
+of this rescans the frame. When rows are appended to the dataset,
+`extend()` aggregates only the new rows and merges them into the cube.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Iterable, Mapping, Union
+
+import pandas as pd
+
+DIMENSIONS = ("make", "fuel_type", "transmission", "init_regist_year", "dealer_city")
+MEASURES = ("price", "mileage", "hp")
+STATS = ("count", "sum", "min", "max", "mean")
+
+By = Union[str, Iterable[str]]
+
+
+def _aggregate(frame: pd.DataFrame, dims: list[str], measures: list[str]):
+    grouped = frame.groupby(dims, observed=True, dropna=False, sort=False)
+    table = grouped[measures].agg(list(STATS[:-1]))
+    table.columns = [f"{measure}_{stat}" for measure, stat in table.columns]
+    table["size"] = grouped.size()
+    return table
+
+
+def _merge(table: pd.DataFrame, levels: list[str], *, dropna: bool = True):
+    """Combine rows of `table` that share the same `levels` key."""
+    grouped = table.groupby(level=levels, observed=True, dropna=dropna, sort=dropna)
+    # One vectorized reduction per kind of column, not one per column.
+    suffixes = {"sum": ("_count", "_sum", "size"), "min": ("_min",), "max": ("_max",)}
+    parts = [
+        getattr(grouped[[c for c in table.columns if c.endswith(ends)]], how)()
+        for how, ends in suffixes.items()
+    ]
+    return pd.concat(parts, axis=1)[table.columns]
+
+
+class AggregateCube:
+    """Count/sum/min/max/mean of each measure for every dimension subset."""
+
+    def __init__(
+        self,
+        finest: pd.DataFrame,
+        dimensions: tuple[str, ...],
+        measures: tuple[str, ...],
+    ) -> None:
+        """Wrap `finest` (grouped by all `dimensions`) and roll up single dims."""
+        self.dimensions = dimensions
+        self.measures = measures
+        self._finest = finest
+        self._rollups: dict[frozenset[str], pd.DataFrame] = {
+            frozenset(dimensions): finest
+        }
+        self._tables: dict[frozenset[str], pd.DataFrame] = {}
+        for dim in dimensions:
+            self._lookup(frozenset([dim]))
+
+    def _lookup(self, key: frozenset[str]) -> pd.DataFrame:
+        table = self._tables.get(key)
+        if table is None:
+            # Roll up from the smallest grouping computed so far that
+            # contains `key`; concurrent callers at worst repeat this. Other
+            # threads add rollups meanwhile, so iterate over a snapshot.
+            rollups = list(self._rollups.items())
+            parent = min((rollup for dims, rollup in rollups if key <= dims), key=len)
+            rollup = _merge(parent, [dim for dim in self.dimensions if dim in key])
+            self._rollups[key] = rollup
+            table = self._tables[key] = self._with_means(rollup)
+        return table
+
+    @classmethod
+    def build(cls, data: pd.DataFrame) -> AggregateCube | None:
+        """Aggregate `data`; None if it lacks dimension or measure columns."""
+        dimensions = tuple(dim for dim in DIMENSIONS if dim in data.columns)
+        measures = tuple(
+            name
+            for name in MEASURES
+            if name in data.columns and pd.api.types.is_numeric_dtype(data[name])
+        )
+        if not dimensions or not measures:
+            return None
+        finest = _aggregate(data, list(dimensions), list(measures))
+        return cls(finest, dimensions, measures)
+
+    def extend(self, rows: pd.DataFrame) -> AggregateCube:
+        """Return a cube that also covers `rows` (appended to the dataset)."""
+        if rows.empty:
+            return self
+        delta = _aggregate(rows, list(self.dimensions), list(self.measures))
+        finest = _merge(
+            pd.concat([self._finest, delta]), list(self.dimensions), dropna=False
+        )
+        return AggregateCube(finest, self.dimensions, self.measures)
+
+    def _with_means(self, table: pd.DataFrame) -> pd.DataFrame:
+        means = {
+            f"{measure}_mean": table[f"{measure}_sum"] / table[f"{measure}_count"]
+            for measure in self.measures
+        }
+        return table.assign(**means)
+
+    def _normalise(self, by: By) -> list[str]:
+        dims = [by] if isinstance(by, str) else list(by)
+        unknown = [dim for dim in dims if dim not in self.dimensions]
+        if not dims or unknown or len(set(dims)) != len(dims):
+            raise KeyError(f"Not a cube dimension set: {dims!r}")
+        return dims
+
+    def covers(self, by: By, measure: str | None = None) -> bool:
+        """Return whether the cube can answer a group-by on `by` (and `measure`)."""
+        try:
+            self._normalise(by)
+        except KeyError:
+            return False
+        return measure is None or measure in self.measures
+
+    def table(self, by: By) -> pd.DataFrame:
+        """Return all stats grouped by `by`, one `<measure>_<stat>` column each."""
+        dims = self._normalise(by)
+        table = self._lookup(frozenset(dims))
+        if list(table.index.names) != dims:
+            table = table.reorder_levels(dims).sort_index()
+        return table
+
+    def query(self, by: By, measure: str, stat: str = "mean") -> pd.Series:
+        """Return `data.groupby(by)[measure].<stat>()` from the cube."""
+        if measure not in self.measures or stat not in STATS:
+            raise KeyError(f"Not in the cube: {measure!r}, {stat!r}")
+        return self.table(by)[f"{measure}_{stat}"].rename(measure)
+
+    def size(self, by: By) -> pd.Series:
+        """Return the number of rows per group (`data.groupby(by).size()`)."""
+        return self.table(by)["size"].rename(None)
+
+    def value(self, measure: str, stat: str = "mean", **where: Any) -> Any:
+        """Return one aggregate, e.g. `value("price", "max", make="AUDI")`.
+
+        Raises KeyError if no rows match `where`.
+        """
+        series = self.query(list(where), measure, stat)
+        key = tuple(where[name] for name in series.index.names)
+        return series.loc[key if len(key) > 1 else key[0]]
+
+    def groups(self) -> Mapping[frozenset[str], int]:
+        """Return the number of groups per dimension subset computed so far."""
+        return {dims: len(table) for dims, table in self._tables.items()}
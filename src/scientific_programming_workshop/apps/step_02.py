@@ -6,7 +6,7 @@ from flask import Flask, render_template, request
 from openai import OpenAIError
 
 from ..code_exec import extract_python_code
-from ..data_loading import describe_dataframe, load_autoscout_data
+from ..data_loading import describe_dataframe, get_dataset_store
 from ..llm_client import get_openai_client
 from ..paths import GRAPHIC_PATH, STATIC_DIR, TEMPLATES_DIR
 
@@ -27,8 +27,9 @@ def create_app() -> Flask:
         if GRAPHIC_PATH.exists():
             GRAPHIC_PATH.unlink()
 
-        data = load_autoscout_data()
-        data_struct_desc = describe_dataframe(data)
+        dataset = get_dataset_store().current()
+        data = dataset.view()
+        data_struct_desc = describe_dataframe(data, fingerprint=dataset.fingerprint)
 
         if request.method == "POST":
             user_prompt = request.form.get("prompt", "")
@@ -2,15 +2,325 @@
 
 from __future__ import annotations
 
+import hmac
+import os
+import time
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Callable, Generator
+
 import pandas as pd
-from flask import Flask, render_template, request
-from openai import OpenAIError
+from flask import (
+    Flask,
+    Response,
+    abort,
+    copy_current_request_context,
+    jsonify,
+    make_response,
+    render_template,
+    request,
+    stream_with_context,
+    url_for,
+)
 
-from ..code_exec import ExecResult, execute_user_code, extract_python_code
-from ..data_loading import describe_dataframe, load_autoscout_data
-from ..llm_client import get_openai_client
-from ..paths import GRAPHIC_PATH, STATIC_DIR, TEMPLATES_DIR
+from ..aggregate_cube import AggregateCube
+from ..code_advisor import advise_from_env
+from ..code_exec import ExecResult, RenderedFigure, extract_python_code
+from ..data_explorer import EQUALITY_COLUMNS, RANGE_COLUMNS, ExplorerQuery
+from ..data_loading import LoadedDataset, describe_dataframe
+from ..dataset_registry import get_dataset_registry
+from ..executor import run_code
+from ..image_store import figure_data_uri, figure_format_from_env, get_image_store
+from ..intent_router import route_from_env
+from ..jobs import FINISHED, POLL_INTERVAL, Job, JobResult, QueueFull, get_job_queue
+from ..llm_cache import cached_chat_completion, normalize_prompt
+from ..llm_client import api_errors, get_openai_client
+from ..metrics import CONTENT_TYPE, get_metrics
+from ..out_of_core import ChunkedFrame
+from ..paths import STATIC_DIR, TEMPLATES_DIR
 from ..plotting import configure_plot_style, plt
+from ..profiling import ProfilerSettings, get_profile_buffer
+from ..single_flight import flight_key, run_single_flight
+from ..sql_engine import SqlSettings
+from ..streaming import (
+    coalesced_stream,
+    replay_events,
+    sse_event,
+    stream_analysis,
+)
+from ..timing import StageTimings
+
+MODEL = "gpt-4.1-mini"
+MAX_TOKENS = 300
+FIGURE_MAX_AGE = 365 * 24 * 3600
+
+
+def build_prompt(
+    data_struct_desc: str,
+    user_prompt: str,
+    *,
+    cube: AggregateCube | None = None,
+    source: str = "./data/autoscout24_data.csv",
+    out_of_core: bool = False,
+    sql_dialect: str | None = None,
+) -> str:
+    """Build the model prompt for a user question about the dataset.
+
+    With a `cube`, the prompt tells the model it can read precomputed
+    group-by aggregates from it instead of grouping `data` itself.
+    `source` is the file the dataset was loaded from. With `out_of_core`,
+    the prompt explains which operations the streamed `data` supports.
+    With a `sql_dialect`, the model is asked to query `data` with `sql()`
+    (see `sql_engine`).
+    """
+    hints = ""
+    if cube is not None:
+        hints = (
+            "A precomputed aggregate cube called 'cube' is also available. "
+            "For group-by aggregates of the measures "
+            f"{list(cube.measures)} over any of the dimensions "
+            f"{list(cube.dimensions)}, prefer "
+            "cube.query(by, measure, stat) (stat: count, sum, min, max, mean; "
+            "returns the same Series as data.groupby(by)[measure].<stat>()), "
+            "cube.size(by) for rows per group, and "
+            "cube.value(measure, stat, **filters) for a single number.\n\n"
+        )
+    if out_of_core:
+        hints += (
+            "'data' is too large for memory: it streams partition files in "
+            "chunks. It supports filters such as "
+            "data[(data['price'] > 1000) & (data['make'] == 'AUDI')] and "
+            "data.query(...), column selection, "
+            "groupby(...)[column].agg/count/sum/min/max/mean/std/size(), "
+            "describe(), value_counts(), nlargest(), nsmallest() and head(); "
+            "their results are ordinary pandas objects. Do not iterate over "
+            "rows; call .to_pandas() only on small filtered subsets.\n\n"
+        )
+    if sql_dialect is not None:
+        hints += (
+            "A function sql(query) is also available: it runs a "
+            f"{sql_dialect} SQL query against a table named 'data' with the "
+            "same columns and returns a pandas DataFrame. Do filtering, "
+            "grouping, joins and sorting in SQL with sql(...), then print or "
+            "plot the returned DataFrame.\n\n"
+        )
+    return (
+        f"You have a pandas DataFrame called 'data' loaded from '{source}'. "
+        "Here is the structure of the DataFrame:\n\n"
+        f"{data_struct_desc}\n\n"
+        f"{hints}"
+        "Please write Python code that works with this DataFrame.\n\n"
+        f"User Prompt: {user_prompt}"
+    )
+
+
+def sql_dialect_from_env() -> str | None:
+    """Return the SQL dialect to prompt for, or None for pandas answers."""
+    settings = SqlSettings.from_env()
+    return settings.dialect if settings is not None else None
+
+
+@dataclass(frozen=True)
+class Answer:
+    """The model's answer to a question and the result of running its code."""
+
+    gpt_response: str
+    code: str
+    advice: tuple[str, ...]
+    result: ExecResult
+
+
+def answer_from(
+    response: str, code: str, advice: list[str], result: ExecResult
+) -> Answer:
+    """Return the `Answer` of a streamed analysis (see `streaming.OnAnswer`)."""
+    return Answer(response, code, tuple(advice), result)
+
+
+def answer_key(
+    user_prompt: str, fingerprint: str, dialect: str | None, figure_format: str
+) -> str:
+    """Return the single-flight key of a question (see `single_flight`)."""
+    return flight_key(
+        MODEL, normalize_prompt(user_prompt), fingerprint, dialect, figure_format
+    )
+
+
+@dataclass(frozen=True)
+class Blocking:
+    """Pipeline step: a blocking call (run on a thread by the async app)."""
+
+    call: Callable[[], Any]
+
+
+@dataclass(frozen=True)
+class Completion:
+    """Pipeline step: a cached model completion with these arguments."""
+
+    arguments: dict[str, Any]
+
+
+@dataclass(frozen=True)
+class Execution:
+    """Pipeline step: running generated code with these arguments."""
+
+    arguments: dict[str, Any]
+
+
+AnswerSteps = Generator["Blocking | Completion | Execution", Any, Answer]
+
+
+def answer_steps(
+    user_prompt: str,
+    dataset_name: str,
+    dataset: LoadedDataset,
+    *,
+    dialect: str | None,
+    figure_format: str,
+    timings: StageTimings,
+) -> AnswerSteps:
+    """Yield the I/O steps of answering a question; return the `Answer`.
+
+    The question is answered by the intent router or the model, and the
+    code is checked and run. The caller performs each step it is sent
+    and sends back the result (see `answer_question`); the async app
+    does the same with async clients, so both apps share one pipeline.
+    """
+    data = dataset.view()
+    with timings.stage("route"):
+        routed = yield Blocking(
+            partial(route_from_env, user_prompt, data, cube=dataset.cube)
+        )
+    if routed is not None:
+        response, code, notes = routed.text, routed.code, ()
+    else:
+        with timings.stage("prompt"):
+            data_struct_desc = yield Blocking(
+                partial(describe_dataframe, data, fingerprint=dataset.fingerprint)
+            )
+            prompt_for_gpt = build_prompt(
+                data_struct_desc,
+                user_prompt,
+                cube=dataset.cube,
+                source=get_dataset_registry().source(dataset_name),
+                out_of_core=isinstance(data, ChunkedFrame),
+                sql_dialect=dialect,
+            )
+        with timings.stage("llm"):
+            response = yield Completion(
+                {
+                    "model": MODEL,
+                    "messages": [{"role": "user", "content": prompt_for_gpt}],
+                    "max_tokens": MAX_TOKENS,
+                    "user_prompt": user_prompt,
+                    "fingerprint": dataset.fingerprint,
+                    "variant": "sql" if dialect else "",
+                }
+            )
+        with timings.stage("extract"):
+            checked = advise_from_env(
+                extract_python_code(response), columns=data.columns
+            )
+        code, notes = checked.code, tuple(checked.messages())
+
+    with timings.stage("exec"):
+        result: ExecResult = yield Execution(
+            {
+                "code": code,
+                "data": data,
+                "plt": plt,
+                "fingerprint": dataset.fingerprint,
+                "figure_format": figure_format,
+            }
+        )
+    timings.add("figures", result.figure_time)
+    return Answer(response, code, notes, result)
+
+
+def _perform(step: Blocking | Completion | Execution) -> Any:
+    if isinstance(step, Completion):
+        return cached_chat_completion(get_openai_client(), **step.arguments)
+    if isinstance(step, Execution):
+        return run_code(**step.arguments)
+    return step.call()
+
+
+def answer_question(
+    user_prompt: str,
+    dataset_name: str,
+    dataset: LoadedDataset,
+    *,
+    figure_format: str,
+    timings: StageTimings | None = None,
+) -> Answer:
+    """Answer a question about a dataset: the pipeline behind `POST /`.
+
+    Runs `answer_steps` in this thread. Identical questions in flight at
+    the same time share one answer (see `single_flight`). Raises
+    ValueError (e.g. for an answer without code) and the OpenAI client's
+    errors.
+    """
+    timings = timings if timings is not None else StageTimings()
+    dialect = sql_dialect_from_env()
+
+    def answer() -> Answer:
+        steps = answer_steps(
+            user_prompt,
+            dataset_name,
+            dataset,
+            dialect=dialect,
+            figure_format=figure_format,
+            timings=timings,
+        )
+        value: Any = None
+        error: Exception | None = None
+        while True:
+            try:
+                step = steps.send(value) if error is None else steps.throw(error)
+            except StopIteration as stop:
+                return stop.value
+            value, error = None, None
+            try:
+                value = _perform(step)
+            except Exception as ex:  # pylint: disable=broad-exception-caught
+                error = ex
+
+    return run_single_flight(
+        answer_key(user_prompt, dataset.fingerprint, dialect, figure_format), answer
+    )
+
+
+def run_job(
+    user_prompt: str, dataset_name: str, dataset: LoadedDataset, figure_format: str
+) -> JobResult:
+    """Answer a queued question (see `jobs`); an exception fails the job."""
+    try:
+        answer = answer_question(
+            user_prompt, dataset_name, dataset, figure_format=figure_format
+        )
+    except api_errors() as e:
+        raise RuntimeError(f"Error calling OpenAI API: {str(e)}") from e
+    return JobResult(
+        response=answer.gpt_response,
+        code=answer.code,
+        advice=answer.advice,
+        output=answer.result.stdout,
+        error=answer.result.error,
+        figures=answer.result.figures,
+    )
+
+
+def admin_authorized(authorization: str | None) -> bool:
+    """Return whether an `Authorization` header grants access to admin routes.
+
+    Admin routes are open when `ADMIN_TOKEN` is unset (local workshop use);
+    otherwise they require `Authorization: Bearer <ADMIN_TOKEN>`.
+    """
+    token = os.getenv("ADMIN_TOKEN")
+    if not token:
+        return True
+    expected = f"Bearer {token}".encode()
+    return hmac.compare_digest((authorization or "").encode(), expected)
 
 
 def create_app() -> Flask:
@@ -22,79 +332,298 @@ def create_app() -> Flask:
         template_folder=str(TEMPLATES_DIR),
         static_folder=str(STATIC_DIR),
     )
+    flask_app.config.setdefault("FIGURE_FORMAT", figure_format_from_env())
+    flask_app.config.setdefault(
+        "FIGURE_INLINE", os.getenv("FIGURE_DELIVERY", "").lower() == "inline"
+    )
+
+    def figure_url(figure: RenderedFigure) -> str:
+        if flask_app.config["FIGURE_INLINE"]:
+            return figure_data_uri(figure)
+        return url_for("figure", key=get_image_store().put(figure))
+
+    def selected_dataset(name: str | None) -> tuple[str, LoadedDataset]:
+        registry = get_dataset_registry()
+        name = name or registry.default
+        try:
+            return name, registry.current(name)
+        except KeyError:
+            abort(404)
 
     @flask_app.route("/", methods=["GET", "POST"])
     def index():
         gpt_response = ""
         execution_result = ""
         code_to_execute = ""
-        show_graphic = False
-
-        if GRAPHIC_PATH.exists():
-            GRAPHIC_PATH.unlink()
+        advice: list[str] = []
+        figure_urls: list[str] = []
+        timings = StageTimings()
 
-        data = load_autoscout_data()
-        data_struct_desc = describe_dataframe(data)
+        with timings.stage("load"):
+            dataset_name, dataset = selected_dataset(request.values.get("dataset"))
 
         if request.method == "POST":
-            user_prompt = request.form.get("prompt", "")
-
-            prompt_for_gpt = (
-                "You have a pandas DataFrame called 'data' "
-                "loaded from './data/autoscout24_data.csv'. "
-                "Here is the structure of the DataFrame:\n\n"
-                f"{data_struct_desc}\n\n"
-                "Please write Python code that works with this DataFrame.\n\n"
-                f"User Prompt: {user_prompt}"
+            try:
+                answer = answer_question(
+                    request.form.get("prompt", ""),
+                    dataset_name,
+                    dataset,
+                    figure_format=flask_app.config["FIGURE_FORMAT"],
+                    timings=timings,
+                )
+                gpt_response = answer.gpt_response
+                code_to_execute = answer.code
+                advice = list(answer.advice)
+                figure_urls = [figure_url(figure) for figure in answer.result.figures]
+                execution_result = answer.result.error or answer.result.stdout
+
+            except ValueError as e:
+                gpt_response = str(e)
+            except api_errors() as e:
+                gpt_response = f"Error calling OpenAI API: {str(e)}"
+
+        with timings.stage("render"):
+            html = render_template(
+                "index_step_04.html",
+                prompt=request.form.get("prompt", ""),
+                gpt_response=gpt_response,
+                code_to_execute=code_to_execute,
+                advice=advice,
+                execution_result=execution_result,
+                figure_urls=figure_urls,
+                datasets=get_dataset_registry().names(),
+                dataset=dataset_name,
             )
+        response = make_response(html)
+        response.headers["Server-Timing"] = timings.server_timing()
+        get_metrics().observe_stages(timings.durations)
+        return response
 
-            try:
-                client = get_openai_client()
-                response = client.chat.completions.create(
-                    model="gpt-4.1-mini",
-                    messages=[{"role": "user", "content": prompt_for_gpt}],
-                    max_tokens=300,
+    @flask_app.route("/stream", methods=["POST"])
+    def stream():
+        user_prompt = request.form.get("prompt", "")
+        dataset_name, dataset = selected_dataset(request.form.get("dataset"))
+        figure_format = flask_app.config["FIGURE_FORMAT"]
+        dialect = sql_dialect_from_env()
+
+        @copy_current_request_context
+        def run(emit) -> Answer:
+            data = dataset.view()
+            routed = route_from_env(user_prompt, data, cube=dataset.cube)
+            client, messages = None, []
+            if routed is None:
+                data_struct_desc = describe_dataframe(
+                    data, fingerprint=dataset.fingerprint
                 )
-                gpt_response = response.choices[0].message.content or ""
-                code_to_execute = extract_python_code(gpt_response)
-
-                result: ExecResult = execute_user_code(
-                    code=code_to_execute,
-                    data=data,
-                    plt=plt,
-                    save_plot_path=str(GRAPHIC_PATH),
+                prompt_for_gpt = build_prompt(
+                    data_struct_desc,
+                    user_prompt,
+                    cube=dataset.cube,
+                    source=get_dataset_registry().source(dataset_name),
+                    out_of_core=isinstance(data, ChunkedFrame),
+                    sql_dialect=dialect,
                 )
+                client = get_openai_client()
+                messages = [{"role": "user", "content": prompt_for_gpt}]
+            answers: list[Answer] = []
+            for event in stream_analysis(
+                client=client,
+                model=MODEL,
+                messages=messages,
+                max_tokens=MAX_TOKENS,
+                user_prompt=user_prompt,
+                fingerprint=dataset.fingerprint,
+                data=data,
+                plt=plt,
+                figure_format=figure_format,
+                figure_url=figure_url,
+                answer=routed.text if routed is not None else None,
+                variant="sql" if dialect else "",
+                on_answer=lambda *answer: answers.append(answer_from(*answer)),
+            ):
+                emit(event)
+            if not answers:
+                raise ValueError("Error executing code.")
+            return answers[0]
 
-                show_graphic = result.show_graphic
-                execution_result = result.error or result.stdout
+        def replay(answer: Answer):
+            return replay_events(
+                answer.gpt_response,
+                answer.code,
+                answer.advice,
+                answer.result,
+                figure_url,
+            )
 
+        def generate():
+            try:
+                yield from coalesced_stream(
+                    answer_key(
+                        user_prompt, dataset.fingerprint, dialect, figure_format
+                    ),
+                    run,
+                    replay,
+                )
             except ValueError as e:
-                gpt_response = str(e)
-            except OpenAIError as e:  # pylint: disable=broad-exception-caught
-                gpt_response = f"Error calling OpenAI API: {str(e)}"
+                yield sse_event("error", str(e))
+                yield sse_event("done", {})
+            except api_errors() as e:
+                yield sse_event("error", f"Error calling OpenAI API: {str(e)}")
+                yield sse_event("done", {})
+
+        return Response(
+            stream_with_context(generate()),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    def job_payload(job: Job) -> dict:
+        payload = job.to_dict()
+        payload["url"] = url_for("job_status", job_id=job.id)
+        if job.result is not None:
+            payload["result"]["figure_urls"] = [
+                url_for("job_figure", job_id=job.id, position=position)
+                for position in range(job.figures)
+            ]
+        return payload
+
+    @flask_app.route("/jobs", methods=["GET", "POST"])
+    def jobs():
+        queue = get_job_queue()
+        if request.method == "GET":
+            return jsonify(queue.stats())
+        values = request.get_json(silent=True) or request.form
+        user_prompt = values.get("prompt", "")
+        if not user_prompt.strip():
+            return jsonify({"error": "A prompt is required."}), 400
+        dataset_name, dataset = selected_dataset(values.get("dataset"))
+        run = partial(
+            run_job,
+            user_prompt,
+            dataset_name,
+            dataset,
+            flask_app.config["FIGURE_FORMAT"],
+        )
+        try:
+            job = queue.submit(user_prompt, dataset_name, run)
+        except QueueFull as e:
+            return jsonify({"error": str(e)}), 503, {"Retry-After": "5"}
+        response = jsonify(job_payload(job))
+        response.status_code = 202
+        response.headers["Location"] = url_for("job_status", job_id=job.id)
+        return response
+
+    @flask_app.route("/jobs/<job_id>")
+    def job_status(job_id: str):
+        job = get_job_queue().store.get(job_id)
+        if job is None:
+            abort(404)
+        return jsonify(job_payload(job))
+
+    @flask_app.route("/jobs/<job_id>/events")
+    def job_events(job_id: str):
+        store = get_job_queue().store
+        if store.get(job_id) is None:
+            abort(404)
+
+        def generate():
+            status = None
+            while True:
+                job = store.get(job_id)
+                if job is None:
+                    yield sse_event("error", "The job has expired.")
+                    return
+                if job.status != status:
+                    status = job.status
+                    yield sse_event("status", job_payload(job))
+                if status in FINISHED:
+                    yield sse_event("done", {})
+                    return
+                time.sleep(POLL_INTERVAL)
+
+        return Response(
+            stream_with_context(generate()),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
 
-        return render_template(
-            "index_step_04.html",
-            prompt=request.form.get("prompt", ""),
-            gpt_response=gpt_response,
-            code_to_execute=code_to_execute,
-            execution_result=execution_result,
-            show_graphic=show_graphic,
+    @flask_app.route("/jobs/<job_id>/figures/<int:position>")
+    def job_figure(job_id: str, position: int):
+        queue = get_job_queue()
+        rendered = queue.store.figure(job_id, position)
+        if rendered is None:
+            abort(404)
+        response = Response(rendered.data, mimetype=rendered.mimetype)
+        response.cache_control.private = True
+        response.cache_control.max_age = int(queue.settings.ttl)
+        return response
+
+    @flask_app.route("/figures/<key>")
+    def figure(key: str):
+        rendered = get_image_store().get(key)
+        if rendered is None:
+            abort(404)
+        response = Response(rendered.data, mimetype=rendered.mimetype)
+        response.set_etag(key)
+        response.cache_control.public = True
+        response.cache_control.max_age = FIGURE_MAX_AGE
+        response.cache_control.immutable = True
+        return response.make_conditional(request)
+
+    @flask_app.route("/metrics")
+    def metrics():
+        registry = get_metrics()
+        if not registry.enabled:
+            abort(404)
+        return Response(registry.render(), content_type=CONTENT_TYPE)
+
+    @flask_app.route("/admin/profiles")
+    def admin_profiles():
+        if ProfilerSettings.from_env() is None:
+            abort(404)
+        if not admin_authorized(request.headers.get("Authorization")):
+            abort(403)
+        return jsonify(
+            [profile.to_dict() for profile in get_profile_buffer().snapshot()]
         )
 
+    @flask_app.after_request
+    def count_request(response: Response) -> Response:
+        get_metrics().count_request(request.endpoint or "unknown", response.status_code)
+        return response
+
     @flask_app.route("/data")
     def data_page():
+        context = {
+            "dataset": request.args.get("dataset"),
+            "range_columns": RANGE_COLUMNS,
+            "equality_columns": EQUALITY_COLUMNS,
+            "sortable": (),
+        }
+        try:
+            _, dataset = selected_dataset(context["dataset"])
+            context["sortable"] = dataset.index.sortable
+            context["query"] = ExplorerQuery.from_args(request.args)
+            context["page"] = dataset.index.query(context["query"])
+        except ValueError as e:
+            return render_template("data.html", error=str(e), **context), 400
+        except (OSError, UnicodeDecodeError, pd.errors.ParserError) as e:
+            context["error"] = f"Error loading data: {e}"
+        return render_template("data.html", **context)
+
+    @flask_app.route("/data/rows")
+    def data_rows():
+        _, dataset = selected_dataset(request.args.get("dataset"))
         try:
-            data = load_autoscout_data()
-            sample = data.head(10).to_html(classes="data", index=False)
-        except (
-            OSError,
-            UnicodeDecodeError,
-            ValueError,
-            pd.errors.ParserError,
-        ) as e:
-            sample = f"<p>Error loading data: {e}</p>"
-        return render_template("data.html", table_html=sample)
+            page = dataset.index.query(ExplorerQuery.from_args(request.args))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if request.args.get("format") == "html":
+            response = make_response(page.to_html())
+        else:
+            response = jsonify(page.to_dict())
+        response.headers["X-Total-Count"] = str(page.total)
+        return response
 
     @flask_app.route("/questions")
     def example_question():
@@ -0,0 +1,466 @@
+"""Async (ASGI) implementation of the step 04 app, built on Quart.
+
+Same routes, templates and prompt as `step_04`, but model calls go through
+`AsyncOpenAI` and code runs on a bounded thread pool (`run_code_async`),
+so one worker process keeps many requests in flight while they wait on the
+model instead of tying up a thread each. Other blocking work (loading a
+dataset, describing it for the prompt, intent routing, data explorer
+indexes) runs on threads via `asyncio.to_thread`, so the event loop only
+ever waits on I/O. Questions go through the same pipeline as in
+`step_04` (`answer_steps`); only the way its steps are performed differs.
+
+Jobs (`/jobs`) run the synchronous pipeline of `step_04` on the job
+queue's worker threads, outside the event loop.
+
+Serve it with an ASGI server, e.g.
+
+    uvicorn app_step_04_async:app --workers 2
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+from functools import partial
+from typing import Any
+
+import pandas as pd
+from quart import (
+    Quart,
+    Response,
+    abort,
+    jsonify,
+    make_response,
+    render_template,
+    request,
+    stream_with_context,
+    url_for,
+)
+
+from ..code_exec import RenderedFigure
+from ..data_explorer import EQUALITY_COLUMNS, RANGE_COLUMNS, ExplorerQuery
+from ..data_loading import LoadedDataset, describe_dataframe
+from ..dataset_registry import get_dataset_registry
+from ..executor import run_code_async
+from ..image_store import figure_data_uri, figure_format_from_env, get_image_store
+from ..intent_router import route_from_env
+from ..jobs import FINISHED, POLL_INTERVAL, Job, QueueFull, get_job_queue
+from ..llm_cache import cached_chat_completion_async
+from ..llm_client import aclose_openai_client, api_errors, get_async_openai_client
+from ..metrics import CONTENT_TYPE, get_metrics
+from ..out_of_core import ChunkedFrame
+from ..paths import STATIC_DIR, TEMPLATES_DIR
+from ..plotting import configure_plot_style, plt
+from ..profiling import ProfilerSettings, get_profile_buffer
+from ..single_flight import run_single_flight_async
+from ..streaming import (
+    acoalesced_stream,
+    astream_analysis,
+    replay_events,
+    sse_event,
+)
+from ..timing import StageTimings
+from .step_04 import (
+    FIGURE_MAX_AGE,
+    MAX_TOKENS,
+    MODEL,
+    Answer,
+    Blocking,
+    Completion,
+    Execution,
+    admin_authorized,
+    answer_from,
+    answer_key,
+    answer_steps,
+    build_prompt,
+    run_job,
+    sql_dialect_from_env,
+)
+
+
+async def _perform(step: Blocking | Completion | Execution) -> Any:
+    if isinstance(step, Completion):
+        client = get_async_openai_client()
+        return await cached_chat_completion_async(client, **step.arguments)
+    if isinstance(step, Execution):
+        return await run_code_async(**step.arguments)
+    return await asyncio.to_thread(step.call)
+
+
+async def answer_question_async(
+    user_prompt: str,
+    dataset_name: str,
+    dataset: LoadedDataset,
+    *,
+    figure_format: str,
+    timings: StageTimings | None = None,
+) -> Answer:
+    """Async `step_04.answer_question`: the same steps, awaited on the loop.
+
+    Model calls and executions are awaited; other blocking steps run on
+    threads.
+    """
+    timings = timings if timings is not None else StageTimings()
+    dialect = sql_dialect_from_env()
+
+    async def answer() -> Answer:
+        steps = answer_steps(
+            user_prompt,
+            dataset_name,
+            dataset,
+            dialect=dialect,
+            figure_format=figure_format,
+            timings=timings,
+        )
+        value: Any = None
+        error: Exception | None = None
+        while True:
+            try:
+                step = steps.send(value) if error is None else steps.throw(error)
+            except StopIteration as stop:
+                return stop.value
+            value, error = None, None
+            try:
+                value = await _perform(step)
+            except Exception as ex:  # pylint: disable=broad-exception-caught
+                error = ex
+
+    return await run_single_flight_async(
+        answer_key(user_prompt, dataset.fingerprint, dialect, figure_format), answer
+    )
+
+
+def create_app() -> Quart:
+    """Create and configure the async Step 04 Quart application."""
+    configure_plot_style()
+
+    quart_app = Quart(
+        __name__,
+        template_folder=str(TEMPLATES_DIR),
+        static_folder=str(STATIC_DIR),
+    )
+    quart_app.config.setdefault("FIGURE_FORMAT", figure_format_from_env())
+    quart_app.config.setdefault(
+        "FIGURE_INLINE", os.getenv("FIGURE_DELIVERY", "").lower() == "inline"
+    )
+
+    def figure_url(figure: RenderedFigure) -> str:
+        if quart_app.config["FIGURE_INLINE"]:
+            return figure_data_uri(figure)
+        return url_for("figure", key=get_image_store().put(figure))
+
+    async def selected_dataset(name: str | None) -> tuple[str, LoadedDataset]:
+        registry = get_dataset_registry()
+
+        def load() -> tuple[str, LoadedDataset]:
+            selected = name or registry.default  # may scan the data dir
+            return selected, registry.current(selected)
+
+        try:
+            return await asyncio.to_thread(load)
+        except KeyError:
+            abort(404)
+
+    @quart_app.route("/", methods=["GET", "POST"])
+    async def index():
+        gpt_response = ""
+        execution_result = ""
+        code_to_execute = ""
+        advice: list[str] = []
+        figure_urls: list[str] = []
+        timings = StageTimings()
+        form = await request.form
+
+        with timings.stage("load"):
+            dataset_name, dataset = await selected_dataset(
+                form.get("dataset") or request.args.get("dataset")
+            )
+
+        if request.method == "POST":
+            user_prompt = form.get("prompt", "")
+            try:
+                shared = await answer_question_async(
+                    user_prompt,
+                    dataset_name,
+                    dataset,
+                    figure_format=quart_app.config["FIGURE_FORMAT"],
+                    timings=timings,
+                )
+                gpt_response = shared.gpt_response
+                code_to_execute = shared.code
+                advice = list(shared.advice)
+                figure_urls = [figure_url(figure) for figure in shared.result.figures]
+                execution_result = shared.result.error or shared.result.stdout
+
+            except ValueError as e:
+                gpt_response = str(e)
+            except api_errors() as e:
+                gpt_response = f"Error calling OpenAI API: {str(e)}"
+
+        with timings.stage("render"):
+            html = await render_template(
+                "index_step_04.html",
+                prompt=form.get("prompt", ""),
+                gpt_response=gpt_response,
+                code_to_execute=code_to_execute,
+                advice=advice,
+                execution_result=execution_result,
+                figure_urls=figure_urls,
+                datasets=get_dataset_registry().names(),
+                dataset=dataset_name,
+            )
+        response = await make_response(html)
+        response.headers["Server-Timing"] = timings.server_timing()
+        get_metrics().observe_stages(timings.durations)
+        return response
+
+    @quart_app.route("/stream", methods=["POST"])
+    async def stream():
+        form = await request.form
+        user_prompt = form.get("prompt", "")
+        dataset_name, dataset = await selected_dataset(form.get("dataset"))
+        figure_format = quart_app.config["FIGURE_FORMAT"]
+        dialect = sql_dialect_from_env()
+
+        async def run(emit) -> Answer:
+            data = dataset.view()
+            routed = await asyncio.to_thread(
+                route_from_env, user_prompt, data, cube=dataset.cube
+            )
+            client, messages = None, []
+            if routed is None:
+                data_struct_desc = await asyncio.to_thread(
+                    describe_dataframe, data, fingerprint=dataset.fingerprint
+                )
+                prompt_for_gpt = build_prompt(
+                    data_struct_desc,
+                    user_prompt,
+                    cube=dataset.cube,
+                    source=get_dataset_registry().source(dataset_name),
+                    out_of_core=isinstance(data, ChunkedFrame),
+                    sql_dialect=dialect,
+                )
+                client = get_async_openai_client()
+                messages = [{"role": "user", "content": prompt_for_gpt}]
+            answers: list[Answer] = []
+            async for event in astream_analysis(
+                client=client,
+                model=MODEL,
+                messages=messages,
+                max_tokens=MAX_TOKENS,
+                user_prompt=user_prompt,
+                fingerprint=dataset.fingerprint,
+                data=data,
+                plt=plt,
+                figure_format=figure_format,
+                figure_url=figure_url,
+                answer=routed.text if routed is not None else None,
+                variant="sql" if dialect else "",
+                on_answer=lambda *answer: answers.append(answer_from(*answer)),
+            ):
+                emit(event)
+            if not answers:
+                raise ValueError("Error executing code.")
+            return answers[0]
+
+        def replay(answer: Answer):
+            return replay_events(
+                answer.gpt_response,
+                answer.code,
+                answer.advice,
+                answer.result,
+                figure_url,
+            )
+
+        @stream_with_context
+        async def generate():
+            try:
+                async for message in acoalesced_stream(
+                    answer_key(
+                        user_prompt, dataset.fingerprint, dialect, figure_format
+                    ),
+                    run,
+                    replay,
+                ):
+                    yield message
+            except ValueError as e:
+                yield sse_event("error", str(e))
+                yield sse_event("done", {})
+            except api_errors() as e:
+                yield sse_event("error", f"Error calling OpenAI API: {str(e)}")
+                yield sse_event("done", {})
+
+        response = Response(
+            generate(),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+        response.timeout = None
+        return response
+
+    def job_payload(job: Job) -> dict:
+        payload = job.to_dict()
+        payload["url"] = url_for("job_status", job_id=job.id)
+        if job.result is not None:
+            payload["result"]["figure_urls"] = [
+                url_for("job_figure", job_id=job.id, position=position)
+                for position in range(job.figures)
+            ]
+        return payload
+
+    @quart_app.route("/jobs", methods=["GET", "POST"])
+    async def jobs():
+        queue = get_job_queue()
+        if request.method == "GET":
+            return jsonify(await asyncio.to_thread(queue.stats))
+        values = await request.get_json(silent=True) or await request.form
+        user_prompt = values.get("prompt", "")
+        if not user_prompt.strip():
+            return jsonify({"error": "A prompt is required."}), 400
+        dataset_name, dataset = await selected_dataset(values.get("dataset"))
+        run = partial(
+            run_job,
+            user_prompt,
+            dataset_name,
+            dataset,
+            quart_app.config["FIGURE_FORMAT"],
+        )
+        try:
+            job = await asyncio.to_thread(queue.submit, user_prompt, dataset_name, run)
+        except QueueFull as e:
+            return jsonify({"error": str(e)}), 503, {"Retry-After": "5"}
+        location = url_for("job_status", job_id=job.id)
+        return jsonify(job_payload(job)), 202, {"Location": location}
+
+    @quart_app.route("/jobs/<job_id>")
+    async def job_status(job_id: str):
+        job = await asyncio.to_thread(get_job_queue().store.get, job_id)
+        if job is None:
+            abort(404)
+        return jsonify(job_payload(job))
+
+    @quart_app.route("/jobs/<job_id>/events")
+    async def job_events(job_id: str):
+        store = get_job_queue().store
+        if await asyncio.to_thread(store.get, job_id) is None:
+            abort(404)
+
+        @stream_with_context
+        async def generate():
+            status = None
+            while True:
+                job = await asyncio.to_thread(store.get, job_id)
+                if job is None:
+                    yield sse_event("error", "The job has expired.")
+                    return
+                if job.status != status:
+                    status = job.status
+                    yield sse_event("status", job_payload(job))
+                if status in FINISHED:
+                    yield sse_event("done", {})
+                    return
+                await asyncio.sleep(POLL_INTERVAL)
+
+        response = Response(
+            generate(),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+        response.timeout = None
+        return response
+
+    @quart_app.route("/jobs/<job_id>/figures/<int:position>")
+    async def job_figure(job_id: str, position: int):
+        queue = get_job_queue()
+        rendered = await asyncio.to_thread(queue.store.figure, job_id, position)
+        if rendered is None:
+            abort(404)
+        response = Response(rendered.data, mimetype=rendered.mimetype)
+        response.cache_control.private = True
+        response.cache_control.max_age = int(queue.settings.ttl)
+        return response
+
+    @quart_app.route("/figures/<key>")
+    async def figure(key: str):
+        rendered = get_image_store().get(key)
+        if rendered is None:
+            abort(404)
+        response = Response(rendered.data, mimetype=rendered.mimetype)
+        response.set_etag(key)
+        response.cache_control.public = True
+        response.cache_control.max_age = FIGURE_MAX_AGE
+        response.cache_control.immutable = True
+        return await response.make_conditional(request)
+
+    @quart_app.route("/metrics")
+    async def metrics():
+        registry = get_metrics()
+        if not registry.enabled:
+            abort(404)
+        return Response(registry.render(), content_type=CONTENT_TYPE)
+
+    @quart_app.route("/admin/profiles")
+    async def admin_profiles():
+        if ProfilerSettings.from_env() is None:
+            abort(404)
+        if not admin_authorized(request.headers.get("Authorization")):
+            abort(403)
+        return jsonify(
+            [profile.to_dict() for profile in get_profile_buffer().snapshot()]
+        )
+
+    @quart_app.after_request
+    async def count_request(response: Response) -> Response:
+        get_metrics().count_request(request.endpoint or "unknown", response.status_code)
+        return response
+
+    @quart_app.after_serving
+    async def close_clients() -> None:
+        # The pooled connections belong to this loop; close them before it stops.
+        await aclose_openai_client()
+
+    @quart_app.route("/data")
+    async def data_page():
+        context = {
+            "dataset": request.args.get("dataset"),
+            "range_columns": RANGE_COLUMNS,
+            "equality_columns": EQUALITY_COLUMNS,
+            "sortable": (),
+        }
+        try:
+            _, dataset = await selected_dataset(context["dataset"])
+            index = await asyncio.to_thread(lambda: dataset.index)
+            context["sortable"] = index.sortable
+            context["query"] = ExplorerQuery.from_args(request.args)
+            context["page"] = await asyncio.to_thread(index.query, context["query"])
+        except ValueError as e:
+            return await render_template("data.html", error=str(e), **context), 400
+        except (OSError, UnicodeDecodeError, pd.errors.ParserError) as e:
+            context["error"] = f"Error loading data: {e}"
+        return await render_template("data.html", **context)
+
+    @quart_app.route("/data/rows")
+    async def data_rows():
+        _, dataset = await selected_dataset(request.args.get("dataset"))
+        try:
+            query = ExplorerQuery.from_args(request.args)
+            index = await asyncio.to_thread(lambda: dataset.index)
+            page = await asyncio.to_thread(index.query, query)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if request.args.get("format") == "html":
+            response = Response(page.to_html(), mimetype="text/html")
+        else:
+            response = jsonify(page.to_dict())
+        response.headers["X-Total-Count"] = str(page.total)
+        return response
+
+    @quart_app.route("/questions")
+    async def example_question():
+        example_prompt = "What is the average price of cars by fuel type?"
+        return await render_template("questions.html", prompt_example=example_prompt)
+
+    return quart_app
+
+
+app = create_app()
@@ -0,0 +1,361 @@
+"""Answer a file of questions offline, through the same pipeline as `POST /`.
+
+The input is JSON Lines, one question per line:
+
+    {"id": "audi-prices", "prompt": "Plot the price of AUDIs by year."}
+    {"prompt": "How many cars per fuel type?", "dataset": "autoscout24"}
+
+`id` defaults to the line number and `dataset` to the default dataset.
+Questions are answered by `concurrency` threads, which bounds the number
+of model calls in flight; the generated code runs on a pool of
+`processes` executor processes (see `executor`), so analyses run in
+parallel instead of contending for one interpreter.
+
+Results go to an output directory:
+
+- `results.jsonl`: one record per question (status, answer, code,
+  output, error, figure paths, stage timings), appended as soon as the
+  question is answered
+- `figures/`: the rendered figures, named after the question id
+- `summary.json`: throughput and failures of the last run
+
+`results.jsonl` doubles as the checkpoint: running the same command
+again skips every question that already has a record for the same
+prompt and dataset, so an interrupted run resumes where it stopped.
+`--retry-failed` answers failed questions again; readers should take the
+last record per id.
+
+Run from the repository root:
+
+    PYTHONPATH=src python -m scientific_programming_workshop.batch \
+        questions.jsonl out/ --concurrency 8 --processes 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from .code_exec import RenderedFigure
+from .timing import StageTimings
+
+RESULTS_NAME = "results.jsonl"
+SUMMARY_NAME = "summary.json"
+FIGURES_DIR = "figures"
+DONE = "done"
+FAILED = "failed"
+
+
+@dataclass(frozen=True)
+class Question:
+    """One line of the input file."""
+
+    id: str
+    prompt: str
+    dataset: str | None = None
+
+
+def read_questions(path: Path | str) -> list[Question]:
+    """Read questions from a JSON Lines file; blank lines are ignored.
+
+    Raises ValueError for lines that are not objects with a non-empty
+    `prompt` and for duplicate ids.
+    """
+    questions: list[Question] = []
+    seen: set[str] = set()
+    with open(path, encoding="utf-8") as handle:
+        for number, line in enumerate(handle, start=1):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{number}: {e}") from e
+            if not isinstance(entry, dict) or not str(entry.get("prompt", "")).strip():
+                raise ValueError(f"{path}:{number}: expected an object with a prompt")
+            question = Question(
+                id=str(entry.get("id", number)),
+                prompt=str(entry["prompt"]),
+                dataset=entry.get("dataset") or None,
+            )
+            if question.id in seen:
+                raise ValueError(f"{path}:{number}: duplicate id {question.id!r}")
+            seen.add(question.id)
+            questions.append(question)
+    return questions
+
+
+def read_checkpoint(path: Path) -> dict[str, dict[str, Any]]:
+    """Return the last record per question id in a results file.
+
+    A record cut short by an interrupted write is dropped from the file,
+    so appending continues on a fresh line.
+    """
+    if not path.exists():
+        return {}
+    content = path.read_bytes()
+    complete = content[: content.rfind(b"\n") + 1]
+    if complete != content:
+        with open(path, "r+b") as handle:
+            handle.truncate(len(complete))
+    records: dict[str, dict[str, Any]] = {}
+    for line in complete.decode("utf-8").splitlines():
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(record, dict) and "id" in record:
+            records[str(record["id"])] = record
+    return records
+
+
+def is_answered(question: Question, record: dict[str, Any] | None, retry: bool) -> bool:
+    """Return whether `record` answers `question` and need not be run again."""
+    if record is None:
+        return False
+    if record.get("prompt") != question.prompt:
+        return False
+    if record.get("dataset") != question.dataset:
+        return False
+    return not (retry and record.get("status") == FAILED)
+
+
+def figure_name(question_id: str, position: int, figure: RenderedFigure) -> str:
+    """Return a file name for a figure of a question, safe for any id."""
+    stem = re.sub(r"[^\w.-]", "_", question_id)
+    return f"{stem}-{position}.{figure.format}"
+
+
+class BatchRun:
+    """Answer questions concurrently and append a record per question."""
+
+    def __init__(self, output: Path, *, figure_format: str) -> None:
+        """Write results, figures and the summary under `output`."""
+        self.output = output
+        self.figure_format = figure_format
+        self.figures = output / FIGURES_DIR
+        self.figures.mkdir(parents=True, exist_ok=True)
+        self._results = open(output / RESULTS_NAME, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+        self.counts = {DONE: 0, FAILED: 0}
+        self.failures: list[dict[str, str]] = []
+        self.stage_seconds: dict[str, float] = {}
+        self.stopping = False
+
+    def answer(self, question: Question) -> dict[str, Any]:
+        """Answer one question and record the outcome; never raises."""
+        from .apps.step_04 import answer_question
+        from .dataset_registry import get_dataset_registry
+        from .llm_client import api_errors
+
+        timings = StageTimings()
+        start = time.perf_counter()
+        record: dict[str, Any] = {
+            "id": question.id,
+            "prompt": question.prompt,
+            "dataset": question.dataset,
+        }
+        try:
+            registry = get_dataset_registry()
+            name = question.dataset or registry.default
+            with timings.stage("load"):
+                dataset = registry.current(name)
+            answer = answer_question(
+                question.prompt,
+                name,
+                dataset,
+                figure_format=self.figure_format,
+                timings=timings,
+            )
+        except api_errors() as e:
+            record.update(status=FAILED, error=f"Error calling OpenAI API: {str(e)}")
+        except Exception as e:  # pylint: disable=broad-except
+            record.update(status=FAILED, error=str(e) or type(e).__name__)
+        else:
+            paths = []
+            for position, figure in enumerate(answer.result.figures):
+                path = self.figures / figure_name(question.id, position, figure)
+                path.write_bytes(figure.data)
+                paths.append(path.relative_to(self.output).as_posix())
+            record.update(
+                status=FAILED if answer.result.error else DONE,
+                response=answer.gpt_response,
+                code=answer.code,
+                advice=list(answer.advice),
+                output=answer.result.stdout,
+                error=answer.result.error,
+                figures=paths,
+            )
+        record["seconds"] = round(time.perf_counter() - start, 3)
+        record["timings"] = {
+            stage: round(seconds, 4) for stage, seconds in timings.durations.items()
+        }
+        self._record(record, timings)
+        return record
+
+    def _record(self, record: dict[str, Any], timings: StageTimings) -> None:
+        with self._lock:
+            if self.stopping and record["status"] == FAILED:
+                return  # likely the interrupt itself; answer again on resume
+            self._results.write(json.dumps(record) + "\n")
+            self._results.flush()
+            self.counts[record["status"]] += 1
+            if record["status"] == FAILED:
+                self.failures.append({"id": record["id"], "error": record["error"]})
+            for stage, seconds in timings.durations.items():
+                self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+
+    def close(self) -> None:
+        """Close the results file."""
+        self._results.close()
+
+
+def run_batch(
+    questions: list[Question],
+    output: Path | str,
+    *,
+    concurrency: int = 4,
+    figure_format: str = "png",
+    retry_failed: bool = False,
+    progress: Any = None,
+) -> dict[str, Any]:
+    """Answer the questions without a record in `output`; return the summary.
+
+    `progress` (a text stream) gets one line per answered question. On
+    KeyboardInterrupt, questions not started yet are dropped, the ones
+    in flight are finished and recorded unless they failed (the
+    interrupt also reaches the executor processes), and the summary
+    says `interrupted`.
+    """
+    output = Path(output)
+    output.mkdir(parents=True, exist_ok=True)
+    checkpoint = read_checkpoint(output / RESULTS_NAME)
+    pending = [
+        question
+        for question in questions
+        if not is_answered(question, checkpoint.get(question.id), retry_failed)
+    ]
+    run = BatchRun(output, figure_format=figure_format)
+    lock = threading.Lock()
+    finished = 0
+
+    def answer(question: Question) -> None:
+        nonlocal finished
+        record = run.answer(question)
+        with lock:
+            finished += 1
+            if progress is not None:
+                print(
+                    f"[{finished}/{len(pending)}] {record['id']}: "
+                    f"{record['status']} in {record['seconds']:.1f} s",
+                    file=progress,
+                    flush=True,
+                )
+
+    start = time.perf_counter()
+    interrupted = False
+    pool = ThreadPoolExecutor(max(1, concurrency), thread_name_prefix="batch")
+    try:
+        for future in [pool.submit(answer, question) for question in pending]:
+            future.result()
+    except KeyboardInterrupt:
+        interrupted = run.stopping = True
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        run.close()
+    elapsed = time.perf_counter() - start
+
+    answered = run.counts[DONE] + run.counts[FAILED]
+    summary = {
+        "questions": len(questions),
+        "skipped": len(questions) - len(pending),
+        "answered": answered,
+        "done": run.counts[DONE],
+        "failed": run.counts[FAILED],
+        "interrupted": interrupted,
+        "seconds": round(elapsed, 3),
+        "questions_per_minute": round(answered * 60 / elapsed, 2) if elapsed else 0.0,
+        "concurrency": concurrency,
+        "mean_stage_seconds": {
+            stage: round(seconds / answered, 4)
+            for stage, seconds in run.stage_seconds.items()
+        },
+        "failures": run.failures,
+    }
+    (output / SUMMARY_NAME).write_text(json.dumps(summary, indent=2) + "\n")
+    return summary
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Answer a JSON Lines file of questions (CLI entry point).
+
+    Exits with 0 when every question was answered, 1 when some failed
+    and 130 when interrupted.
+    """
+    from .image_store import figure_format_from_env
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("questions", type=Path)
+    parser.add_argument("output", type=Path)
+    parser.add_argument(
+        "--concurrency", type=int, default=4, help="questions answered at once"
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        help="executor processes (default: EXEC_POOL_SIZE or the CPU count, "
+        "0 runs code in this process)",
+    )
+    parser.add_argument("--retry-failed", action="store_true")
+    args = parser.parse_args(argv)
+
+    try:
+        questions = read_questions(args.questions)
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 2
+    if args.processes is not None:
+        os.environ["EXEC_POOL_SIZE"] = str(args.processes)
+    elif not os.getenv("EXEC_POOL_SIZE"):
+        os.environ["EXEC_POOL_SIZE"] = str(os.cpu_count() or 1)
+
+    from .executor import get_executor_pool
+
+    pool = get_executor_pool()  # start the workers before timing the run
+    try:
+        summary = run_batch(
+            questions,
+            args.output,
+            concurrency=args.concurrency,
+            figure_format=figure_format_from_env(),
+            retry_failed=args.retry_failed,
+            progress=sys.stderr,
+        )
+    finally:
+        if pool is not None:
+            pool.close()
+
+    print(
+        f"{summary['answered']} answered ({summary['done']} done, "
+        f"{summary['failed']} failed), {summary['skipped']} skipped, "
+        f"in {summary['seconds']:.1f} s "
+        f"({summary['questions_per_minute']:.1f} per minute)"
+    )
+    for failure in summary["failures"]:
+        print(f"  {failure['id']}: {failure['error']}")
+    if summary["interrupted"]:
+        return 130
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,466 @@
+"""Static checks (and safe rewrites) for slow pandas idioms in generated code.
+
+Models often answer with row-by-row pandas code: `iterrows()` loops,
+`apply(..., axis=1)`, filtering the frame once per value inside a loop, or
+building strings with `+=`. These run orders of magnitude slower than the
+vectorized equivalents. `advise()` parses the code before it is executed
+and
+
+- rewrites the shapes whose vectorized form is equivalent:
+  `X.apply(lambda row: <column arithmetic>, axis=1)` and `iterrows()` loops
+  that only accumulate a sum or count (optionally under an `if`);
+- reports every other occurrence as a `Finding` with a hint, so callers can
+  show a performance warning or ask the model for a vectorized version
+  (`Advice.reprompt_hint()`).
+
+Rewrites replace only the affected source segment, so comments and
+formatting elsewhere in the snippet are preserved. `CODE_ADVISOR` selects
+the mode: `rewrite` (default), `warn` (report only) or `off`.
+"""
+
+from __future__ import annotations
+
+import ast
+import copy
+import os
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+_ARITHMETIC = (ast.Add, ast.Sub, ast.Mult, ast.Div)
+_ORDERING = (ast.Gt, ast.GtE, ast.Lt, ast.LtE)
+_EQUALITY = (ast.Eq, ast.NotEq)
+
+
+@dataclass(frozen=True)
+class Finding:
+    """One slow idiom found in the code."""
+
+    rule: str
+    line: int
+    message: str
+    rewritten: bool = False
+
+
+@dataclass(frozen=True)
+class Advice:
+    """The code to execute plus what the advisor found in it."""
+
+    code: str
+    findings: tuple[Finding, ...] = ()
+
+    @property
+    def rewritten(self) -> bool:
+        """Return whether any part of the code was rewritten."""
+        return any(finding.rewritten for finding in self.findings)
+
+    @property
+    def warnings(self) -> tuple[Finding, ...]:
+        """Return the findings that were left in place."""
+        return tuple(finding for finding in self.findings if not finding.rewritten)
+
+    def messages(self) -> list[str]:
+        """Return one human-readable line per finding."""
+        return [
+            f"line {finding.line}: {finding.message}"
+            + (" (rewritten)" if finding.rewritten else "")
+            for finding in self.findings
+        ]
+
+    def reprompt_hint(self) -> str:
+        """Return an instruction asking the model to avoid the slow idioms."""
+        if not self.warnings:
+            return ""
+        rules = ", ".join(sorted({finding.rule for finding in self.warnings}))
+        return (
+            f"The previous code used slow row-wise pandas patterns ({rules}). "
+            "Rewrite it with vectorized operations (column arithmetic, boolean "
+            "masks, groupby/agg) instead of Python loops over rows."
+        )
+
+
+_HINTS = {
+    "iterrows": "iterating rows with iterrows()/itertuples() is slow; "
+    "use column operations, boolean masks or groupby",
+    "apply-axis1": "apply(..., axis=1) calls Python once per row; "
+    "use column arithmetic or np.where",
+    "filter-in-loop": "filtering the frame once per value inside a loop; "
+    "use groupby(...) and aggregate once",
+    "index-loop": "looping over range(len(...)) with .loc/.iloc is slow; "
+    "operate on whole columns instead",
+    "string-concat-loop": "building a string with += in a loop; "
+    "collect the parts in a list and use ''.join()",
+}
+
+
+def _is_frame_ref(node: ast.AST) -> bool:
+    """Return whether `node` can be evaluated repeatedly without side effects."""
+    if isinstance(node, ast.Name):
+        return True
+    if isinstance(node, ast.Subscript) and _is_frame_ref(node.value):
+        key = node.slice
+        if isinstance(key, ast.Constant) and isinstance(key.value, str):
+            return True
+        return isinstance(key, ast.List) and all(
+            isinstance(item, ast.Constant) and isinstance(item.value, str)
+            for item in key.elts
+        )
+    return False
+
+
+class _Vectorizer:
+    """Translate a row-wise expression into a column-wise one."""
+
+    def __init__(
+        self, row: str, frame: ast.expr, columns: Optional[frozenset[str]]
+    ) -> None:
+        self.row = row
+        self.frame = frame
+        self.columns = columns
+        self.uses_column = False
+
+    def _column(self, node: ast.expr) -> Optional[str]:
+        if not (isinstance(node, (ast.Subscript, ast.Attribute))):
+            return None
+        if not (isinstance(node.value, ast.Name) and node.value.id == self.row):
+            return None
+        if isinstance(node, ast.Subscript):
+            key = node.slice
+            if isinstance(key, ast.Constant) and isinstance(key.value, str):
+                return key.value
+            return None
+        if self.columns is not None and node.attr in self.columns:
+            return node.attr
+        return None
+
+    def value(self, node: ast.expr) -> Optional[ast.expr]:
+        """Vectorize numeric column arithmetic; None if not possible."""
+        column = self._column(node)
+        if column is not None:
+            self.uses_column = True
+            return ast.Subscript(
+                value=copy.deepcopy(self.frame),
+                slice=ast.Constant(column),
+                ctx=ast.Load(),
+            )
+        if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+            return node
+        if isinstance(node, ast.BinOp) and isinstance(node.op, _ARITHMETIC):
+            left, right = self.value(node.left), self.value(node.right)
+            if left is None or right is None:
+                return None
+            return ast.BinOp(left=left, op=node.op, right=right)
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+            operand = self.value(node.operand)
+            return None if operand is None else ast.UnaryOp(node.op, operand)
+        return None
+
+    def mask(self, node: ast.expr) -> Optional[ast.expr]:
+        """Vectorize a row condition into a boolean mask; None if not possible."""
+        if isinstance(node, ast.BoolOp):
+            parts = [self.mask(value) for value in node.values]
+            if any(part is None for part in parts):
+                return None
+            op = ast.BitAnd() if isinstance(node.op, ast.And) else ast.BitOr()
+            combined = parts[0]
+            for part in parts[1:]:
+                combined = ast.BinOp(left=combined, op=op, right=part)
+            return combined
+        if not (isinstance(node, ast.Compare) and len(node.ops) == 1):
+            return None
+        op = node.ops[0]
+        # Each comparison must involve a column, or it isn't row-dependent.
+        side = _Vectorizer(self.row, self.frame, self.columns)
+        left = side.operand(node.left, op)
+        right = side.operand(node.comparators[0], op)
+        if left is None or right is None or not side.uses_column:
+            return None
+        self.uses_column = True
+        return ast.Compare(left=left, ops=[op], comparators=[right])
+
+    def operand(self, node: ast.expr, op: ast.cmpop) -> Optional[ast.expr]:
+        """Vectorize one side of a comparison (strings only for ==/!=)."""
+        if isinstance(op, _EQUALITY) and isinstance(node, ast.Constant):
+            return node if isinstance(node.value, (str, int, float)) else None
+        if isinstance(op, _EQUALITY + _ORDERING):
+            return self.value(node)
+        return None
+
+
+def _rewrite_apply(
+    call: ast.Call, columns: Optional[frozenset[str]]
+) -> Optional[ast.expr]:
+    """Rewrite `X.apply(lambda row: expr, axis=1)` when `expr` is arithmetic."""
+    frame = call.func.value  # type: ignore[attr-defined]
+    if len(call.args) != 1 or len(call.keywords) != 1 or not _is_frame_ref(frame):
+        return None
+    func = call.args[0]
+    if not (isinstance(func, ast.Lambda) and len(func.args.args) == 1):
+        return None
+    if func.args.vararg or func.args.kwarg or func.args.defaults:
+        return None
+    vectorizer = _Vectorizer(func.args.args[0].arg, frame, columns)
+    vectorized = vectorizer.value(func.body)
+    return vectorized if vectorizer.uses_column else None
+
+
+def _is_axis1(call: ast.Call) -> bool:
+    return any(
+        keyword.arg == "axis"
+        and isinstance(keyword.value, ast.Constant)
+        and keyword.value.value in (1, "columns")
+        for keyword in call.keywords
+    )
+
+
+def _rewrite_iterrows_loop(
+    loop: ast.For, columns: Optional[frozenset[str]], names_outside: set[str]
+) -> Optional[ast.stmt]:
+    """Rewrite a loop that only accumulates `total += <row expr>` into a sum."""
+    frame = loop.iter.func.value  # type: ignore[attr-defined]
+    target = loop.target
+    if loop.orelse or len(loop.body) != 1 or not _is_frame_ref(frame):
+        return None
+    if not (
+        isinstance(target, ast.Tuple)
+        and len(target.elts) == 2
+        and all(isinstance(elt, ast.Name) for elt in target.elts)
+    ):
+        return None
+    index_name, row_name = (elt.id for elt in target.elts)  # type: ignore[attr-defined]
+    if {index_name, row_name} & names_outside:
+        return None  # the loop variables are used after the loop
+
+    statement = loop.body[0]
+    condition = None
+    if isinstance(statement, ast.If) and not statement.orelse:
+        if len(statement.body) != 1:
+            return None
+        condition, statement = statement.test, statement.body[0]
+    if not (
+        isinstance(statement, ast.AugAssign)
+        and isinstance(statement.op, ast.Add)
+        and isinstance(statement.target, ast.Name)
+        and statement.target.id not in (index_name, row_name)
+    ):
+        return None
+
+    vectorizer = _Vectorizer(row_name, frame, columns)
+    mask = None
+    if condition is not None:
+        mask = vectorizer.mask(condition)
+        if mask is None:
+            return None
+
+    value_vectorizer = _Vectorizer(row_name, frame, columns)
+    values = value_vectorizer.value(statement.value)
+    if values is None:
+        return None
+    if value_vectorizer.uses_column:
+        if mask is not None:
+            values = ast.Subscript(value=values, slice=mask, ctx=ast.Load())
+        total: ast.expr = ast.Call(
+            func=ast.Attribute(value=values, attr="sum", ctx=ast.Load()),
+            args=[],
+            keywords=[ast.keyword(arg="skipna", value=ast.Constant(False))],
+        )
+    else:
+        # A constant per matching row: constant * number of matching rows.
+        rows = (
+            ast.Call(
+                func=ast.Name("int", ast.Load()),
+                args=[
+                    ast.Call(
+                        func=ast.Attribute(value=mask, attr="sum", ctx=ast.Load()),
+                        args=[],
+                        keywords=[],
+                    )
+                ],
+                keywords=[],
+            )
+            if mask is not None
+            else ast.Call(
+                func=ast.Name("len", ast.Load()),
+                args=[copy.deepcopy(frame)],
+                keywords=[],
+            )
+        )
+        total = ast.BinOp(left=values, op=ast.Mult(), right=rows)
+    return ast.AugAssign(
+        target=ast.Name(statement.target.id, ast.Store()), op=ast.Add(), value=total
+    )
+
+
+def _loop_targets(loop: ast.For) -> set[str]:
+    return {node.id for node in ast.walk(loop.target) if isinstance(node, ast.Name)}
+
+
+def _names_outside(tree: ast.AST, loop: ast.For) -> set[str]:
+    inside = {id(node) for node in ast.walk(loop)}
+    return {
+        node.id
+        for node in ast.walk(tree)
+        if isinstance(node, ast.Name) and id(node) not in inside
+    }
+
+
+def _is_string_piece(node: ast.expr) -> bool:
+    if isinstance(node, ast.JoinedStr):
+        return True
+    if isinstance(node, ast.Constant):
+        return isinstance(node.value, str)
+    if isinstance(node, ast.Call):
+        return isinstance(node.func, ast.Name) and node.func.id == "str"
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add):
+        return _is_string_piece(node.left) or _is_string_piece(node.right)
+    return False
+
+
+class _Analyzer(ast.NodeVisitor):
+    def __init__(self, tree: ast.Module, columns: Optional[frozenset[str]]):
+        self.tree = tree
+        self.columns = columns
+        self.findings: list[Finding] = []
+        self.replacements: list[tuple[ast.AST, ast.AST]] = []
+        self._loops: list[ast.AST] = []
+
+    def _report(self, rule: str, node: ast.AST, rewritten: bool = False) -> None:
+        self.findings.append(
+            Finding(rule, getattr(node, "lineno", 0), _HINTS[rule], rewritten)
+        )
+
+    def visit_For(self, node: ast.For) -> None:  # noqa: N802
+        iterator = node.iter
+        if (
+            isinstance(iterator, ast.Call)
+            and isinstance(iterator.func, ast.Attribute)
+            and iterator.func.attr in ("iterrows", "itertuples")
+        ):
+            rewritten = None
+            if iterator.func.attr == "iterrows" and not iterator.args:
+                rewritten = _rewrite_iterrows_loop(
+                    node, self.columns, _names_outside(self.tree, node)
+                )
+            if rewritten is not None:
+                self.replacements.append((node, rewritten))
+                self._report("iterrows", node, rewritten=True)
+                return
+            self._report("iterrows", node)
+        elif self._is_index_loop(node):
+            self._report("index-loop", node)
+        else:
+            self._check_filter_in_loop(node)
+        self._loops.append(node)
+        self.generic_visit(node)
+        self._loops.pop()
+
+    def visit_While(self, node: ast.While) -> None:  # noqa: N802
+        self._loops.append(node)
+        self.generic_visit(node)
+        self._loops.pop()
+
+    def visit_AugAssign(self, node: ast.AugAssign) -> None:  # noqa: N802
+        if (
+            self._loops
+            and isinstance(node.op, ast.Add)
+            and _is_string_piece(node.value)
+        ):
+            self._report("string-concat-loop", node)
+        self.generic_visit(node)
+
+    def visit_Call(self, node: ast.Call) -> None:  # noqa: N802
+        if (
+            isinstance(node.func, ast.Attribute)
+            and node.func.attr == "apply"
+            and _is_axis1(node)
+        ):
+            rewritten = _rewrite_apply(node, self.columns)
+            if rewritten is not None:
+                self.replacements.append((node, rewritten))
+                self._report("apply-axis1", node, rewritten=True)
+                return
+            self._report("apply-axis1", node)
+        self.generic_visit(node)
+
+    @staticmethod
+    def _is_index_loop(node: ast.For) -> bool:
+        iterator = node.iter
+        if not (
+            isinstance(iterator, ast.Call)
+            and isinstance(iterator.func, ast.Name)
+            and iterator.func.id == "range"
+            and len(iterator.args) == 1
+            and isinstance(iterator.args[0], ast.Call)
+            and isinstance(iterator.args[0].func, ast.Name)
+            and iterator.args[0].func.id == "len"
+        ):
+            return False
+        return any(
+            isinstance(child, ast.Attribute) and child.attr in ("loc", "iloc", "at")
+            for child in ast.walk(node)
+        )
+
+    def _check_filter_in_loop(self, node: ast.For) -> None:
+        targets = _loop_targets(node)
+        for child in ast.walk(node):
+            if not (
+                isinstance(child, ast.Subscript)
+                and isinstance(child.slice, ast.Compare)
+            ):
+                continue
+            names = {n.id for n in ast.walk(child.slice) if isinstance(n, ast.Name)}
+            if names & targets:
+                self._report("filter-in-loop", child)
+                return
+
+
+def _splice(code: str, replacements: Iterable[tuple[ast.AST, ast.AST]]) -> str:
+    lines = code.splitlines(keepends=True)
+    offsets = [0]
+    for line in lines:
+        offsets.append(offsets[-1] + len(line.encode("utf-8")))
+    source = code.encode("utf-8")
+
+    def position(lineno: int, col: int) -> int:
+        return offsets[lineno - 1] + col
+
+    edits = sorted(
+        (
+            position(old.lineno, old.col_offset),  # type: ignore[attr-defined]
+            position(old.end_lineno, old.end_col_offset),  # type: ignore[attr-defined]
+            ast.unparse(ast.fix_missing_locations(new)),
+        )
+        for old, new in replacements
+    )
+    for start, end, text in reversed(edits):
+        source = source[:start] + text.encode("utf-8") + source[end:]
+    return source.decode("utf-8")
+
+
+def advise(
+    code: str, *, columns: Optional[Iterable[str]] = None, rewrite: bool = True
+) -> Advice:
+    """Analyze `code`; rewrite the safe slow idioms when `rewrite` is true.
+
+    `columns` (the frame's column names) lets `row.name` attribute access be
+    recognised as a column. Code that doesn't parse is returned unchanged.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return Advice(code)
+    analyzer = _Analyzer(
+        tree, frozenset(map(str, columns)) if columns is not None else None
+    )
+    analyzer.visit(tree)
+    findings = tuple(sorted(analyzer.findings, key=lambda finding: finding.line))
+    if rewrite and analyzer.replacements:
+        return Advice(_splice(code, analyzer.replacements), findings)
+    return Advice(code, tuple(Finding(f.rule, f.line, f.message) for f in findings))
+
+
+def advise_from_env(code: str, *, columns: Optional[Iterable[str]] = None) -> Advice:
+    """Run `advise` in the mode selected by `CODE_ADVISOR`."""
+    mode = (os.getenv("CODE_ADVISOR") or "rewrite").lower()
+    if mode == "off":
+        return Advice(code)
+    return advise(code, columns=columns, rewrite=mode != "warn")
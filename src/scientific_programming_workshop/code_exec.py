@@ -6,27 +6,221 @@ import builtins
 import io
 import re
 import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
 from dataclasses import dataclass
-from typing import Any, Mapping
+from typing import Any, Callable, Iterator, Mapping, Optional
 
 import pandas as pd
 
+from .exec_cache import get_exec_cache
+from .profiling import SlowProfile, watch_execution
+
+_BLOCK = re.compile(r"```(python|sql)?(.*?)```", re.DOTALL)
+
+
+def _block_code(match: re.Match[str]) -> str:
+    # A ```sql block becomes a call of the `sql()` helper (see `sql_engine`).
+    code = match.group(2).strip()
+    if match.group(1) == "sql":
+        return f"result = sql({code!r})\nprint(result.to_string(index=False))"
+    return code
+
 
 def extract_python_code(text: str) -> str:
-    """Extract first python code block from markdown-ish text."""
-    code_blocks = re.findall(r"```(?:python)?(.*?)```", text, re.DOTALL)
-    if code_blocks:
-        return code_blocks[0].strip()
+    """Extract first python code block from markdown-ish text.
+
+    A ```sql block is turned into code that runs the query with `sql()`
+    and prints the result.
+    """
+    match = _BLOCK.search(text)
+    if match:
+        return _block_code(match)
     return text.strip()
 
 
+class CodeBlockScanner:
+    """Incrementally find the first python code block in streamed text.
+
+    Feed chunks as they arrive; `feed()` returns the extracted code as soon
+    as the closing fence of the first block has been seen, and None before
+    that (and after, since only the first block is used).
+    """
+
+    def __init__(self) -> None:
+        """Start with an empty buffer."""
+        self._parts: list[str] = []
+        self.code: Optional[str] = None
+
+    @property
+    def text(self) -> str:
+        """Return everything fed so far."""
+        return "".join(self._parts)
+
+    def feed(self, chunk: str) -> Optional[str]:
+        """Add a chunk; return the code block once it is complete."""
+        self._parts.append(chunk)
+        if self.code is not None:
+            return None
+        text = self.text
+        # Completions are a few hundred tokens, so rescanning is cheap.
+        match = _BLOCK.search(text) if text.count("```") >= 2 else None
+        if match is None:
+            return None
+        self.code = _block_code(match)
+        return self.code
+
+    def finish(self) -> str:
+        """Return the code for the full text (same rules as `extract_python_code`)."""
+        if self.code is not None:
+            return self.code
+        return extract_python_code(self.text)
+
+
+class _LineWriter(io.StringIO):
+    """StringIO that also reports each completed line to a callback."""
+
+    def __init__(self, on_line: Callable[[str], None]) -> None:
+        super().__init__()
+        self._on_line = on_line
+        self._pending = ""
+
+    def write(self, s: str) -> int:
+        written = super().write(s)
+        self._pending += s
+        *lines, self._pending = self._pending.split("\n")
+        for line in lines:
+            self._on_line(line + "\n")
+        return written
+
+    def flush_pending(self) -> None:
+        if self._pending:
+            self._on_line(self._pending)
+            self._pending = ""
+
+
+class _ThreadStdout(io.TextIOBase):
+    """`sys.stdout` stand-in that routes writes to a per-thread target.
+
+    Swapping `sys.stdout` itself is process-global, so concurrent executions
+    on different threads would print into each other's buffers (and
+    unsynchronised writes to a shared StringIO can crash the interpreter).
+    While any execution runs, `sys.stdout` is this router instead; threads
+    without a target write to the stream it replaced.
+    """
+
+    def __init__(self, fallback: Any) -> None:
+        super().__init__()
+        self.fallback = fallback
+        self.local = threading.local()
+
+    def _target(self) -> Any:
+        return getattr(self.local, "target", None) or self.fallback
+
+    def write(self, s: str) -> int:
+        return self._target().write(s)
+
+    def flush(self) -> None:
+        self._target().flush()
+
+    @property
+    def encoding(self) -> str:  # type: ignore[override]
+        return getattr(self.fallback, "encoding", "utf-8")
+
+
+_STDOUT_LOCK = threading.Lock()
+_STDOUT_USERS = 0
+
+
+@contextmanager
+def _capture_stdout(target: io.StringIO) -> Iterator[None]:
+    """Send this thread's `sys.stdout` writes to `target` inside the block."""
+    global _STDOUT_USERS  # pylint: disable=global-statement
+    with _STDOUT_LOCK:
+        if _STDOUT_USERS == 0 or not isinstance(sys.stdout, _ThreadStdout):
+            sys.stdout = _ThreadStdout(sys.stdout)
+        router = sys.stdout
+        _STDOUT_USERS += 1
+    previous = getattr(router.local, "target", None)
+    router.local.target = target
+    try:
+        yield
+    finally:
+        router.local.target = previous
+        with _STDOUT_LOCK:
+            _STDOUT_USERS -= 1
+            if _STDOUT_USERS == 0 and sys.stdout is router:
+                sys.stdout = router.fallback
+
+
+FIGURE_MIMETYPES = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+    "webp": "image/webp",
+}
+
+# pyplot keeps one figure registry per process. In-process executions that
+# may plot hold this lock so concurrent requests can't grab each other's
+# figures; executor pool workers are separate processes and never contend.
+_PYPLOT_LOCK = threading.RLock()
+_MAY_PLOT = re.compile(r"plt|plot|hist|sns|seaborn|figure|subplots|matplotlib")
+
+
+@dataclass(frozen=True)
+class RenderedFigure:
+    """An image rendered from one matplotlib figure."""
+
+    data: bytes
+    format: str
+
+    @property
+    def mimetype(self) -> str:
+        """Return the HTTP content type for the image."""
+        return FIGURE_MIMETYPES[self.format]
+
+
 @dataclass(frozen=True)
 class ExecResult:
-    """Result of executing code in the app."""
+    """Result of executing code in the app.
+
+    `wall_time` and `cpu_time` are in seconds and cover the `exec` call
+    (including rendering the plots); `figure_time` is the part spent
+    rendering figures. `figures` holds the rendered images when execution
+    was asked for a `figure_format`. `profile` is set when slow-execution
+    profiling is enabled and the run exceeded its threshold.
+    """
 
     stdout: str
     error: str
     show_graphic: bool
+    stderr: str = ""
+    wall_time: float = 0.0
+    cpu_time: float = 0.0
+    figures: tuple[RenderedFigure, ...] = ()
+    figure_time: float = 0.0
+    profile: Optional[SlowProfile] = None
+
+
+def _render_new_figures(
+    plt: Any, before: set[int], figure_format: str
+) -> tuple[RenderedFigure, ...]:
+    figures = []
+    for num in plt.get_fignums():
+        if num in before:
+            continue
+        figure = plt.figure(num)
+        buffer = io.BytesIO()
+        figure.savefig(buffer, format=figure_format)
+        plt.close(figure)
+        figures.append(RenderedFigure(buffer.getvalue(), figure_format))
+    return tuple(figures)
+
+
+def _close_new_figures(plt: Any, before: set[int]) -> None:
+    for num in plt.get_fignums():
+        if num not in before:
+            plt.close(num)
 
 
 def execute_user_code(
@@ -36,26 +230,62 @@ def execute_user_code(
     plt: Any,
     save_plot_path: str | None = None,
     extra_globals: Mapping[str, Any] | None = None,
+    on_output: Callable[[str], None] | None = None,
+    figure_format: str | None = None,
 ) -> ExecResult:
     """Execute code with a controlled globals dict and capture stdout.
 
+    If `on_output` is given it is called with each line of stdout as soon as
+    the line is complete, so callers can stream output while code runs.
+
+    With `figure_format` ("png", "svg" or "webp") every figure the code
+    creates is rendered to bytes in `ExecResult.figures` and closed, and
+    nothing is written to disk. Otherwise the current figure is saved to
+    `save_plot_path`, as in the workshop steps.
+
     Note: this intentionally keeps behaviour close to the workshop steps.
     """
-    old_stdout = sys.stdout
-    redirected_output = io.StringIO()
-    sys.stdout = redirected_output
+    redirected_output = _LineWriter(on_output) if on_output else io.StringIO()
 
     show_graphic = False
+    figures: tuple[RenderedFigure, ...] = ()
+    figure_time = 0.0
+    profile = None
     error_msg = ""
+    wall_start = time.perf_counter()
+    cpu_start = time.thread_time()
+
+    if figure_format is not None and figure_format not in FIGURE_MIMETYPES:
+        raise ValueError(f"Unsupported figure format: {figure_format!r}")
+    capture = figure_format is not None and bool(getattr(plt, "get_fignums", None))
+    lock = _PYPLOT_LOCK if capture and _MAY_PLOT.search(code) else nullcontext()
+    watch = watch_execution(code)
 
     try:
-        exec_globals: dict[str, Any] = {"data": data, "pd": pd, "plt": plt}
-        if extra_globals:
-            exec_globals.update(dict(extra_globals))
+        with _capture_stdout(redirected_output), lock:
+            before = set(plt.get_fignums()) if capture else set()
+            exec_globals: dict[str, Any] = {"data": data, "pd": pd, "plt": plt}
+            if extra_globals:
+                exec_globals.update(dict(extra_globals))
 
-        getattr(builtins, "exec")(code, exec_globals)  # nosec B102
+            try:
+                compiled = get_exec_cache().compile(code).code
+                getattr(builtins, "exec")(compiled, exec_globals)  # nosec B102
+                if capture:
+                    render_start = time.perf_counter()
+                    figures = _render_new_figures(plt, before, str(figure_format))
+                    figure_time = time.perf_counter() - render_start
+                    show_graphic = bool(figures)
+            finally:
+                if capture:
+                    _close_new_figures(plt, before)
 
-        if save_plot_path and getattr(plt, "get_fignums", None) and plt.get_fignums():
+        if (
+            not capture
+            and save_plot_path
+            and getattr(plt, "get_fignums", None)
+            and plt.get_fignums()
+        ):
             plt.savefig(save_plot_path)
             plt.close()
             show_graphic = True
@@ -75,8 +305,20 @@ def execute_user_code(
         error_msg = f"Error executing code:\n{ex}"
 
     finally:
-        sys.stdout = old_stdout
+        if isinstance(redirected_output, _LineWriter):
+            redirected_output.flush_pending()
+        if watch is not None:
+            profile = watch.finish(
+                time.perf_counter() - wall_start, time.thread_time() - cpu_start
+            )
 
     return ExecResult(
-        stdout=redirected_output.getvalue(), error=error_msg, show_graphic=show_graphic
+        stdout=redirected_output.getvalue(),
+        error=error_msg,
+        show_graphic=show_graphic,
+        wall_time=time.perf_counter() - wall_start,
+        cpu_time=time.thread_time() - cpu_start,
+        figures=figures,
+        figure_time=figure_time,
+        profile=profile,
     )
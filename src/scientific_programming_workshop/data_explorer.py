@@ -0,0 +1,411 @@
+"""Paginated, filtered and sorted pages of a dataset for the data explorer.
+
+A `DataIndex` is built once per loaded dataset (`LoadedDataset.index`)
+and answers an `ExplorerQuery` without scanning or copying the frame:
+
+- range columns (`price`, `mileage`, `hp`) keep their rows sorted by
+  value, so `price_min`/`price_max` are two binary searches and the
+  matching rows a slice of that order;
+- equality columns (`make`, `fuel_type`, `dealer_plz`) keep a hash map
+  from each value to its rows;
+- pages can be sorted by any of them: a page of the whole frame is a
+  slice of the sorted order, and a filtered page orders just the
+  matching rows by their precomputed rank.
+
+With several filters, the one matching the fewest rows picks the
+candidate rows and the others are only checked on those. Only the rows
+and columns of the requested page are copied out of the frame.
+
+Query arguments (see `ExplorerQuery.from_args`):
+
+    ?make=AUDI,BMW&price_max=20000&sort=-hp&columns=make,hp,price&offset=50
+"""
+
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass, replace
+from html import escape
+from typing import Any, Callable, Mapping, Optional
+
+import numpy as np
+import pandas as pd
+
+RANGE_COLUMNS = ("price", "mileage", "hp")
+EQUALITY_COLUMNS = ("make", "fuel_type", "dealer_plz")
+DEFAULT_LIMIT = 25
+MAX_LIMIT = 500
+
+
+def _split(text: str) -> tuple[str, ...]:
+    return tuple(part.strip() for part in text.split(",") if part.strip())
+
+
+def _number(args: Mapping[str, str], name: str) -> Optional[float]:
+    text = (args.get(name) or "").strip()
+    if not text:
+        return None
+    try:
+        value = float(text)
+    except ValueError:
+        raise ValueError(f"{name} must be a number, not {text!r}") from None
+    if np.isnan(value):
+        raise ValueError(f"{name} must be a number, not {text!r}")
+    return value
+
+
+def _count(args: Mapping[str, str], name: str, default: int) -> int:
+    text = (args.get(name) or "").strip()
+    if not text:
+        return default
+    if not text.isdigit():
+        raise ValueError(f"{name} must be a non-negative integer, not {text!r}")
+    return int(text)
+
+
+def _text(value: Any) -> str:
+    """Return how a column value is written in query arguments."""
+    if isinstance(value, (float, np.floating)) and float(value).is_integer():
+        return str(int(value))
+    return str(value)
+
+
+@dataclass(frozen=True)
+class ExplorerQuery:
+    """Filters, sort key, projected columns and position of one page."""
+
+    ranges: tuple[tuple[str, Optional[float], Optional[float]], ...] = ()
+    equals: tuple[tuple[str, tuple[str, ...]], ...] = ()
+    sort: Optional[str] = None
+    descending: bool = False
+    columns: tuple[str, ...] = ()
+    offset: int = 0
+    limit: int = DEFAULT_LIMIT
+
+    @classmethod
+    def from_args(cls, args: Mapping[str, str]) -> ExplorerQuery:
+        """Parse request arguments; raises ValueError for malformed ones.
+
+        `<range column>_min`/`_max` bound a range column (inclusive),
+        `<equality column>=a,b` keeps rows with one of the values,
+        `sort=hp` sorts ascending and `sort=-hp` in the reverse order (ties
+        too; missing values are last either way), `columns`
+        selects columns, and `offset`/`limit` (at most `MAX_LIMIT`) the page.
+        """
+        ranges = []
+        for name in RANGE_COLUMNS:
+            low, high = _number(args, f"{name}_min"), _number(args, f"{name}_max")
+            if low is not None or high is not None:
+                ranges.append((name, low, high))
+        equals = tuple(
+            (name, _split(args[name]))
+            for name in EQUALITY_COLUMNS
+            if _split(args.get(name) or "")
+        )
+        sort = (args.get("sort") or "").strip() or None
+        descending = sort is not None and sort.startswith("-")
+        return cls(
+            ranges=tuple(ranges),
+            equals=equals,
+            sort=sort[1:] if descending else sort,
+            descending=descending,
+            columns=_split(args.get("columns") or ""),
+            offset=_count(args, "offset", 0),
+            limit=min(_count(args, "limit", DEFAULT_LIMIT), MAX_LIMIT),
+        )
+
+    def to_args(self, **changes: Any) -> dict[str, str]:
+        """Return request arguments for this query with `changes` applied."""
+        query = replace(self, **changes)
+        args = {}
+        for name, low, high in query.ranges:
+            if low is not None:
+                args[f"{name}_min"] = _text(low)
+            if high is not None:
+                args[f"{name}_max"] = _text(high)
+        for name, values in query.equals:
+            args[name] = ",".join(values)
+        if query.sort is not None:
+            args["sort"] = ("-" if query.descending else "") + query.sort
+        if query.columns:
+            args["columns"] = ",".join(query.columns)
+        if query.offset:
+            args["offset"] = str(query.offset)
+        if query.limit != DEFAULT_LIMIT:
+            args["limit"] = str(query.limit)
+        return args
+
+
+@dataclass(frozen=True)
+class ExplorerPage:
+    """The rows of one page and how many rows match the query's filters."""
+
+    rows: pd.DataFrame
+    total: int
+    query: ExplorerQuery
+
+    @property
+    def first(self) -> int:
+        """Return the 1-based number of the first row shown (0 if none)."""
+        return self.query.offset + 1 if len(self.rows) else 0
+
+    @property
+    def last(self) -> int:
+        """Return the 1-based number of the last row shown."""
+        return self.query.offset + len(self.rows)
+
+    def values(self) -> list[list[Any]]:
+        """Return the rows as lists of JSON values (dates in ISO format)."""
+        return json.loads(self.rows.to_json(orient="values", date_format="iso"))
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return the page as JSON-compatible data."""
+        return {
+            "total": self.total,
+            "offset": self.query.offset,
+            "limit": self.query.limit,
+            "columns": [str(name) for name in self.rows.columns],
+            "rows": self.values(),
+        }
+
+    def to_html(self) -> str:
+        """Return the page as an HTML table fragment.
+
+        Written out directly: `DataFrame.to_html` takes ten times as long.
+        """
+        head = "".join(f"<th>{escape(str(name))}</th>" for name in self.rows.columns)
+        body = "".join(
+            "<tr>"
+            + "".join(
+                f"<td>{'' if value is None else escape(str(value))}</td>"
+                for value in row
+            )
+            + "</tr>"
+            for row in self.values()
+        )
+        return (
+            f'<table class="data"><thead><tr>{head}</tr></thead>'
+            f"<tbody>{body}</tbody></table>"
+        )
+
+
+@dataclass(frozen=True)
+class _SortedColumn:
+    """Rows in ascending order of a column's values, missing values last."""
+
+    order: np.ndarray
+    rank: np.ndarray
+    valid: int
+
+    @classmethod
+    def build(cls, keys: np.ndarray, valid: int) -> _SortedColumn:
+        # 32-bit positions halve the memory the random gathers touch.
+        dtype = np.int32 if len(keys) < 2**31 else np.intp
+        order = np.argsort(keys, kind="stable").astype(dtype, copy=False)
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order), dtype=dtype)
+        return cls(order, rank, valid)
+
+    def _keys(self, positions: np.ndarray, descending: bool) -> np.ndarray:
+        # Descending reverses the rows with a value; missing ones stay last.
+        if not descending:
+            return positions
+        return np.where(positions < self.valid, self.valid - 1 - positions, positions)
+
+    def slice(self, start: int, stop: int, descending: bool) -> np.ndarray:
+        """Return the rows at sorted positions `start` to `stop`."""
+        return self.order[self._keys(np.arange(start, stop), descending)]
+
+    def page(
+        self, rows: np.ndarray, start: int, stop: int, descending: bool
+    ) -> np.ndarray:
+        """Return `rows[start:stop]` after sorting `rows` by this column."""
+        if start >= stop:
+            return rows[:0]
+        keys = self._keys(self.rank[rows], descending)
+        if stop < len(keys):
+            # Only the first `stop` rows need to be in order.
+            first = np.argpartition(keys, stop - 1)[:stop]
+            first = first[np.argsort(keys[first])]
+        else:
+            first = np.argsort(keys)
+        return rows[first[start:stop]]
+
+
+@dataclass(frozen=True)
+class _RangeColumn:
+    """A sorted-array index: binary search over the sorted values."""
+
+    by_value: _SortedColumn
+    values: np.ndarray
+
+    @classmethod
+    def build(cls, column: pd.Series) -> _RangeColumn:
+        values = column.to_numpy(dtype="float64", na_value=np.nan)
+        valid = len(values) - int(np.isnan(values).sum())
+        by_value = _SortedColumn.build(values, valid)  # NaN sorts last
+        return cls(by_value, values[by_value.order[:valid]])
+
+    def bounds(self, low: Optional[float], high: Optional[float]) -> tuple[int, int]:
+        """Return the sorted positions of the values in `[low, high]`."""
+        start = 0 if low is None else int(np.searchsorted(self.values, low, "left"))
+        stop = len(self.values)
+        if high is not None:
+            stop = int(np.searchsorted(self.values, high, "right"))
+        return start, max(start, stop)
+
+
+@dataclass(frozen=True)
+class _HashColumn:
+    """A hash index: value -> the slice of `by_value.order` holding its rows."""
+
+    by_value: _SortedColumn
+    codes: np.ndarray
+    code_of: dict[str, int]
+    starts: np.ndarray
+    numeric: bool
+
+    @classmethod
+    def build(cls, column: pd.Series) -> _HashColumn:
+        codes, uniques = pd.factorize(column, sort=True)
+        missing = codes < 0
+        counts = np.bincount(codes[~missing], minlength=len(uniques))
+        by_value = _SortedColumn.build(
+            np.where(missing, len(uniques), codes), int(counts.sum())
+        )
+        return cls(
+            by_value,
+            codes,
+            {_text(value): code for code, value in enumerate(uniques)},
+            np.concatenate([[0], np.cumsum(counts)]),
+            pd.api.types.is_numeric_dtype(column),
+        )
+
+    def wanted(self, values: tuple[str, ...]) -> np.ndarray:
+        """Return the codes of `values`; values not in the column match nothing."""
+        if self.numeric:
+            values = tuple(_numeric_text(value) for value in values)
+        codes = {self.code_of[value] for value in values if value in self.code_of}
+        return np.array(sorted(codes), dtype=self.codes.dtype)
+
+    def rows(self, wanted: np.ndarray) -> np.ndarray:
+        """Return the rows holding one of the `wanted` codes, ascending."""
+        # A stable sort keeps the rows of each value in row order.
+        order, starts = self.by_value.order, self.starts
+        parts = [order[starts[code] : starts[code + 1]] for code in wanted]
+        if not parts:
+            return order[:0]
+        return parts[0] if len(parts) == 1 else np.sort(np.concatenate(parts))
+
+
+def _numeric_text(text: str) -> str:
+    try:
+        return _text(float(text))
+    except ValueError:
+        return text
+
+
+@dataclass(frozen=True)
+class _Filter:
+    """The rows one filter matches, and a check of it on other rows."""
+
+    rows: np.ndarray
+    check: Callable[[np.ndarray], np.ndarray]
+    sorted_by: Optional[str] = None
+
+
+class DataIndex:
+    """Sorted-array and hash indexes over the columns of one frame."""
+
+    def __init__(self, frame: pd.DataFrame) -> None:
+        """Index the range and equality columns `frame` has."""
+        if not isinstance(frame, pd.DataFrame):
+            raise ValueError("The data explorer needs a dataset held in memory.")
+        self.frame = frame
+        self._ranges = {
+            name: _RangeColumn.build(frame[name])
+            for name in RANGE_COLUMNS
+            if name in frame.columns and pd.api.types.is_numeric_dtype(frame[name])
+        }
+        self._hashes = {
+            name: _HashColumn.build(frame[name])
+            for name in EQUALITY_COLUMNS
+            if name in frame.columns
+        }
+
+    @property
+    def sortable(self) -> list[str]:
+        """Return the columns pages can be sorted and filtered by."""
+        return [*self._ranges, *self._hashes]
+
+    def _indexed(self, name: str, columns: Mapping[str, Any]) -> Any:
+        if name not in columns:
+            raise ValueError(
+                f"Cannot sort or filter by {name!r}; indexed columns: "
+                f"{', '.join(self.sortable)}"
+            )
+        return columns[name]
+
+    def _filters(self, query: ExplorerQuery) -> list[_Filter]:
+        filters = []
+        for name, low, high in query.ranges:
+            column = self._indexed(name, self._ranges)
+            start, stop = column.bounds(low, high)
+
+            def in_range(rows, rank=column.by_value.rank, start=start, stop=stop):
+                ranks = rank[rows]
+                return (ranks >= start) & (ranks < stop)
+
+            filters.append(_Filter(column.by_value.order[start:stop], in_range, name))
+        for name, values in query.equals:
+            column = self._indexed(name, self._hashes)
+            wanted = column.wanted(values)
+
+            def is_wanted(rows, codes=column.codes, wanted=wanted):
+                return np.isin(codes[rows], wanted)
+
+            filters.append(_Filter(column.rows(wanted), is_wanted))
+        return filters
+
+    def _column_positions(self, names: tuple[str, ...]) -> Any:
+        if not names:
+            return slice(None)
+        unknown = [name for name in names if name not in self.frame.columns]
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+        return [self.frame.columns.get_loc(name) for name in names]
+
+    def query(self, query: ExplorerQuery) -> ExplorerPage:
+        """Return the page `query` asks for; raises ValueError if invalid."""
+        columns = self._column_positions(query.columns)
+        by_value = None
+        if query.sort is not None:
+            by_value = self._indexed(query.sort, {**self._ranges, **self._hashes})
+            by_value = by_value.by_value
+        filters = self._filters(query)
+        rows, chosen = None, None
+        if filters:
+            chosen = min(filters, key=lambda candidate: len(candidate.rows))
+            rows = chosen.rows
+            for other in filters:
+                if other is not chosen:
+                    rows = rows[other.check(rows)]
+        total = len(self.frame) if rows is None else len(rows)
+        start = min(query.offset, total)
+        stop = min(query.offset + query.limit, total)
+
+        if rows is None:
+            # No filters: the page is a slice of the row or sorted order.
+            if by_value is None:
+                rows = slice(start, stop)
+            else:
+                rows = by_value.slice(start, stop, query.descending)
+        elif by_value is None:
+            if chosen.sorted_by is not None:
+                rows = np.sort(rows)
+            rows = rows[start:stop]
+        elif query.sort == chosen.sorted_by:
+            rows = (rows[::-1] if query.descending else rows)[start:stop]
+        else:
+            rows = by_value.page(rows, start, stop, query.descending)
+        return ExplorerPage(self.frame.iloc[rows, columns], total, query)
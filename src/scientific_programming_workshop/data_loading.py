@@ -2,19 +2,283 @@
 
 from __future__ import annotations
 
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import cached_property
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import numpy as np
 import pandas as pd
 
-from .paths import CSV_PATH
+from .aggregate_cube import AggregateCube
+from .data_explorer import DataIndex
+from .metrics import get_metrics
+from .paths import CSV_PATH, SNAPSHOT_DIR
+from .snapshot import file_sha256, load_snapshot
+
+if TYPE_CHECKING:
+    from .out_of_core import ChunkedFrame
+
+# Views handed out by `DatasetStore` share memory with the cached frame.
+# Copy-on-write (the default from pandas 3 on) guarantees that request code
+# mutating its view never changes the frame other requests see.
+pd.set_option("mode.copy_on_write", True)
+
+CATEGORICAL_COLUMNS = ("make", "fuel_type", "transmission", "dealer_city")
+DATE_COLUMN = "init_regist_dt"
+DATE_FORMAT = "%Y-%m"
+
+
+def read_autoscout_csv(path: Path | str = CSV_PATH) -> pd.DataFrame:
+    """Parse the workshop CSV with explicit dtypes."""
+    data = pd.read_csv(path, dtype={col: "category" for col in CATEGORICAL_COLUMNS})
+    if DATE_COLUMN in data.columns:
+        data[DATE_COLUMN] = pd.to_datetime(
+            data[DATE_COLUMN], format=DATE_FORMAT, errors="coerce"
+        )
+    return data
+
+
+def _schema(data: pd.DataFrame) -> list[tuple[str, str]]:
+    return [(str(name), str(dtype)) for name, dtype in data.dtypes.items()]
+
+
+def _row_hashes(data: pd.DataFrame) -> np.ndarray:
+    return pd.util.hash_pandas_object(data, index=False).to_numpy()
+
+
+def dataset_fingerprint(
+    data: pd.DataFrame, row_hashes: np.ndarray | None = None
+) -> str:
+    """Return a short hash of a frame's schema and content.
+
+    Pass `row_hashes` if they were already computed for `data`.
+    """
+    if row_hashes is None:
+        row_hashes = _row_hashes(data)
+    digest = hashlib.sha256()
+    digest.update(repr(_schema(data)).encode("utf-8"))
+    digest.update(row_hashes.tobytes())
+    return digest.hexdigest()[:16]
+
+
+@dataclass(frozen=True)
+class LoadedDataset:
+    """A cached frame together with the file state it was loaded from.
+
+    `cube` holds precomputed group-by aggregates of the frame (see
+    `aggregate_cube`), or None if the frame has no dimension/measure columns.
+    `index` holds the sorted and hash indexes of the data explorer.
+    For out-of-core datasets `frame` is a `ChunkedFrame` (see `out_of_core`).
+    """
+
+    frame: pd.DataFrame | ChunkedFrame
+    signature: tuple[int, int]
+    fingerprint: str
+    from_snapshot: bool
+    cube: AggregateCube | None = field(default=None, repr=False, compare=False)
+    row_hashes: np.ndarray | None = field(default=None, repr=False, compare=False)
+
+    def extended_by(self, data: pd.DataFrame, row_hashes: np.ndarray) -> bool:
+        """Return whether `data` is this frame with rows appended."""
+        rows = len(self.frame)
+        return (
+            self.row_hashes is not None
+            and len(data) >= rows
+            and _schema(data) == _schema(self.frame)
+            and np.array_equal(row_hashes[:rows], self.row_hashes)
+        )
+
+    def view(self) -> pd.DataFrame:
+        """Return a read-only view of the frame."""
+        return self.frame.copy(deep=False)
+
+    @cached_property
+    def index(self) -> DataIndex:
+        """Return the data explorer's indexes of the frame, built on first use.
+
+        Raises ValueError for out-of-core datasets.
+        """
+        return DataIndex(self.frame)
+
+
+class DatasetStore:
+    """Process-wide cache of a dataset file.
+
+    The file is parsed once per worker and only re-read when its mtime or
+    size changes. Every call to `get()` returns a shallow copy, so callers
+    can add, drop or overwrite columns without affecting the cached frame.
+
+    If `snapshot_dir` holds a snapshot built from the current file (see
+    `snapshot.py`), it is memory-mapped instead of parsing the CSV.
+    """
+
+    def __init__(
+        self, path: Path | str, *, snapshot_dir: Path | str | None = None
+    ) -> None:
+        """Create a store for `path`; nothing is read until first use."""
+        self.path = Path(path)
+        self.snapshot_dir = Path(snapshot_dir) if snapshot_dir else None
+        self._lock = threading.Lock()
+        self._loaded: LoadedDataset | None = None
+        self.load_count = 0
+
+    def _stat_signature(self) -> tuple[int, int]:
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    @get_metrics().timed("dataset_load")
+    def _load(
+        self, signature: tuple[int, int], previous: LoadedDataset | None = None
+    ) -> LoadedDataset:
+        data = None
+        if self.snapshot_dir is not None:
+            data = load_snapshot(
+                self.snapshot_dir, expected_sha256=file_sha256(self.path)
+            )
+        from_snapshot = data is not None
+        if data is None:
+            data = read_autoscout_csv(self.path)
+        row_hashes = _row_hashes(data)
+        if (
+            previous is not None
+            and previous.cube is not None
+            and previous.extended_by(data, row_hashes)
+        ):
+            # Rows were only appended: aggregate just the new ones.
+            cube = previous.cube.extend(data.iloc[len(previous.frame) :])
+        else:
+            cube = AggregateCube.build(data)
+        return LoadedDataset(
+            frame=data,
+            signature=signature,
+            fingerprint=dataset_fingerprint(data, row_hashes),
+            from_snapshot=from_snapshot,
+            cube=cube,
+            row_hashes=row_hashes,
+        )
+
+    def current(self) -> LoadedDataset:
+        """Return the cached dataset, reloading it if the file changed."""
+        signature = self._stat_signature()
+        loaded = self._loaded
+        if loaded is not None and loaded.signature == signature:
+            return loaded
+
+        with self._lock:
+            loaded = self._loaded
+            if loaded is None or loaded.signature != signature:
+                loaded = self._load(signature, loaded)
+                self._loaded = loaded
+                self.load_count += 1
+            return loaded
+
+    def frame(self) -> pd.DataFrame:
+        """Return the cached frame itself, reloading if the file changed.
+
+        Callers must treat the result as read-only; use `get()` otherwise.
+        """
+        return self.current().frame
+
+    def get(self) -> pd.DataFrame:
+        """Return a read-only view of the current dataset."""
+        return self.current().view()
+
+    def cube_for(self, fingerprint: str | None) -> AggregateCube | None:
+        """Return the aggregate cube if `fingerprint` is the loaded dataset's."""
+        loaded = self._loaded
+        if loaded is None or loaded.fingerprint != fingerprint:
+            return None
+        return loaded.cube
+
+    @property
+    def from_snapshot(self) -> bool:
+        """Return whether the cached frame was memory-mapped from a snapshot."""
+        loaded = self._loaded
+        return loaded is not None and loaded.from_snapshot
+
+    def clear(self) -> None:
+        """Drop the cached frame; the next access reloads it."""
+        with self._lock:
+            self._loaded = None
+
+
+_DEFAULT_STORE = DatasetStore(CSV_PATH, snapshot_dir=SNAPSHOT_DIR)
+
+
+def get_dataset_store() -> DatasetStore:
+    """Return the process-wide store for the workshop dataset."""
+    return _DEFAULT_STORE
 
 
 def load_autoscout_data() -> pd.DataFrame:
-    """Load the workshop CSV into a DataFrame."""
-    return pd.read_csv(CSV_PATH)
+    """Load the workshop CSV into a DataFrame (cached per process)."""
+    return _DEFAULT_STORE.get()
+
+
+def column_statistics(data: pd.DataFrame, top_k: int = 3) -> str:
+    """Summarise each column: nulls, numeric range, most frequent categories."""
+    nulls = data.isna().sum()
+    numeric = data.select_dtypes(include=["number", "datetime"])
+    ranges = numeric.agg(["min", "max"]) if not numeric.empty else None
+
+    lines = []
+    for name in data.columns:
+        line = f"- {name}: nulls={nulls[name]}"
+        if ranges is not None and name in ranges.columns:
+            line += f", min={ranges.at['min', name]}, max={ranges.at['max', name]}"
+        else:
+            column = data[name]
+            top = column.value_counts(sort=True).head(top_k)
+            line += f", distinct={column.nunique()}"
+            line += f", top={', '.join(f'{k} ({v})' for k, v in top.items())}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+_DESCRIPTION_CACHE: OrderedDict[tuple[str, int, bool], str] = OrderedDict()
+_DESCRIPTION_CACHE_SIZE = 32
+_DESCRIPTION_LOCK = threading.Lock()
 
 
-def describe_dataframe(data: pd.DataFrame, max_rows: int = 5) -> str:
-    """Create a compact, LLM-friendly description of a DataFrame."""
+def _build_description(data: pd.DataFrame, max_rows: int, extended: bool) -> str:
     description = f"Columns: {list(data.columns)}\n\n"
     description += f"Data types:\n{data.dtypes}\n\n"
     description += f"Example rows:\n{data.head(max_rows).to_string(index=False)}"
+    if extended:
+        description += f"\n\nColumn statistics:\n{column_statistics(data)}"
+    return description
+
+
+def describe_dataframe(
+    data: pd.DataFrame,
+    max_rows: int = 5,
+    *,
+    extended: bool = False,
+    fingerprint: str | None = None,
+) -> str:
+    """Create a compact, LLM-friendly description of a DataFrame.
+
+    Descriptions are memoized by dataset fingerprint. Pass the fingerprint
+    of a `LoadedDataset` to skip hashing `data` on every call.
+    """
+    if fingerprint is None:
+        fingerprint = dataset_fingerprint(data)
+    key = (fingerprint, max_rows, extended)
+
+    with _DESCRIPTION_LOCK:
+        description = _DESCRIPTION_CACHE.get(key)
+        if description is not None:
+            _DESCRIPTION_CACHE.move_to_end(key)
+            return description
+
+    description = _build_description(data, max_rows, extended)
+    with _DESCRIPTION_LOCK:
+        _DESCRIPTION_CACHE[key] = description
+        while len(_DESCRIPTION_CACHE) > _DESCRIPTION_CACHE_SIZE:
+            _DESCRIPTION_CACHE.popitem(last=False)
     return description
@@ -0,0 +1,284 @@
+"""Registry of the datasets available to the apps.
+
+Every `*.csv` file under `DATA_DIR` is a dataset, named by its path
+relative to the directory without the suffix, e.g. `autoscout24_data` or
+`de/2024-05` for `DATA_DIR/de/2024-05.csv`. A snapshot next to a file
+(`de/2024-05.snapshot`, see `snapshot.py`) is used like the one of the
+workshop dataset. A directory of partition files (`de/2024.parts`, see
+`out_of_core`) is an out-of-core dataset named `de/2024`: its `frame` is
+a `ChunkedFrame` that streams the files instead of loading them.
+
+A name that is not in the last scan triggers a rescan, so files added
+while the app runs are found, but at most once per `rescan_interval`
+seconds: unknown names in requests cannot make every request walk the
+directory.
+
+Nothing is read until a dataset is first used; each one then gets its own
+`DatasetStore`. The frames kept in memory are bounded by a budget: after
+a load, the least recently used other datasets are dropped until the
+loaded frames fit again (the dataset just used always stays). A dropped
+dataset is simply reloaded on its next use.
+
+Executor workers do not load the selected dataset themselves: `run_code`
+hands it over through shared memory (see `shared_data`), so adding
+datasets does not grow every worker.
+
+Configuration:
+
+- `DATA_DIR`: directory to scan (default: the repository's `data/`)
+- `DATASET`: default dataset name (default: `autoscout24_data`)
+- `DATASET_MEMORY_MB`: memory budget for loaded frames (default 1024,
+  0 for no limit)
+- `DATASET_RESCAN_SECONDS`: minimum time between rescans for unknown
+  names (default 10)
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterator, Mapping, Optional, Union
+
+import pandas as pd
+
+from .aggregate_cube import AggregateCube
+from .data_loading import DatasetStore, LoadedDataset, get_dataset_store
+from .metrics import Family, get_metrics
+from .out_of_core import MANIFEST_NAME, PartitionedStore
+from .paths import CSV_PATH, DATA_DIR, ROOT_DIR
+
+Store = Union[DatasetStore, PartitionedStore]
+
+
+class DatasetRegistry:
+    """Datasets found in a directory, loaded lazily within a memory budget."""
+
+    def __init__(
+        self,
+        data_dir: Path | str,
+        *,
+        max_bytes: int = 0,
+        default: str | None = None,
+        stores: Mapping[Path, DatasetStore] | None = None,
+        rescan_interval: float = 10.0,
+    ) -> None:
+        """Create a registry for `data_dir`; nothing is read until first use.
+
+        `max_bytes` bounds the loaded frames (0: no limit). `stores` maps
+        CSV paths to existing stores to reuse, e.g. the workshop store.
+        Unknown names rescan the directory at most every `rescan_interval`
+        seconds.
+        """
+        self.data_dir = Path(data_dir)
+        self.max_bytes = max_bytes
+        self.rescan_interval = rescan_interval
+        self._scanned_at = float("-inf")
+        self._default = default
+        self._reuse = {
+            Path(path).resolve(): store for path, store in (stores or {}).items()
+        }
+        self._lock = threading.Lock()
+        self._paths: dict[str, Path] | None = None
+        self._stores: dict[str, Store] = {}
+        # Loaded datasets, least recently used first, with their size.
+        self._loaded: OrderedDict[str, tuple[str, int]] = OrderedDict()
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls) -> DatasetRegistry:
+        """Create a registry configured by `DATA_DIR`, `DATASET` and the budget."""
+        megabytes = int(os.getenv("DATASET_MEMORY_MB") or 1024)
+        return cls(
+            os.getenv("DATA_DIR") or DATA_DIR,
+            max_bytes=megabytes * 1024 * 1024,
+            default=os.getenv("DATASET") or None,
+            stores={CSV_PATH: get_dataset_store()},
+            rescan_interval=float(os.getenv("DATASET_RESCAN_SECONDS") or 10),
+        )
+
+    def _scan(self) -> dict[str, Path]:
+        partitioned = [
+            manifest.parent
+            for manifest in self.data_dir.rglob(f"*.parts/{MANIFEST_NAME}")
+        ]
+        paths = {}
+        for path in sorted([*self.data_dir.rglob("*.csv"), *partitioned]):
+            if any(
+                part.endswith((".snapshot", ".parts")) for part in path.parent.parts
+            ):
+                continue
+            name = path.relative_to(self.data_dir).with_suffix("").as_posix()
+            paths[name] = path
+        return paths
+
+    def refresh(self) -> list[str]:
+        """Rescan the directory for datasets and return their names."""
+        with self._lock:
+            self._scanned_at = time.monotonic()
+        paths = self._scan()
+        with self._lock:
+            self._paths = paths
+        return list(paths)
+
+    def _refresh_if_stale(self) -> None:
+        """Rescan unless the last scan is less than `rescan_interval` old."""
+        with self._lock:
+            if time.monotonic() - self._scanned_at < self.rescan_interval:
+                return
+            self._scanned_at = time.monotonic()  # concurrent callers skip it
+        self.refresh()
+
+    def names(self) -> list[str]:
+        """Return the names of the available datasets, sorted."""
+        paths = self._paths
+        return list(paths) if paths is not None else self.refresh()
+
+    @property
+    def default(self) -> str:
+        """Return the name of the dataset used when none is selected."""
+        names = self.names()
+        if self._default is not None:
+            return self._default
+        workshop = CSV_PATH.stem
+        if workshop in names or not names:
+            return workshop
+        return names[0]
+
+    def path(self, name: str | None = None) -> Path:
+        """Return the CSV file or partition directory of dataset `name`.
+
+        `name` defaults to the default dataset.
+
+        Raises KeyError for unknown names.
+        """
+        name = name or self.default
+        paths = self._paths
+        if paths is None:
+            self.refresh()
+        elif name not in paths:
+            self._refresh_if_stale()  # it may have been added since the scan
+        paths = self._paths or {}
+        if name not in paths:
+            raise KeyError(f"Unknown dataset: {name!r}")
+        return paths[name]
+
+    def source(self, name: str | None = None) -> str:
+        """Return the dataset's path as shown to the model (relative if possible)."""
+        path = self.path(name)
+        try:
+            return f"./{path.resolve().relative_to(ROOT_DIR).as_posix()}"
+        except ValueError:
+            return str(path)
+
+    def store(self, name: str | None = None) -> Store:
+        """Return the store of dataset `name`, creating it (without loading)."""
+        name = name or self.default
+        path = self.path(name)
+        with self._lock:
+            store = self._stores.get(name)
+            if store is None:
+                if path.is_dir():
+                    store = PartitionedStore(path)
+                else:
+                    store = self._reuse.get(path.resolve()) or DatasetStore(
+                        path, snapshot_dir=path.with_suffix(".snapshot")
+                    )
+                self._stores[name] = store
+            return store
+
+    def current(self, name: str | None = None) -> LoadedDataset:
+        """Return dataset `name`, loading it and evicting others if needed."""
+        name = name or self.default
+        loaded = self.store(name).current()
+        with self._lock:
+            previous = self._loaded.get(name)
+            if previous is not None and previous[0] == loaded.fingerprint:
+                self._loaded.move_to_end(name)
+                return loaded
+        size = 0  # out-of-core datasets hold no rows
+        if isinstance(loaded.frame, pd.DataFrame):
+            size = int(loaded.frame.memory_usage(deep=True).sum())
+        with self._lock:
+            self._loaded[name] = (loaded.fingerprint, size)
+            self._loaded.move_to_end(name)
+            self._evict(keep=name)
+        return loaded
+
+    def _evict(self, keep: str) -> None:
+        while self.max_bytes and self.size_bytes > self.max_bytes:
+            victim = next((other for other in self._loaded if other != keep), None)
+            if victim is None:
+                return
+            del self._loaded[victim]
+            self._stores[victim].clear()
+            self.evictions += 1
+
+    @property
+    def size_bytes(self) -> int:
+        """Return the approximate memory held by the loaded frames."""
+        return sum(size for _, size in self._loaded.values())
+
+    def memory_usage(self) -> dict[str, int]:
+        """Return the approximate bytes of each loaded dataset."""
+        with self._lock:
+            return {name: size for name, (_, size) in self._loaded.items()}
+
+    def cube_for(self, fingerprint: str | None) -> AggregateCube | None:
+        """Return the aggregate cube of the loaded dataset with `fingerprint`."""
+        with self._lock:
+            stores = list(self._stores.values())
+        for store in stores:
+            cube = store.cube_for(fingerprint)
+            if cube is not None:
+                return cube
+        return None
+
+
+_REGISTRY: Optional[DatasetRegistry] = None
+_REGISTRY_LOCK = threading.Lock()
+
+
+def get_dataset_registry() -> DatasetRegistry:
+    """Return the process-wide dataset registry."""
+    global _REGISTRY  # pylint: disable=global-statement
+    if _REGISTRY is None:
+        with _REGISTRY_LOCK:
+            if _REGISTRY is None:
+                _REGISTRY = DatasetRegistry.from_env()
+    return _REGISTRY
+
+
+def _registry_metrics() -> Iterator[Family]:
+    registry = _REGISTRY
+    if registry is None:
+        return
+    yield (
+        "workshop_dataset_memory_bytes",
+        "gauge",
+        "Approximate memory held by each loaded dataset.",
+        [({"dataset": name}, size) for name, size in registry.memory_usage().items()],
+    )
+    yield (
+        "workshop_dataset_evictions_total",
+        "counter",
+        "Datasets dropped to stay within the memory budget.",
+        [({}, registry.evictions)],
+    )
+
+
+get_metrics().add_collector(_registry_metrics)
+
+
+def _after_fork_in_child() -> None:
+    # Loaded frames inherited from the parent stay valid; only the locks are reset.
+    global _REGISTRY_LOCK  # pylint: disable=global-statement
+    _REGISTRY_LOCK = threading.Lock()
+    if _REGISTRY is not None:
+        _REGISTRY._lock = threading.Lock()  # pylint: disable=protected-access
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
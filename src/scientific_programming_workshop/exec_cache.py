@@ -0,0 +1,355 @@
+"""Cache of compiled snippets and of their results.
+
+The same extracted code comes back often (cached answers, retries, popular
+questions). `ExecCache` keeps, in one LRU bounded by a byte budget:
+
+- the compiled code object per snippet (keyed by the SHA-256 of the code),
+  so repeats skip parsing and compiling;
+- for *pure* snippets, the `ExecResult` per (code, dataset fingerprint,
+  figure format), so repeats against unchanged data skip execution too.
+
+A snippet is pure when a static check finds nothing that could make two
+runs differ or have effects outside the run: no randomness, clocks, I/O,
+file writes (`to_csv`, `savefig`), `inplace=True` or assignments into
+`data`, and imports only from a small list of modules. Code that fails
+the check is compiled and cached but always executed.
+
+Configuration: `EXEC_CACHE_BYTES` (default 64 MiB, 0 disables).
+"""
+
+from __future__ import annotations
+
+import ast
+import hashlib
+import marshal
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from types import CodeType
+from typing import Any, Iterator, Optional
+
+from .metrics import Family, get_metrics
+
+PURE_MODULES = frozenset(
+    {
+        "collections",
+        "functools",
+        "itertools",
+        "math",
+        "matplotlib",
+        "numpy",
+        "operator",
+        "pandas",
+        "re",
+        "seaborn",
+        "statistics",
+        "string",
+    }
+)
+_IMPURE_NAMES = frozenset(
+    {
+        "__import__",
+        "breakpoint",
+        "compile",
+        "datetime",
+        "delattr",
+        "eval",
+        "exec",
+        "exit",
+        "getattr",
+        "globals",
+        "hash",
+        "id",
+        "input",
+        "locals",
+        "open",
+        "os",
+        "quit",
+        "random",
+        "setattr",
+        "sys",
+        "time",
+        "uuid",
+        "vars",
+    }
+)
+_IMPURE_ATTRIBUTES = frozenset(
+    {
+        "choice",
+        "now",
+        "permutation",
+        "rand",
+        "randint",
+        "randn",
+        "random",
+        "sample",
+        "savefig",
+        "shuffle",
+        "today",
+        "utcnow",
+    }
+)
+_MUTATING_METHODS = frozenset({"insert", "pop", "update"})
+_OUTPUT_KEYWORDS = ("path", "buf", "excel")
+_ENTRY_OVERHEAD = 256
+
+
+def code_digest(code: str) -> str:
+    """Return the SHA-256 hex digest of a snippet."""
+    return hashlib.sha256(code.encode("utf-8")).hexdigest()
+
+
+def _root_name(node: ast.AST) -> Optional[str]:
+    while isinstance(node, (ast.Attribute, ast.Subscript)):
+        node = node.value
+    return node.id if isinstance(node, ast.Name) else None
+
+
+def is_pure(tree: ast.AST, frame_name: str = "data") -> bool:
+    """Return whether a parsed snippet is deterministic and leaves `data` alone."""
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            modules = [node.module or ""] + [
+                f"{node.module}.{alias.name}" for alias in node.names
+            ]
+        else:
+            modules = []
+        for module in modules:
+            parts = module.split(".")
+            if parts[0] not in PURE_MODULES or "random" in parts:
+                return False
+
+        if isinstance(node, ast.Name) and node.id in _IMPURE_NAMES:
+            return False
+        if isinstance(node, ast.Attribute) and (
+            node.attr in _IMPURE_ATTRIBUTES or node.attr.startswith("_")
+        ):
+            return False
+        if isinstance(node, (ast.Global, ast.Nonlocal)):
+            return False
+        if isinstance(node, ast.Call):
+            if any(
+                keyword.arg == "inplace"
+                and not (
+                    isinstance(keyword.value, ast.Constant)
+                    and keyword.value.value is False
+                )
+                for keyword in node.keywords
+            ):
+                return False
+            func = node.func
+            if (
+                isinstance(func, ast.Attribute)
+                and func.attr.startswith("to_")
+                and (
+                    node.args
+                    or any(
+                        keyword.arg and keyword.arg.startswith(_OUTPUT_KEYWORDS)
+                        for keyword in node.keywords
+                    )
+                )
+            ):
+                return False  # to_csv(path), to_excel(writer), ...
+            if (
+                isinstance(func, ast.Attribute)
+                and func.attr in _MUTATING_METHODS
+                and _root_name(func.value) == frame_name
+            ):
+                return False
+        targets: list[ast.AST] = []
+        if isinstance(node, ast.Assign):
+            targets = list(node.targets)
+        elif isinstance(node, (ast.AugAssign, ast.AnnAssign)):
+            targets = [node.target]
+        elif isinstance(node, ast.Delete):
+            targets = list(node.targets)
+        for target in targets:
+            for part in ast.walk(target):
+                if (
+                    isinstance(part, (ast.Attribute, ast.Subscript))
+                    and _root_name(part) == frame_name
+                ):
+                    return False
+    return True
+
+
+@dataclass(frozen=True)
+class CompiledSnippet:
+    """A compiled snippet and whether its results may be cached."""
+
+    digest: str
+    code: CodeType
+    pure: bool
+
+
+@dataclass
+class ExecCacheStats:
+    """Hit/miss counters for an `ExecCache`."""
+
+    compile_hits: int = 0
+    compile_misses: int = 0
+    result_hits: int = 0
+    result_misses: int = 0
+
+
+class ExecCache:
+    """LRU of compiled snippets and pure-snippet results within a byte budget."""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024) -> None:
+        """Create a cache holding at most about `max_bytes` of entries."""
+        self.max_bytes = max_bytes
+        self.stats = ExecCacheStats()
+        self.size_bytes = 0
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple[str, ...], tuple[Any, int]] = OrderedDict()
+
+    @classmethod
+    def from_env(cls) -> ExecCache:
+        """Create a cache sized by `EXEC_CACHE_BYTES`."""
+        return cls(int(os.getenv("EXEC_CACHE_BYTES") or 64 * 1024 * 1024))
+
+    @property
+    def enabled(self) -> bool:
+        """Return whether the cache can hold entries."""
+        return self.max_bytes > 0
+
+    def _get(self, key: tuple[str, ...], counter: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            result = "hits" if entry is not None else "misses"
+            field = f"{counter}_{result}"
+            setattr(self.stats, field, getattr(self.stats, field) + 1)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def _put(self, key: tuple[str, ...], value: Any, size: int) -> None:
+        size += _ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size_bytes -= previous[1]
+            self._entries[key] = (value, size)
+            self.size_bytes += size
+            while self.size_bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.size_bytes -= evicted
+
+    def compile(self, code: str) -> CompiledSnippet:
+        """Return the compiled snippet, compiling it on a miss.
+
+        Raises SyntaxError like `compile()` for invalid code.
+        """
+        digest = code_digest(code)
+        key = ("code", digest)
+        snippet = self._get(key, "compile") if self.enabled else None
+        if snippet is not None:
+            return snippet
+        tree = ast.parse(code, "<string>", "exec")
+        snippet = CompiledSnippet(
+            digest, compile(tree, "<string>", "exec"), is_pure(tree)
+        )
+        if self.enabled:
+            self._put(key, snippet, len(code) + len(marshal.dumps(snippet.code)))
+        return snippet
+
+    @staticmethod
+    def _result_key(
+        snippet: CompiledSnippet, fingerprint: str, figure_format: str | None
+    ) -> tuple[str, ...]:
+        return ("result", snippet.digest, fingerprint, figure_format or "")
+
+    def get_result(
+        self, snippet: CompiledSnippet, fingerprint: str, figure_format: str | None
+    ) -> Any:
+        """Return the cached `ExecResult` of a pure snippet, or None."""
+        if not (self.enabled and snippet.pure):
+            return None
+        return self._get(
+            self._result_key(snippet, fingerprint, figure_format), "result"
+        )
+
+    def put_result(
+        self,
+        snippet: CompiledSnippet,
+        fingerprint: str,
+        figure_format: str | None,
+        result: Any,
+    ) -> None:
+        """Store the `ExecResult` of a pure snippet."""
+        if not (self.enabled and snippet.pure):
+            return
+        size = (
+            len(result.stdout.encode("utf-8"))
+            + len(result.stderr.encode("utf-8"))
+            + sum(len(figure.data) for figure in result.figures)
+        )
+        self._put(self._result_key(snippet, fingerprint, figure_format), result, size)
+
+    def __len__(self) -> int:
+        """Return the number of cached entries."""
+        return len(self._entries)
+
+    def clear(self) -> None:
+        """Drop all entries and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.size_bytes = 0
+            self.stats = ExecCacheStats()
+
+
+_CACHE: Optional[ExecCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_exec_cache() -> ExecCache:
+    """Return the process-wide execution cache."""
+    global _CACHE  # pylint: disable=global-statement
+    if _CACHE is None:
+        with _CACHE_LOCK:
+            if _CACHE is None:
+                _CACHE = ExecCache.from_env()
+    return _CACHE
+
+
+def _exec_cache_metrics() -> Iterator[Family]:
+    cache = get_exec_cache()
+    stats = cache.stats
+    yield (
+        "workshop_exec_cache_lookups_total",
+        "counter",
+        "Execution cache lookups by kind and result.",
+        [
+            ({"kind": "compile", "result": "hit"}, stats.compile_hits),
+            ({"kind": "compile", "result": "miss"}, stats.compile_misses),
+            ({"kind": "result", "result": "hit"}, stats.result_hits),
+            ({"kind": "result", "result": "miss"}, stats.result_misses),
+        ],
+    )
+    yield (
+        "workshop_exec_cache_bytes",
+        "gauge",
+        "Approximate bytes held by the execution cache.",
+        [({}, cache.size_bytes)],
+    )
+
+
+get_metrics().add_collector(_exec_cache_metrics)
+
+
+def _after_fork_in_child() -> None:
+    # Entries inherited from the parent stay valid; only the locks are reset.
+    global _CACHE_LOCK  # pylint: disable=global-statement
+    _CACHE_LOCK = threading.Lock()
+    if _CACHE is not None:
+        _CACHE._lock = threading.Lock()  # pylint: disable=protected-access
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
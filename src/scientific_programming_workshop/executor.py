@@ -0,0 +1,625 @@
+"""Process-pool execution engine for model-generated code.
+
+`ExecutorPool` keeps a few pre-started worker processes that have already
+imported pandas and matplotlib and loaded the dataset. Code is sent to a
+free worker over a pipe and runs there with its own `sys.stdout`, so
+concurrent requests never mix output, and a slow or runaway snippet only
+ties up its worker, never the web worker that submitted it.
+
+Per-job limits:
+
+- wall clock: the job is killed (and its worker replaced) after `wall_time`
+- CPU time: `RLIMIT_CPU` raises `ExecutionLimitExceeded` inside the job
+- memory: `RLIMIT_AS` caps the worker at its startup size + `memory_mb`
+
+The apps use the pool when `EXEC_POOL_SIZE` is set to a positive number;
+`EXEC_WALL_TIME`, `EXEC_CPU_TIME` and `EXEC_MEMORY_MB` tune the limits.
+Otherwise code runs in-process via `execute_user_code` as before.
+
+`run_code_async` is the entry point for the async app: it runs `run_code`
+on a small thread pool (`EXEC_THREADS` threads, default 4) so the event
+loop keeps serving other requests while code executes.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import io
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stderr
+from dataclasses import dataclass, replace
+from multiprocessing.connection import Connection
+from typing import Any, Callable, Iterator, Optional
+
+from .aggregate_cube import AggregateCube
+from .code_exec import ExecResult, execute_user_code
+from .data_loading import get_dataset_store
+from .dataset_registry import get_dataset_registry
+from .exec_cache import get_exec_cache
+from .metrics import Family, get_metrics
+from .out_of_core import ChunkedFrame
+from .profiling import get_profile_buffer
+from .shared_data import SharedFrameHandle, attach_frame, publish_frame
+from .sql_engine import sql_globals
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None  # type: ignore[assignment]
+
+_KEEP_CUBES = 4  # per worker, for datasets other than the workshop one
+
+
+class ExecutionLimitExceeded(RuntimeError):
+    """Raised inside a job that exceeded its CPU time limit."""
+
+
+@dataclass(frozen=True)
+class ExecLimits:
+    """Resource limits applied to every job (seconds / megabytes)."""
+
+    wall_time: float = 30.0
+    cpu_time: float = 20.0
+    memory_mb: int = 1024
+
+    @classmethod
+    def from_env(cls) -> ExecLimits:
+        """Read limits from `EXEC_*` environment variables."""
+        return cls(
+            wall_time=float(os.getenv("EXEC_WALL_TIME") or cls.wall_time),
+            cpu_time=float(os.getenv("EXEC_CPU_TIME") or cls.cpu_time),
+            memory_mb=int(os.getenv("EXEC_MEMORY_MB") or cls.memory_mb),
+        )
+
+
+@dataclass(frozen=True)
+class _Job:
+    code: str
+    save_plot_path: Optional[str]
+    stream_output: bool
+    data_handle: Optional[SharedFrameHandle | ChunkedFrame] = None
+    figure_format: Optional[str] = None
+
+
+def _address_space_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm", encoding="ascii") as statm:
+            pages = int(statm.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE")
+
+
+def _raise_cpu_limit(_signum: int, _frame: Any) -> None:
+    raise ExecutionLimitExceeded("CPU time limit exceeded")
+
+
+def _apply_memory_limit(memory_mb: int) -> None:
+    current = _address_space_bytes()
+    if resource is None or current is None or memory_mb <= 0:
+        return
+    limit = current + memory_mb * 1024 * 1024
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+def _arm_cpu_limit(cpu_time: float) -> None:
+    if resource is None or cpu_time <= 0:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    used = usage.ru_utime + usage.ru_stime
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = int(used + cpu_time) + 1
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _disarm_cpu_limit() -> None:
+    if resource is None:
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+
+
+def _attached_cube(
+    cubes: OrderedDict[str, AggregateCube | None], token: str, data: Any
+) -> AggregateCube | None:
+    """Return the cube of a frame attached from shared memory, building it once."""
+    if token not in cubes:
+        cubes[token] = AggregateCube.build(data)
+        while len(cubes) > _KEEP_CUBES:
+            cubes.popitem(last=False)
+    cubes.move_to_end(token)
+    return cubes[token]
+
+
+def _code_globals(
+    cube: AggregateCube | None, key: str | None, data: Any
+) -> Optional[dict[str, Any]]:
+    """Return the extra globals for generated code: `cube` and/or `sql`."""
+    extra = sql_globals(key, data)
+    if cube is not None:
+        extra["cube"] = cube
+    return extra or None
+
+
+def _worker_main(conn: Connection, limits: ExecLimits) -> None:
+    """Serve jobs from `conn` until it closes (runs in the worker process)."""
+    from .plotting import configure_plot_style, load_pyplot, plt
+
+    configure_plot_style()
+    load_pyplot()
+    store = get_dataset_store()
+    store.current()
+    cubes: OrderedDict[str, AggregateCube | None] = OrderedDict()
+    if hasattr(signal, "SIGXCPU"):
+        signal.signal(signal.SIGXCPU, _raise_cpu_limit)
+    _apply_memory_limit(limits.memory_mb)
+    conn.send(("ready", os.getpid()))
+
+    while True:
+        try:
+            job: _Job | None = conn.recv()
+        except (EOFError, OSError):
+            return
+        if job is None:
+            return
+
+        stderr = io.StringIO()
+        on_output = (
+            (lambda line: conn.send(("line", line))) if job.stream_output else None
+        )
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        _arm_cpu_limit(limits.cpu_time)
+        try:
+            with redirect_stderr(stderr):
+                loaded = store.current()
+                if job.data_handle is None:
+                    data, cube = loaded.view(), loaded.cube
+                    key = loaded.fingerprint
+                elif isinstance(job.data_handle, ChunkedFrame):
+                    data, cube = job.data_handle, None  # reads its own files
+                    key = data.fingerprint
+                else:
+                    data = attach_frame(job.data_handle)
+                    key = job.data_handle.token
+                    cube = store.cube_for(key)
+                    if cube is None and "cube" in job.code:
+                        # Another dataset (see `dataset_registry`).
+                        cube = _attached_cube(cubes, key, data)
+                result = execute_user_code(
+                    code=job.code,
+                    data=data,
+                    plt=plt,
+                    save_plot_path=job.save_plot_path,
+                    extra_globals=_code_globals(cube, key, data),
+                    on_output=on_output,
+                    figure_format=job.figure_format,
+                )
+        except (MemoryError, ExecutionLimitExceeded) as ex:
+            result = ExecResult(
+                stdout="",
+                error=f"Error executing code:\n{type(ex).__name__}: {ex}",
+                show_graphic=False,
+            )
+        except Exception as ex:  # pylint: disable=broad-exception-caught
+            result = ExecResult(
+                stdout="", error=f"Error executing code:\n{ex}", show_graphic=False
+            )
+        finally:
+            _disarm_cpu_limit()
+            plt.close("all")
+
+        conn.send(
+            (
+                "result",
+                replace(
+                    result,
+                    stderr=stderr.getvalue(),
+                    wall_time=time.perf_counter() - wall_start,
+                    cpu_time=time.process_time() - cpu_start,
+                ),
+            )
+        )
+
+
+class _Worker:
+    """Handle on one worker process and its pipe."""
+
+    def __init__(self, ctx: Any, limits: ExecLimits) -> None:
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(child_conn, limits),
+            name="code-executor",
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+
+    def wait_ready(self, timeout: float) -> bool:
+        try:
+            if not self.ready and self.conn.poll(timeout):
+                self.ready = self.conn.recv()[0] == "ready"
+        except (EOFError, OSError):
+            self.ready = False
+        return self.ready
+
+    def alive(self) -> bool:
+        return self.process.is_alive()
+
+    def kill(self) -> None:
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+
+
+def _default_context() -> Any:
+    methods = multiprocessing.get_all_start_methods()
+    # forkserver gives each worker a clean, single-threaded parent to fork
+    # from, which is safe even when the web server is running threads.
+    ctx = multiprocessing.get_context(
+        "forkserver" if "forkserver" in methods else "spawn"
+    )
+    if "forkserver" in methods:
+        ctx.set_forkserver_preload(
+            [
+                "pandas",
+                "scientific_programming_workshop.plotting",  # sets MPLBACKEND
+                "matplotlib.pyplot",
+            ]
+        )
+    return ctx
+
+
+class ExecutorPool:
+    """A fixed-size pool of executor processes."""
+
+    def __init__(
+        self,
+        processes: int = 2,
+        *,
+        limits: ExecLimits | None = None,
+        startup_timeout: float = 60.0,
+        mp_context: Any = None,
+    ) -> None:
+        """Start `processes` workers and wait until they have warmed up."""
+        self.limits = limits or ExecLimits()
+        self.startup_timeout = startup_timeout
+        self._ctx = mp_context or _default_context()
+        self._idle: queue.Queue[_Worker] = queue.Queue()
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._busy = 0
+        self._closed = False
+        self.size = processes
+        workers = [_Worker(self._ctx, self.limits) for _ in range(processes)]
+        for worker in workers:
+            worker.wait_ready(startup_timeout)
+            self._idle.put(worker)
+
+    @property
+    def queue_depth(self) -> int:
+        """Return the number of jobs waiting for a free worker."""
+        return self._waiting
+
+    @property
+    def busy(self) -> int:
+        """Return the number of workers currently running a job."""
+        return self._busy
+
+    def _acquire(self) -> _Worker:
+        with self._lock:
+            self._waiting += 1
+        try:
+            worker = self._idle.get()
+        finally:
+            with self._lock:
+                self._waiting -= 1
+                self._busy += 1
+        if not worker.alive() or not worker.wait_ready(self.startup_timeout):
+            worker.kill()
+            worker = _Worker(self._ctx, self.limits)
+            worker.wait_ready(self.startup_timeout)
+        return worker
+
+    def _release(self, worker: _Worker) -> None:
+        with self._lock:
+            self._busy -= 1
+        if self._closed:
+            worker.kill()
+        else:
+            self._idle.put(worker)
+
+    def run(
+        self,
+        code: str,
+        *,
+        save_plot_path: str | None = None,
+        on_output: Callable[[str], None] | None = None,
+        timeout: float | None = None,
+        data_handle: SharedFrameHandle | ChunkedFrame | None = None,
+        figure_format: str | None = None,
+    ) -> ExecResult:
+        """Run `code` on a free worker and return its result.
+
+        `data` is the frame published as `data_handle` (see `shared_data`),
+        an out-of-core `ChunkedFrame` passed as is, or the worker's own copy
+        of the workshop dataset if no handle is given. Blocks until a
+        worker is free. If the job exceeds the wall-clock limit (or its
+        worker dies) the worker is killed and replaced, and the result
+        carries an error instead of output.
+        """
+        if self._closed:
+            raise RuntimeError("ExecutorPool is closed")
+        timeout = self.limits.wall_time if timeout is None else timeout
+        worker = self._acquire()
+        start = time.perf_counter()
+        lines: list[str] = []
+        try:
+            worker.conn.send(
+                _Job(
+                    code,
+                    save_plot_path,
+                    on_output is not None,
+                    data_handle,
+                    figure_format,
+                )
+            )
+            deadline = start + timeout
+            while True:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0 or not worker.conn.poll(remaining):
+                    worker.kill()
+                    worker = _Worker(self._ctx, self.limits)
+                    return ExecResult(
+                        stdout="".join(lines),
+                        error=(
+                            "Error executing code:\n"
+                            f"Execution timed out after {timeout:g} seconds"
+                        ),
+                        show_graphic=False,
+                        wall_time=time.perf_counter() - start,
+                    )
+                kind, payload = worker.conn.recv()
+                if kind == "line":
+                    lines.append(payload)
+                    if on_output is not None:
+                        on_output(payload)
+                elif kind == "result":
+                    return payload
+        except (EOFError, OSError, BrokenPipeError):
+            worker.kill()
+            worker = _Worker(self._ctx, self.limits)
+            return ExecResult(
+                stdout="".join(lines),
+                error="Error executing code:\nExecutor process exited unexpectedly",
+                show_graphic=False,
+                wall_time=time.perf_counter() - start,
+            )
+        finally:
+            self._release(worker)
+
+    def close(self) -> None:
+        """Stop all idle workers; busy ones stop when their job finishes."""
+        self._closed = True
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+            worker.kill()
+
+    def __enter__(self) -> ExecutorPool:
+        """Use the pool as a context manager."""
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Close the pool at the end of a `with` block."""
+        self.close()
+
+
+_POOL: Optional[ExecutorPool] = None
+_POOL_PID: Optional[int] = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_executor_pool() -> Optional[ExecutorPool]:
+    """Return the process-wide pool, or None when `EXEC_POOL_SIZE` is unset/0."""
+    global _POOL, _POOL_PID  # pylint: disable=global-statement
+    size = int(os.getenv("EXEC_POOL_SIZE") or 0)
+    if size <= 0:
+        return None
+    if _POOL is not None and _POOL_PID == os.getpid():
+        return _POOL
+    with _POOL_LOCK:
+        if _POOL is None or _POOL_PID != os.getpid():
+            _POOL = ExecutorPool(size, limits=ExecLimits.from_env())
+            _POOL_PID = os.getpid()
+        return _POOL
+
+
+def run_code(
+    *,
+    code: str,
+    data: Any,
+    plt: Any,
+    save_plot_path: str | None = None,
+    on_output: Callable[[str], None] | None = None,
+    fingerprint: str | None = None,
+    figure_format: str | None = None,
+) -> ExecResult:
+    """Run code in the executor pool if configured, otherwise in-process.
+
+    With a pool, `data` is published to shared memory once per
+    `fingerprint` and mapped by the workers without copying. Without a
+    fingerprint, workers use their own copy of the workshop dataset.
+
+    If `fingerprint` is that of a loaded dataset (see `dataset_registry`),
+    the code can also use its precomputed aggregates as `cube` (see
+    `aggregate_cube`). With `QUERY_BACKEND=sql` and a `fingerprint`, it
+    can query `data` with `sql()` (see `sql_engine`).
+
+    Results of pure snippets (see `exec_cache`) run against a fingerprinted
+    dataset with a `figure_format` are cached; a repeat returns the cached
+    result, replaying its stdout to `on_output`, without running the code.
+
+    Profiles of slow executions (see `profiling`) are kept in this
+    process's profile buffer.
+    """
+    start = time.perf_counter()
+    cache = get_exec_cache()
+    snippet = None
+    if fingerprint and figure_format and not save_plot_path and cache.enabled:
+        try:
+            snippet = cache.compile(code)
+        except SyntaxError:
+            pass  # reported by the normal path
+        cached = (
+            cache.get_result(snippet, fingerprint, figure_format) if snippet else None
+        )
+        if cached is not None:
+            if on_output is not None:
+                *lines, tail = cached.stdout.split("\n")
+                for line in lines:
+                    on_output(line + "\n")
+                if tail:
+                    on_output(tail)
+            return replace(
+                cached,
+                wall_time=time.perf_counter() - start,
+                cpu_time=0.0,
+                figure_time=0.0,
+            )
+
+    pool = get_executor_pool()
+    if pool is not None:
+        handle: SharedFrameHandle | ChunkedFrame | None = None
+        if isinstance(data, ChunkedFrame):
+            handle = data  # small to pickle; workers stream the files
+        elif fingerprint:
+            handle = publish_frame(data, fingerprint)
+        result = pool.run(
+            code,
+            save_plot_path=save_plot_path,
+            on_output=on_output,
+            data_handle=handle,
+            figure_format=figure_format,
+        )
+    else:
+        cube = get_dataset_registry().cube_for(fingerprint)
+        result = execute_user_code(
+            code=code,
+            data=data,
+            plt=plt,
+            save_plot_path=save_plot_path,
+            extra_globals=_code_globals(cube, fingerprint, data),
+            on_output=on_output,
+            figure_format=figure_format,
+        )
+    if result.profile is not None:
+        get_profile_buffer().add(result.profile)
+    if snippet is not None and fingerprint and not result.error:
+        cache.put_result(
+            snippet, fingerprint, figure_format, replace(result, profile=None)
+        )
+    return result
+
+
+def _pool_metrics() -> Iterator[Family]:
+    pool = _POOL if _POOL_PID == os.getpid() else None
+    if pool is None:
+        return
+    yield (
+        "workshop_executor_queue_depth",
+        "gauge",
+        "Jobs waiting for a free executor worker.",
+        [({}, pool.queue_depth)],
+    )
+    yield (
+        "workshop_executor_busy_workers",
+        "gauge",
+        "Executor workers currently running a job.",
+        [({}, pool.busy)],
+    )
+
+
+get_metrics().add_collector(_pool_metrics)
+
+
+_OFFLOAD: Optional[ThreadPoolExecutor] = None
+
+
+def _offload_executor() -> ThreadPoolExecutor:
+    global _OFFLOAD  # pylint: disable=global-statement
+    if _OFFLOAD is None:
+        with _POOL_LOCK:
+            if _OFFLOAD is None:
+                threads = max(1, int(os.getenv("EXEC_THREADS") or 4))
+                _OFFLOAD = ThreadPoolExecutor(threads, thread_name_prefix="exec")
+    return _OFFLOAD
+
+
+async def run_code_async(
+    *,
+    code: str,
+    data: Any,
+    plt: Any,
+    on_output: Callable[[str], None] | None = None,
+    fingerprint: str | None = None,
+    figure_format: str | None = None,
+) -> ExecResult:
+    """Await `run_code` on a bounded thread pool, off the event loop.
+
+    At most `EXEC_THREADS` executions run at once; further calls queue.
+    `on_output` is called on the event loop thread, in output order.
+    """
+    loop = asyncio.get_running_loop()
+    forward = None
+    if on_output is not None:
+        callback = on_output
+
+        def forward(line: str) -> None:
+            loop.call_soon_threadsafe(callback, line)
+
+    job = functools.partial(
+        run_code,
+        code=code,
+        data=data,
+        plt=plt,
+        on_output=forward,
+        fingerprint=fingerprint,
+        figure_format=figure_format,
+    )
+    return await loop.run_in_executor(_offload_executor(), job)
+
+
+def _after_fork_in_child() -> None:
+    # The parent's workers belong to the parent; a forked child starts its own.
+    global _POOL, _POOL_PID, _POOL_LOCK, _OFFLOAD  # pylint: disable=global-statement
+    _POOL = None
+    _POOL_PID = None
+    _POOL_LOCK = threading.Lock()
+    _OFFLOAD = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -0,0 +1,246 @@
+"""A local stub server that speaks the OpenAI chat completions API.
+
+Used by tests and benchmarks to exercise the real client code path without
+network access or API costs. Point the client at it with
+`OPENAI_BASE_URL=http://127.0.0.1:<port>/v1`.
+
+Run standalone with:
+
+    PYTHONPATH=src python -m scientific_programming_workshop.fake_llm --port 8100
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Iterator
+
+DEFAULT_ANSWER = (
+    "```python\n"
+    "print(data.groupby('fuel_type', observed=True)['price'].mean().round(2))\n"
+    "```"
+)
+
+
+class FakeLLMServer:
+    """Threaded HTTP server answering `POST /v1/chat/completions`.
+
+    `answer` is either a fixed string or a callable that receives the last
+    user message and returns the reply. Every reply is delayed by `latency`
+    seconds to mimic upstream model time; streamed replies (`"stream": true`)
+    are sent word by word with `token_delay` seconds between chunks.
+    """
+
+    def __init__(
+        self,
+        *,
+        answer: str | Callable[[str], str] = DEFAULT_ANSWER,
+        latency: float = 0.0,
+        token_delay: float = 0.0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        """Bind the server; call `start()` to begin serving."""
+        self.answer = answer
+        self.latency = latency
+        self.token_delay = token_delay
+        self.request_count = 0
+        self.connection_count = 0
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        """Return the OpenAI-style base URL (ending in `/v1`)."""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def reply_for(self, prompt: str) -> str:
+        """Return the canned reply for a user prompt."""
+        return self.answer(prompt) if callable(self.answer) else self.answer
+
+    def _count(self, attribute: str) -> None:
+        with self._lock:
+            setattr(self, attribute, getattr(self, attribute) + 1)
+
+    def _handler_class(self) -> type[BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive
+            disable_nagle_algorithm = True
+
+            def setup(self) -> None:
+                super().setup()
+                server._count("connection_count")
+
+            def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+                return
+
+            def do_POST(self) -> None:  # noqa: N802
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": "not found"}})
+                    return
+
+                server._count("request_count")
+                messages = body.get("messages") or [{"content": ""}]
+                prompt = str(messages[-1].get("content", ""))
+                if server.latency:
+                    time.sleep(server.latency)
+                if body.get("stream"):
+                    self._send_stream(server.completion_chunks(body, prompt))
+                else:
+                    self._send_json(200, server.completion(body, prompt))
+
+            def _send_stream(self, chunks: Iterator[dict[str, Any]]) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for chunk in chunks:
+                    self._write_chunk(f"data: {json.dumps(chunk)}\n\n")
+                self._write_chunk("data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _write_chunk(self, text: str) -> None:
+                data = text.encode("utf-8")
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+
+            def _send_json(self, status: int, payload: dict[str, Any]) -> None:
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+    def completion(self, body: dict[str, Any], prompt: str) -> dict[str, Any]:
+        """Build a chat completion response for one request."""
+        content = self.reply_for(prompt)
+        prompt_tokens = len(prompt.split())
+        completion_tokens = len(content.split())
+        return {
+            "id": f"chatcmpl-fake-{self.request_count}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake-model"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    def completion_chunks(
+        self, body: dict[str, Any], prompt: str
+    ) -> Iterator[dict[str, Any]]:
+        """Yield streamed chat completion chunks, one word at a time.
+
+        With `stream_options.include_usage`, a last chunk without choices
+        carries the token usage, as the OpenAI API sends it.
+        """
+        words = re.findall(r"\s*\S+\s*", self.reply_for(prompt)) or [""]
+        for index, word in enumerate(words):
+            if index and self.token_delay:
+                time.sleep(self.token_delay)
+            yield {
+                "id": f"chatcmpl-fake-{self.request_count}",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "fake-model"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "delta": {"role": "assistant", "content": word},
+                        "finish_reason": "stop" if index == len(words) - 1 else None,
+                    }
+                ],
+            }
+        if (body.get("stream_options") or {}).get("include_usage"):
+            prompt_tokens = len(prompt.split())
+            yield {
+                "id": f"chatcmpl-fake-{self.request_count}",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "fake-model"),
+                "choices": [],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": len(words),
+                    "total_tokens": prompt_tokens + len(words),
+                },
+            }
+
+    def serve_forever(self) -> None:
+        """Serve requests on the calling thread until interrupted."""
+        try:
+            self._httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._httpd.server_close()
+
+    def start(self) -> FakeLLMServer:
+        """Serve requests on a background thread."""
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, name="fake-llm", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and close the listening socket."""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> FakeLLMServer:
+        """Start the server for the duration of a `with` block."""
+        return self.start()
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Stop the server at the end of a `with` block."""
+        self.stop()
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run the stub server in the foreground (CLI entry point)."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--token-delay", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    server = FakeLLMServer(
+        host=args.host,
+        port=args.port,
+        latency=args.latency,
+        token_delay=args.token_delay,
+    )
+    print(f"Fake OpenAI API on {server.base_url}")
+    server.serve_forever()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,184 @@
+"""Content-addressed store for rendered figures.
+
+Each image is stored under the SHA-256 of its bytes, so identical charts
+share one entry and a URL never changes meaning; responses can therefore
+be cached by browsers indefinitely. The store is an in-memory LRU bounded
+by a byte budget (`FIGURE_CACHE_BYTES`, default 64 MiB), backed by a
+directory that all workers on the host share (`FIGURE_DIR`, default a
+directory under the system temp dir; `off` keeps figures in memory only).
+The `<img>` request for a figure may reach a different worker than the
+one that rendered it; that worker reads the file. The directory is
+trimmed to the same byte budget, oldest files first, and a file is only
+served if its bytes still hash to its name.
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from .code_exec import FIGURE_MIMETYPES, RenderedFigure
+
+
+def figure_data_uri(figure: RenderedFigure) -> str:
+    """Return the figure as a base64 `data:` URI for inlining in HTML."""
+    encoded = base64.b64encode(figure.data).decode("ascii")
+    return f"data:{figure.mimetype};base64,{encoded}"
+
+
+_KEY = re.compile(r"([0-9a-f]{64})\.(\w+)")
+
+
+class ImageStore:
+    """LRU of rendered figures keyed by content hash, optionally on disk."""
+
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        directory: Path | str | None = None,
+        *,
+        trim_every: int = 50,
+    ) -> None:
+        """Create an empty store holding at most `max_bytes` of images.
+
+        With `directory`, figures are also written there and read back by
+        any process using the same directory; the directory is trimmed to
+        `max_bytes` every `trim_every` new files.
+        """
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.directory = Path(directory) if directory is not None else None
+        if self.directory is not None:
+            self.directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+        self.trim_every = max(1, trim_every)
+        self._lock = threading.Lock()
+        self._images: OrderedDict[str, RenderedFigure] = OrderedDict()
+        self._written = 0
+
+    @classmethod
+    def from_env(cls) -> ImageStore:
+        """Create from `FIGURE_CACHE_BYTES` and `FIGURE_DIR`."""
+        max_bytes = int(os.getenv("FIGURE_CACHE_BYTES") or 64 * 1024 * 1024)
+        directory: Path | str | None = os.getenv("FIGURE_DIR") or _default_directory()
+        if str(directory).strip().lower() in ("off", "0", "false"):
+            directory = None
+        return cls(max_bytes, directory)
+
+    def put(self, figure: RenderedFigure) -> str:
+        """Store a figure and return its key (`<sha256>.<format>`)."""
+        key = f"{hashlib.sha256(figure.data).hexdigest()}.{figure.format}"
+        with self._lock:
+            if key in self._images:
+                self._images.move_to_end(key)
+                return key
+            self._remember(key, figure)
+        if self.directory is not None:
+            self._write(key, figure)
+        return key
+
+    def get(self, key: str) -> Optional[RenderedFigure]:
+        """Return the figure stored under `key`, if still present."""
+        with self._lock:
+            figure = self._images.get(key)
+            if figure is not None:
+                self._images.move_to_end(key)
+                return figure
+        match = _KEY.fullmatch(key)
+        if self.directory is None or match is None:
+            return None
+        digest, figure_format = match.groups()
+        if figure_format not in FIGURE_MIMETYPES:
+            return None
+        try:
+            data = (self.directory / key).read_bytes()
+        except OSError:
+            return None
+        if hashlib.sha256(data).hexdigest() != digest:
+            return None
+        figure = RenderedFigure(data, figure_format)
+        with self._lock:
+            self._remember(key, figure)
+        return figure
+
+    def _remember(self, key: str, figure: RenderedFigure) -> None:
+        if key in self._images:
+            return
+        self._images[key] = figure
+        self.total_bytes += len(figure.data)
+        while self.total_bytes > self.max_bytes and len(self._images) > 1:
+            _, evicted = self._images.popitem(last=False)
+            self.total_bytes -= len(evicted.data)
+
+    def _write(self, key: str, figure: RenderedFigure) -> None:
+        path = self.directory / key
+        try:
+            if path.exists():
+                os.utime(path)  # keep recently used figures through trims
+                return
+            temporary = path.with_suffix(f".{os.getpid()}.tmp")
+            temporary.write_bytes(figure.data)
+            os.replace(temporary, path)
+        except OSError:
+            return  # still served from memory by this worker
+        with self._lock:
+            self._written += 1
+            due = self._written % self.trim_every == 0
+        if due:
+            self.trim()
+
+    def trim(self) -> None:
+        """Remove the oldest files until the directory fits `max_bytes`."""
+        if self.directory is None:
+            return
+        files = []
+        for entry in os.scandir(self.directory):
+            try:
+                status = entry.stat()
+            except OSError:
+                continue
+            files.append((status.st_mtime, status.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            total -= size
+
+    def __len__(self) -> int:
+        """Return the number of images held in memory."""
+        return len(self._images)
+
+
+def _default_directory() -> Path:
+    user = os.getuid() if hasattr(os, "getuid") else 0
+    return Path(tempfile.gettempdir()) / f"workshop-figures-{user}"
+
+
+_STORE: Optional[ImageStore] = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_image_store() -> ImageStore:
+    """Return the process-wide image store."""
+    global _STORE  # pylint: disable=global-statement
+    if _STORE is None:
+        with _STORE_LOCK:
+            if _STORE is None:
+                _STORE = ImageStore.from_env()
+    return _STORE
+
+
+def figure_format_from_env() -> str:
+    """Return the configured output format (`FIGURE_FORMAT`, default png)."""
+    figure_format = (os.getenv("FIGURE_FORMAT") or "png").lower()
+    return figure_format if figure_format in FIGURE_MIMETYPES else "png"
@@ -0,0 +1,256 @@
+"""Answer simple aggregate questions locally, without a model round trip.
+
+Many prompts are one of a few shapes:
+
+- "average price by fuel type" (also median/total/min/max)
+- "number of cars per make", "how many cars per transmission"
+- "top 5 makes by price", "3 cheapest makes"
+- "average mileage" (over all cars)
+
+`route_prompt()` matches the whole prompt against these templates, with
+column names and synonyms taken from the dataset schema, and returns a
+`RoutedAnswer`: a short explanation plus a fenced, vectorized pandas
+snippet (reading from the aggregate cube when it covers the question).
+The apps treat it like a model answer, so it is extracted, executed and
+rendered exactly as one. Prompts that don't match completely, e.g. any
+request for a chart, go to the model as before.
+
+`INTENT_ROUTER=off` disables routing.
+"""
+
+from __future__ import annotations
+
+import functools
+import os
+import re
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import pandas as pd
+
+from .aggregate_cube import DIMENSIONS, STATS, AggregateCube
+from .out_of_core import ChunkedFrame, ChunkedGroupBy
+
+SYNONYMS = {
+    "make": ("brand", "brands", "manufacturer", "manufacturers", "car make"),
+    "fuel_type": ("fuel", "fuel type", "fuel types", "fuels"),
+    "transmission": ("transmission type", "transmission types", "gearbox"),
+    "init_regist_year": (
+        "year",
+        "years",
+        "registration year",
+        "first registration year",
+        "year of registration",
+        "year of first registration",
+    ),
+    "dealer_city": ("city", "cities", "dealer city", "dealer cities"),
+    "price": ("prices", "listing price", "selling price", "cost"),
+    "mileage": ("km", "kilometers", "kilometres", "milage"),
+    "hp": ("horsepower", "horse power", "power"),
+}
+
+_AGGREGATES = {
+    "average": "mean",
+    "avg": "mean",
+    "mean": "mean",
+    "median": "median",
+    "total": "sum",
+    "sum": "sum",
+    "minimum": "min",
+    "min": "min",
+    "lowest": "min",
+    "smallest": "min",
+    "maximum": "max",
+    "max": "max",
+    "highest": "max",
+    "largest": "max",
+}
+_NUMBERS = {
+    "three": 3,
+    "five": 5,
+    "ten": 10,
+    "twenty": 20,
+}
+
+_AGG = "|".join(_AGGREGATES)
+_ROWS = r"(?:cars|vehicles|listings|offers|rows|entries)"
+_PREFIX = (
+    r"(?:(?:what is|what's|what are|show me|show|give me|get|compute|calculate|"
+    r"list|tell me|display|provide|find)\s+)?"
+    r"(?:(?:a\s+)?(?:pivot\s+)?table\s+(?:with|of)\s+)?(?:the\s+)?"
+)
+_BY = r"\s+(?:by|per|for each|for every|in each|grouped by|across)\s+(?:the\s+)?"
+_OF_ROWS = rf"(?:\s+(?:of|for|over)\s+(?:the\s+|all\s+)?{_ROWS})?"
+_TERM = r"[a-z0-9_ ]+?"
+
+_PATTERNS = {
+    "aggregate": re.compile(
+        rf"{_PREFIX}(?P<agg>{_AGG})\s+(?:of\s+)?(?:the\s+)?(?P<measure>{_TERM})"
+        rf"{_OF_ROWS}{_BY}(?P<dim>{_TERM})"
+    ),
+    "count": re.compile(
+        rf"{_PREFIX}(?:(?:number|count)\s+of\s+{_ROWS}"
+        rf"|how many\s+{_ROWS}(?:\s+(?:are there|there are))?"
+        rf"|{_ROWS}\s+count){_BY}(?P<dim>{_TERM})"
+    ),
+    "top": re.compile(
+        rf"{_PREFIX}(?P<order>top|bottom)\s+(?P<n>\d+|{'|'.join(_NUMBERS)})\s+"
+        rf"(?P<dim>{_TERM})\s+by\s+(?:(?P<agg>{_AGG})\s+)?(?P<measure>{_TERM})"
+    ),
+    "ranked": re.compile(
+        rf"{_PREFIX}(?:top\s+)?(?P<n>\d+|{'|'.join(_NUMBERS)})\s+"
+        rf"(?P<order>most expensive|cheapest)\s+(?P<dim>{_TERM})"
+    ),
+    "overall": re.compile(
+        rf"{_PREFIX}(?P<agg>{_AGG})\s+(?:of\s+)?(?:the\s+)?(?P<measure>{_TERM})"
+        rf"{_OF_ROWS}"
+    ),
+}
+
+
+@dataclass(frozen=True)
+class RoutedAnswer:
+    """A locally generated answer in the same shape as a model answer."""
+
+    intent: str
+    code: str
+    description: str
+
+    @property
+    def text(self) -> str:
+        """Return the answer as the model would have written it."""
+        return (
+            f"Answered without the model: {self.description}.\n\n"
+            f"```python\n{self.code}\n```"
+        )
+
+
+def _normalise(prompt: str) -> str:
+    text = re.sub(r"[\"'`´’]", " ", prompt.lower())
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.rstrip("?!. ")
+
+
+@functools.lru_cache(maxsize=16)
+def _vocabulary(
+    schema: tuple[tuple[str, str, str], ...],
+) -> tuple[dict[str, str], dict[str, str]]:
+    """Return phrase -> column maps for dimensions and measures."""
+    dimensions: dict[str, str] = {}
+    measures: dict[str, str] = {}
+    for column, kind, dtype in schema:
+        if dtype == "category" or column in DIMENSIONS:
+            target = dimensions
+        elif kind in "iuf":
+            target = measures
+        else:
+            continue
+        spoken = column.replace("_", " ")
+        for phrase in (column, spoken, *SYNONYMS.get(column, ())):
+            for form in (phrase, f"{phrase}s", f"{phrase}es"):
+                target.setdefault(form, column)
+    return dimensions, measures
+
+
+def _count(text: str) -> int:
+    return int(text) if text.isdigit() else _NUMBERS[text]
+
+
+def _grouped(
+    measure: str, dim: str, stat: str, cube: Optional[AggregateCube], data: Any
+) -> Optional[str]:
+    if cube is not None and stat in STATS and cube.covers(dim, measure):
+        return f"cube.query({dim!r}, {measure!r}, {stat!r})"
+    if isinstance(data, ChunkedFrame) and not hasattr(ChunkedGroupBy, stat):
+        return None  # e.g. no exact median out of core; leave it to the model
+    return f"data.groupby({dim!r}, observed=True)[{measure!r}].{stat}()"
+
+
+def _print(expression: str, stat: str) -> str:
+    rounded = ".round(2)" if stat in ("mean", "median") else ""
+    return f"result = {expression}{rounded}\nprint(result.to_string())"
+
+
+def route_prompt(
+    prompt: str, data: pd.DataFrame, *, cube: Optional[AggregateCube] = None
+) -> Optional[RoutedAnswer]:
+    """Return a local answer for `prompt`, or None if the model is needed.
+
+    Only prompts that match a template in full and name known columns are
+    routed. With a `cube` (the dataset's precomputed aggregates), covered
+    group-bys read from it instead of grouping `data`. Group-bys that an
+    out-of-core `data` (a `ChunkedFrame`) doesn't support, e.g. medians,
+    are left to the model.
+    """
+    text = _normalise(prompt)
+    dimensions, measures = _vocabulary(
+        tuple(
+            (str(column), dtype.kind, str(dtype))
+            for column, dtype in data.dtypes.items()
+        )
+    )
+
+    for intent, pattern in _PATTERNS.items():
+        match = pattern.fullmatch(text)
+        if match is None:
+            continue
+        groups = match.groupdict()
+        dim = dimensions.get(groups.get("dim") or "")
+        measure = measures.get(groups.get("measure") or "")
+
+        if intent == "aggregate" and dim and measure:
+            stat = _AGGREGATES[groups["agg"]]
+            expression = _grouped(measure, dim, stat, cube, data)
+            if expression is None:
+                return None
+            return RoutedAnswer(
+                intent,
+                _print(expression, stat),
+                f"{stat} of {measure} by {dim}",
+            )
+        if intent == "count" and dim:
+            if cube is not None and cube.covers(dim):
+                expression = f"cube.size({dim!r})"
+            else:
+                expression = f"data.groupby({dim!r}, observed=True).size()"
+            return RoutedAnswer(
+                intent,
+                _print(f"{expression}.sort_values(ascending=False)", "size"),
+                f"number of rows by {dim}",
+            )
+        if intent in ("top", "ranked") and dim:
+            if intent == "ranked":
+                measure, stat = "price", "mean"
+                largest = groups["order"] == "most expensive"
+            else:
+                stat = _AGGREGATES[groups["agg"] or "average"]
+                largest = groups["order"] == "top"
+            if measure not in measures.values():
+                return None
+            expression = _grouped(measure, dim, stat, cube, data)
+            if expression is None:
+                return None
+            count = _count(groups["n"])
+            method = "nlargest" if largest else "nsmallest"
+            return RoutedAnswer(
+                intent,
+                _print(f"{expression}.{method}({count})", stat),
+                f"{'top' if largest else 'bottom'} {count} {dim} by {stat} {measure}",
+            )
+        if intent == "overall" and measure:
+            stat = _AGGREGATES[groups["agg"]]
+            return RoutedAnswer(
+                intent,
+                f"print(round(data[{measure!r}].{stat}(), 2))",
+                f"{stat} of {measure}",
+            )
+    return None
+
+
+def route_from_env(
+    prompt: str, data: pd.DataFrame, *, cube: Optional[AggregateCube] = None
+) -> Optional[RoutedAnswer]:
+    """Run `route_prompt` unless `INTENT_ROUTER=off`."""
+    if (os.getenv("INTENT_ROUTER") or "on").lower() in ("off", "0", "false"):
+        return None
+    return route_prompt(prompt, data, cube=cube)
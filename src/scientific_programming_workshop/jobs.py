@@ -0,0 +1,431 @@
+"""Background jobs for questions that take too long for one request.
+
+`POST /jobs` records a queued job and returns its id at once. A small
+thread pool in the worker process (`JOB_WORKERS`, default 2) then runs
+the question through the same pipeline as `POST /`. Jobs and their
+results (answer, code, stdout, error and figure bytes) are kept in a
+SQLite database shared by all workers on the host, so clients can poll
+`GET /jobs/<id>` or subscribe to `GET /jobs/<id>/events` on any of them.
+
+- `JOB_DB`: database file (default: a private file under the system
+  temp dir)
+- `JOB_TTL`: seconds a job is kept after it finished (default 3600);
+  jobs of a worker that died before finishing them expire as well
+- `JOB_QUEUE_MAX`: queued jobs a worker accepts (default 100); further
+  submissions are refused instead of waiting indefinitely
+
+Queue depth and busy job workers are returned by `GET /jobs` and
+exported as metrics.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import secrets
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+
+from .code_exec import RenderedFigure
+from .metrics import Family, get_metrics
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+FINISHED = (DONE, FAILED)
+
+# How often event streams check the store for status changes (seconds).
+POLL_INTERVAL = 0.25
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    prompt TEXT NOT NULL,
+    dataset TEXT NOT NULL,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    expires REAL NOT NULL,
+    result TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_expires ON jobs (expires);
+CREATE TABLE IF NOT EXISTS job_figures (
+    job_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    format TEXT NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (job_id, position)
+);
+"""
+
+
+class QueueFull(RuntimeError):
+    """Raised when a worker already holds `JOB_QUEUE_MAX` queued jobs."""
+
+
+def _default_database() -> Path:
+    user = os.getuid() if hasattr(os, "getuid") else 0
+    return Path(tempfile.gettempdir()) / f"workshop-jobs-{user}.sqlite3"
+
+
+@dataclass(frozen=True)
+class JobSettings:
+    """Worker threads, database file, retention and queue limit."""
+
+    workers: int = 2
+    database: Path = field(default_factory=_default_database)
+    ttl: float = 3600.0
+    max_queued: int = 100
+
+    @classmethod
+    def from_env(cls) -> JobSettings:
+        """Read settings from `JOB_*` environment variables."""
+        database = os.getenv("JOB_DB")
+        return cls(
+            workers=max(1, int(os.getenv("JOB_WORKERS") or cls.workers)),
+            database=Path(database) if database else _default_database(),
+            ttl=float(os.getenv("JOB_TTL") or cls.ttl),
+            max_queued=int(os.getenv("JOB_QUEUE_MAX") or cls.max_queued),
+        )
+
+
+@dataclass(frozen=True)
+class JobResult:
+    """What a finished job produced."""
+
+    response: str
+    code: str
+    advice: tuple[str, ...] = ()
+    output: str = ""
+    error: str = ""
+    figures: tuple[RenderedFigure, ...] = ()
+
+
+@dataclass(frozen=True)
+class Job:
+    """A job as recorded in the store.
+
+    `result` holds the `JobResult` fields except the figures (of which
+    `figures` is the count) once the job is done; `error` is set if the
+    job failed.
+    """
+
+    id: str
+    status: str
+    prompt: str
+    dataset: str
+    created: float
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    result: Optional[dict[str, Any]] = None
+    error: str = ""
+    figures: int = 0
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return the job as JSON-compatible data."""
+        data: dict[str, Any] = {
+            "id": self.id,
+            "status": self.status,
+            "prompt": self.prompt,
+            "dataset": self.dataset,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+        }
+        if self.result is not None:
+            data["result"] = self.result
+        if self.error:
+            data["error"] = self.error
+        return data
+
+
+class JobStore:
+    """Jobs and their results in a SQLite file, shared between processes.
+
+    Each thread gets its own connection; the database runs in WAL mode so
+    polling readers do not block the workers writing results.
+    """
+
+    def __init__(self, path: Path | str, *, ttl: float = 3600.0) -> None:
+        """Open (and create if needed) the database at `path`."""
+        self.path = Path(path)
+        self.ttl = ttl
+        self._local = threading.local()
+        self._last_sweep = 0.0
+        with self._connect() as connection:
+            connection.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30.0)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.row_factory = sqlite3.Row
+            self._local.connection = connection
+        return connection
+
+    def create(self, prompt: str, dataset: str) -> Job:
+        """Record a new queued job and return it."""
+        self.sweep()
+        job = Job(secrets.token_urlsafe(12), QUEUED, prompt, dataset, time.time())
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT INTO jobs (id, status, prompt, dataset, created, expires)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    job.id,
+                    job.status,
+                    prompt,
+                    dataset,
+                    job.created,
+                    job.created + self.ttl,
+                ),
+            )
+        return job
+
+    def start(self, job_id: str) -> None:
+        """Mark a job as running."""
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE jobs SET status = ?, started = ? WHERE id = ?",
+                (RUNNING, time.time(), job_id),
+            )
+
+    def finish(self, job_id: str, result: JobResult) -> None:
+        """Store the result of a job and mark it done."""
+        fields = {
+            "response": result.response,
+            "code": result.code,
+            "advice": list(result.advice),
+            "output": result.output,
+            "error": result.error,
+        }
+        now = time.time()
+        with self._connect() as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO job_figures (job_id, position, format, data)"
+                " VALUES (?, ?, ?, ?)",
+                [
+                    (job_id, position, figure.format, figure.data)
+                    for position, figure in enumerate(result.figures)
+                ],
+            )
+            connection.execute(
+                "UPDATE jobs SET status = ?, finished = ?, expires = ?, result = ?"
+                " WHERE id = ?",
+                (DONE, now, now + self.ttl, json.dumps(fields), job_id),
+            )
+
+    def fail(self, job_id: str, error: str) -> None:
+        """Mark a job as failed with `error`."""
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE jobs SET status = ?, finished = ?, expires = ?, result = ?"
+                " WHERE id = ?",
+                (FAILED, now, now + self.ttl, json.dumps({"error": error}), job_id),
+            )
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Return the job with `job_id`, or None if unknown or expired."""
+        connection = self._connect()
+        row = connection.execute(
+            "SELECT *, (SELECT COUNT(*) FROM job_figures WHERE job_id = jobs.id)"
+            " AS figures FROM jobs WHERE id = ? AND expires >= ?",
+            (job_id, time.time()),
+        ).fetchone()
+        if row is None:
+            return None
+        stored = json.loads(row["result"]) if row["result"] else None
+        failed = row["status"] == FAILED
+        return Job(
+            id=row["id"],
+            status=row["status"],
+            prompt=row["prompt"],
+            dataset=row["dataset"],
+            created=row["created"],
+            started=row["started"],
+            finished=row["finished"],
+            result=None if failed else stored,
+            error=stored["error"] if failed and stored else "",
+            figures=row["figures"],
+        )
+
+    def figure(self, job_id: str, position: int) -> Optional[RenderedFigure]:
+        """Return figure number `position` of a job, or None."""
+        row = (
+            self._connect()
+            .execute(
+                "SELECT format, data FROM job_figures WHERE job_id = ? AND position = ?"
+                " AND EXISTS (SELECT 1 FROM jobs WHERE id = ? AND expires >= ?)",
+                (job_id, position, job_id, time.time()),
+            )
+            .fetchone()
+        )
+        return RenderedFigure(row["data"], row["format"]) if row else None
+
+    def counts(self) -> dict[str, int]:
+        """Return the number of unexpired jobs per status, on all workers."""
+        rows = (
+            self._connect()
+            .execute(
+                "SELECT status, COUNT(*) AS n FROM jobs WHERE expires >= ?"
+                " GROUP BY status",
+                (time.time(),),
+            )
+            .fetchall()
+        )
+        counts = dict.fromkeys((QUEUED, RUNNING, DONE, FAILED), 0)
+        counts.update({row["status"]: row["n"] for row in rows})
+        return counts
+
+    def sweep(self) -> int:
+        """Delete expired jobs (at most once a minute); return how many."""
+        now = time.time()
+        if now - self._last_sweep < 60.0:
+            return 0
+        self._last_sweep = now
+        with self._connect() as connection:
+            connection.execute(
+                "DELETE FROM job_figures WHERE job_id IN"
+                " (SELECT id FROM jobs WHERE expires < ?)",
+                (now,),
+            )
+            return connection.execute(
+                "DELETE FROM jobs WHERE expires < ?", (now,)
+            ).rowcount
+
+
+class JobQueue:
+    """Runs submitted jobs on a thread pool and records them in a store."""
+
+    def __init__(self, settings: JobSettings, store: JobStore | None = None) -> None:
+        """Create the store and an idle pool of `settings.workers` threads."""
+        self.settings = settings
+        self.store = store or JobStore(settings.database, ttl=settings.ttl)
+        self._pool = ThreadPoolExecutor(settings.workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.finished = dict.fromkeys(FINISHED, 0)
+        self.busy_seconds = 0.0
+
+    def submit(self, prompt: str, dataset: str, run: Callable[[], JobResult]) -> Job:
+        """Queue `run` as a job and return it; raises `QueueFull`."""
+        with self._lock:
+            if self.queued >= self.settings.max_queued:
+                raise QueueFull(
+                    f"{self.queued} jobs are already queued; try again later."
+                )
+            self.queued += 1
+        try:
+            job = self.store.create(prompt, dataset)
+            self._pool.submit(self._run, job.id, run)
+        except BaseException:
+            with self._lock:
+                self.queued -= 1
+            raise
+        return job
+
+    def _run(self, job_id: str, run: Callable[[], JobResult]) -> None:
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+        start = time.perf_counter()
+        outcome = FAILED
+        try:
+            self.store.start(job_id)
+            result = run()
+        except Exception as ex:  # pylint: disable=broad-except
+            # Recorded for the client, like the errors `POST /` shows.
+            self.store.fail(job_id, str(ex) or type(ex).__name__)
+        else:
+            self.store.finish(job_id, result)
+            outcome = DONE
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.finished[outcome] += 1
+                self.busy_seconds += time.perf_counter() - start
+
+    def stats(self) -> dict[str, Any]:
+        """Return this worker's queue depth and utilization, and all jobs."""
+        with self._lock:
+            queued, running = self.queued, self.running
+        return {
+            "workers": self.settings.workers,
+            "busy": running,
+            "queued": queued,
+            "utilization": running / self.settings.workers,
+            "jobs": self.store.counts(),
+        }
+
+    def close(self) -> None:
+        """Wait for running jobs and stop the pool."""
+        self._pool.shutdown(wait=True)
+
+
+_QUEUE: Optional[JobQueue] = None
+_QUEUE_LOCK = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """Return the process-wide job queue, created on first use."""
+    global _QUEUE  # pylint: disable=global-statement
+    settings = JobSettings.from_env()
+    if _QUEUE is None or _QUEUE.settings != settings:
+        with _QUEUE_LOCK:
+            if _QUEUE is None or _QUEUE.settings != settings:
+                _QUEUE = JobQueue(settings)
+    return _QUEUE
+
+
+def _job_metrics() -> Iterator[Family]:
+    queue = _QUEUE
+    if queue is None:
+        return
+    yield (
+        "workshop_job_queue_depth",
+        "gauge",
+        "Jobs waiting for a free job worker.",
+        [({}, queue.queued)],
+    )
+    yield (
+        "workshop_job_busy_workers",
+        "gauge",
+        "Job workers currently running a job.",
+        [({}, queue.running)],
+    )
+    yield (
+        "workshop_job_busy_seconds_total",
+        "counter",
+        "Seconds job workers spent running jobs.",
+        [({}, queue.busy_seconds)],
+    )
+    yield (
+        "workshop_jobs_total",
+        "counter",
+        "Finished jobs by outcome.",
+        [({"status": status}, count) for status, count in queue.finished.items()],
+    )
+
+
+get_metrics().add_collector(_job_metrics)
+
+
+def _after_fork_in_child() -> None:
+    # The parent's pool threads and connections do not exist in the child.
+    global _QUEUE, _QUEUE_LOCK  # pylint: disable=global-statement
+    _QUEUE = None
+    _QUEUE_LOCK = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
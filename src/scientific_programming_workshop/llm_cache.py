@@ -0,0 +1,353 @@
+"""Cache for LLM completions keyed by normalized prompt and dataset.
+
+Entries are keyed on the model, the normalized user prompt, `max_tokens`
+and the dataset fingerprint, so a cached answer is only reused for the same
+question against the same data. Lookups go to an in-process LRU first and
+then, if configured, to a SQLite file shared by all workers on the host.
+
+Configuration (environment variables):
+
+- `LLM_CACHE_SIZE`: in-memory entries per worker (default 256, 0 disables)
+- `LLM_CACHE_TTL`: seconds an answer stays valid (default 3600)
+- `LLM_CACHE_PATH`: SQLite file for the shared tier (default: disabled;
+  if it can't be opened, only the memory tier is used, with a warning)
+- `LLM_CACHE_DISK_SIZE`: maximum rows kept in SQLite (default 10000)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import warnings
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+
+from .metrics import Family, get_metrics
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Normalize case, whitespace and trailing punctuation of a prompt."""
+    return re.sub(r"\s+", " ", prompt).strip().rstrip("?!. ").casefold()
+
+
+def cache_key(
+    *, model: str, prompt: str, max_tokens: int, fingerprint: str, variant: str = ""
+) -> str:
+    """Return the cache key for one completion request.
+
+    `variant` separates answers to differently phrased model prompts for
+    the same question, e.g. "sql" when the model is asked for SQL.
+    """
+    fields: list[object] = [model, normalize_prompt(prompt), max_tokens, fingerprint]
+    if variant:
+        fields.append(variant)
+    payload = json.dumps(fields, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CacheStats:
+    """Hit/miss counters for a `ResponseCache`."""
+
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """Return the fraction of lookups answered from either tier."""
+        hits = self.memory_hits + self.disk_hits
+        total = hits + self.misses
+        return hits / total if total else 0.0
+
+
+class _SQLiteTier:
+    """Shared on-disk tier; one connection per thread, WAL mode.
+
+    Expired and surplus rows are trimmed every `trim_every` writes of a
+    process, so the table may briefly hold a few more than `max_rows`.
+    """
+
+    def __init__(self, path: Path, max_rows: int, trim_every: int = 100) -> None:
+        self.path = path
+        self.max_rows = max_rows
+        self.trim_every = trim_every
+        self._puts = 0
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_created ON responses (created)"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key: str, min_created: float) -> Optional[str]:
+        row = (
+            self._connect()
+            .execute(
+                "SELECT value FROM responses WHERE key = ? AND created >= ?",
+                (key, min_created),
+            )
+            .fetchone()
+        )
+        return row[0] if row else None
+
+    def put(self, key: str, value: str, min_created: float) -> None:
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO responses (key, value, created) VALUES (?, ?, ?)",
+            (key, value, time.time()),
+        )
+        self._puts += 1  # racy across threads; a trim more or less is fine
+        if self._puts % self.trim_every == 0:
+            self.trim(min_created)
+
+    def trim(self, min_created: float) -> None:
+        """Delete expired rows and all but the newest `max_rows`."""
+        conn = self._connect()
+        conn.execute("DELETE FROM responses WHERE created < ?", (min_created,))
+        # The created index finds the cutoff without sorting the table.
+        row = conn.execute(
+            "SELECT created FROM responses ORDER BY created DESC LIMIT 1 OFFSET ?",
+            (self.max_rows,),
+        ).fetchone()
+        if row is not None:
+            conn.execute("DELETE FROM responses WHERE created <= ?", (row[0],))
+
+    def clear(self) -> None:
+        self._connect().execute("DELETE FROM responses")
+
+
+class ResponseCache:
+    """Two-tier (memory LRU + optional SQLite) cache of completion texts."""
+
+    def __init__(
+        self,
+        *,
+        max_entries: int = 256,
+        ttl: float = 3600.0,
+        path: Path | str | None = None,
+        max_disk_entries: int = 10_000,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Create a cache; `path` enables the shared SQLite tier.
+
+        If the SQLite file can't be opened (e.g. an unwritable directory),
+        the cache warns and keeps to the memory tier.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._memory: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._disk: Optional[_SQLiteTier] = None
+        if path:
+            try:
+                self._disk = _SQLiteTier(Path(path), max_disk_entries)
+            except (sqlite3.Error, OSError) as ex:
+                warnings.warn(
+                    f"Not using the shared LLM cache at {path}: {ex}",
+                    RuntimeWarning,
+                    stacklevel=2,
+                )
+
+    @classmethod
+    def from_env(cls) -> ResponseCache:
+        """Create a cache configured by `LLM_CACHE_*` variables."""
+        return cls(
+            max_entries=int(os.getenv("LLM_CACHE_SIZE") or 256),
+            ttl=float(os.getenv("LLM_CACHE_TTL") or 3600),
+            path=os.getenv("LLM_CACHE_PATH") or None,
+            max_disk_entries=int(os.getenv("LLM_CACHE_DISK_SIZE") or 10_000),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        """Return whether either tier can hold entries."""
+        return self.max_entries > 0 or self._disk is not None
+
+    def get(self, key: str) -> Optional[str]:
+        """Return a cached value, or None (counted as a miss)."""
+        now = self._clock()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[0] <= self.ttl:
+                self._memory.move_to_end(key)
+                self.stats.memory_hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._memory[key]
+
+        if self._disk is not None:
+            try:
+                value = self._disk.get(key, time.time() - self.ttl)
+            except (sqlite3.Error, OSError):
+                value = None
+            if value is not None:
+                self._remember(key, value, now)
+                with self._lock:
+                    self.stats.disk_hits += 1
+                return value
+
+        with self._lock:
+            self.stats.misses += 1
+        return None
+
+    def put(self, key: str, value: str) -> None:
+        """Store a value in both tiers."""
+        self._remember(key, value, self._clock())
+        if self._disk is not None:
+            try:
+                self._disk.put(key, value, time.time() - self.ttl)
+            except (sqlite3.Error, OSError):
+                pass  # the shared tier is best-effort
+
+    def _remember(self, key: str, value: str, now: float) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._memory[key] = (now, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop all entries and reset the counters."""
+        with self._lock:
+            self._memory.clear()
+            self.stats = CacheStats()
+        if self._disk is not None:
+            self._disk.clear()
+
+
+_CACHE: Optional[ResponseCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Return the process-wide response cache."""
+    global _CACHE  # pylint: disable=global-statement
+    if _CACHE is None:
+        with _CACHE_LOCK:
+            if _CACHE is None:
+                _CACHE = ResponseCache.from_env()
+    return _CACHE
+
+
+def _cache_metrics() -> Iterator[Family]:
+    stats = get_response_cache().stats
+    yield (
+        "workshop_llm_cache_lookups_total",
+        "counter",
+        "Response cache lookups by result.",
+        [
+            ({"result": "memory_hit"}, stats.memory_hits),
+            ({"result": "disk_hit"}, stats.disk_hits),
+            ({"result": "miss"}, stats.misses),
+        ],
+    )
+    yield (
+        "workshop_llm_cache_hit_ratio",
+        "gauge",
+        "Fraction of response cache lookups that were hits.",
+        [({}, stats.hit_rate)],
+    )
+
+
+get_metrics().add_collector(_cache_metrics)
+
+
+def cached_chat_completion(
+    client: Any,
+    *,
+    model: str,
+    messages: list[dict[str, str]],
+    max_tokens: int,
+    user_prompt: str,
+    fingerprint: str,
+    cache: ResponseCache | None = None,
+    variant: str = "",
+) -> str:
+    """Return the completion text, answering repeats from the cache.
+
+    Only successful, non-empty answers are cached; API errors propagate.
+    """
+    cache = cache or get_response_cache()
+    key = cache_key(
+        model=model,
+        prompt=user_prompt,
+        max_tokens=max_tokens,
+        fingerprint=fingerprint,
+        variant=variant,
+    )
+    cached = cache.get(key) if cache.enabled else None
+    if cached is not None:
+        return cached
+
+    response = client.chat.completions.create(
+        model=model, messages=messages, max_tokens=max_tokens
+    )
+    get_metrics().record_usage(getattr(response, "usage", None))
+    content = response.choices[0].message.content or ""
+    if content and cache.enabled:
+        cache.put(key, content)
+    return content
+
+
+async def cached_chat_completion_async(
+    client: Any,
+    *,
+    model: str,
+    messages: list[dict[str, str]],
+    max_tokens: int,
+    user_prompt: str,
+    fingerprint: str,
+    cache: ResponseCache | None = None,
+    variant: str = "",
+) -> str:
+    """Async variant of `cached_chat_completion` for an `AsyncOpenAI` client.
+
+    Cache lookups stay synchronous: they hit memory or a local SQLite file
+    and take microseconds, far less than an event loop hop to a thread.
+    """
+    cache = cache or get_response_cache()
+    key = cache_key(
+        model=model,
+        prompt=user_prompt,
+        max_tokens=max_tokens,
+        fingerprint=fingerprint,
+        variant=variant,
+    )
+    cached = cache.get(key) if cache.enabled else None
+    if cached is not None:
+        return cached
+
+    response = await client.chat.completions.create(
+        model=model, messages=messages, max_tokens=max_tokens
+    )
+    get_metrics().record_usage(getattr(response, "usage", None))
+    content = response.choices[0].message.content or ""
+    if content and cache.enabled:
+        cache.put(key, content)
+    return content
@@ -1,32 +1,325 @@
-"""OpenAI client helpers (API key loading and client creation)."""
+"""OpenAI client helpers (API key loading and client creation).
+
+`get_openai_client()` returns one client per process (and
+`get_async_openai_client()` one `AsyncOpenAI` client for the async app).
+The client owns a keep-alive httpx connection pool, so consecutive
+requests reuse the same TCP/TLS connection instead of paying a new
+handshake each time. The pool size doubles as the per-worker cap on
+in-flight API requests: once `OPENAI_MAX_IN_FLIGHT` requests are
+running, further callers wait up to `OPENAI_POOL_TIMEOUT` seconds for a
+free connection.
+
+Pool settings are read from the environment (or `.env`):
+
+- `OPENAI_MAX_IN_FLIGHT` (default 8)
+- `OPENAI_MAX_KEEPALIVE` (default: same as `OPENAI_MAX_IN_FLIGHT`)
+- `OPENAI_KEEPALIVE_EXPIRY` seconds (default 30)
+- `OPENAI_TIMEOUT` / `OPENAI_CONNECT_TIMEOUT` / `OPENAI_POOL_TIMEOUT` seconds
+  (defaults 60 / 5 / 30)
+- `OPENAI_MAX_RETRIES` (default 2)
+- `OPENAI_BASE_URL` (optional, e.g. a local stub server)
+
+The `openai` package takes a few hundred milliseconds to import, so it is
+imported when the first client is created, not with this module;
+`api_errors()` gives `except` clauses its exception type without
+importing it.
+"""
 
 from __future__ import annotations
 
+import asyncio
 import os
-from typing import Optional
+import sys
+import threading
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Optional
 
+import httpx
 from dotenv import load_dotenv
-from openai import OpenAI
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI, OpenAI
+
+_ENV_LOADED = False
+
+
+def _load_env_once() -> None:
+    global _ENV_LOADED  # pylint: disable=global-statement
+    if not _ENV_LOADED:
+        load_dotenv()
+        _ENV_LOADED = True
+
+
+def api_errors() -> tuple[type[Exception], ...]:
+    """Return the exception types raised by the OpenAI client.
+
+    Empty while `openai` has not been imported, since nothing can have
+    raised them then; use as `except api_errors() as e:`.
+    """
+    openai = sys.modules.get("openai")
+    return (openai.OpenAIError,) if openai is not None else ()
 
 
 def get_openai_api_key() -> Optional[str]:
     """Load and return the OPENAI_API_KEY (if present)."""
-    load_dotenv()
+    _load_env_once()
     api_key = os.getenv("OPENAI_API_KEY")
     if api_key and api_key.strip():
         return api_key
     return None
 
 
-def get_openai_client() -> OpenAI:
-    """Create an OpenAI client.
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value and value.strip() else default
 
-    Raises:
-        ValueError: if OPENAI_API_KEY isn't set.
-    """
+
+@dataclass(frozen=True)
+class ClientSettings:
+    """Connection pool and timeout settings for the shared client."""
+
+    max_in_flight: int = 8
+    max_keepalive: int = 8
+    keepalive_expiry: float = 30.0
+    timeout: float = 60.0
+    connect_timeout: float = 5.0
+    pool_timeout: float = 30.0
+    max_retries: int = 2
+    base_url: Optional[str] = None
+
+    @classmethod
+    def from_env(cls) -> ClientSettings:
+        """Read settings from `OPENAI_*` environment variables."""
+        _load_env_once()
+        max_in_flight = int(_env_float("OPENAI_MAX_IN_FLIGHT", cls.max_in_flight))
+        return cls(
+            max_in_flight=max_in_flight,
+            max_keepalive=int(_env_float("OPENAI_MAX_KEEPALIVE", max_in_flight)),
+            keepalive_expiry=_env_float(
+                "OPENAI_KEEPALIVE_EXPIRY", cls.keepalive_expiry
+            ),
+            timeout=_env_float("OPENAI_TIMEOUT", cls.timeout),
+            connect_timeout=_env_float("OPENAI_CONNECT_TIMEOUT", cls.connect_timeout),
+            pool_timeout=_env_float("OPENAI_POOL_TIMEOUT", cls.pool_timeout),
+            max_retries=int(_env_float("OPENAI_MAX_RETRIES", cls.max_retries)),
+            base_url=os.getenv("OPENAI_BASE_URL") or None,
+        )
+
+    def limits(self) -> httpx.Limits:
+        """Return the httpx pool limits for these settings."""
+        return httpx.Limits(
+            max_connections=self.max_in_flight,
+            max_keepalive_connections=self.max_keepalive,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+    def timeouts(self) -> httpx.Timeout:
+        """Return the httpx timeouts for these settings."""
+        return httpx.Timeout(
+            self.timeout, connect=self.connect_timeout, pool=self.pool_timeout
+        )
+
+
+def create_openai_client(
+    api_key: str, settings: ClientSettings | None = None
+) -> OpenAI:
+    """Create a new OpenAI client with its own pooled HTTP connections."""
+    from openai import DefaultHttpxClient, OpenAI
+
+    settings = settings or ClientSettings.from_env()
+    http_client = DefaultHttpxClient(
+        limits=settings.limits(), timeout=settings.timeouts()
+    )
+    return OpenAI(
+        api_key=api_key,
+        base_url=settings.base_url,
+        max_retries=settings.max_retries,
+        timeout=settings.timeouts(),
+        http_client=http_client,
+    )
+
+
+def create_async_openai_client(
+    api_key: str, settings: ClientSettings | None = None
+) -> AsyncOpenAI:
+    """Create a new AsyncOpenAI client with its own pooled HTTP connections."""
+    from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+    settings = settings or ClientSettings.from_env()
+    http_client = DefaultAsyncHttpxClient(
+        limits=settings.limits(), timeout=settings.timeouts()
+    )
+    return AsyncOpenAI(
+        api_key=api_key,
+        base_url=settings.base_url,
+        max_retries=settings.max_retries,
+        timeout=settings.timeouts(),
+        http_client=http_client,
+    )
+
+
+def _require_api_key() -> str:
     api_key = get_openai_api_key()
     if not api_key:
         raise ValueError(
             "Please set OPENAI_API_KEY in a .env file (or as an environment variable)."
         )
-    return OpenAI(api_key=api_key)
+    return api_key
+
+
+_CLIENT_LOCK = threading.Lock()
+_CLIENT: Optional[OpenAI] = None
+_CLIENT_PID: Optional[int] = None
+_ASYNC_CLIENT: Optional[AsyncOpenAI] = None
+_ASYNC_CLIENT_PID: Optional[int] = None
+# The loop the async client's connections belong to; they can only be
+# closed there.
+_ASYNC_CLIENT_LOOP: Optional[asyncio.AbstractEventLoop] = None
+_CLOSING: set[asyncio.Task] = set()  # close tasks scheduled on that loop
+
+
+def get_openai_client() -> OpenAI:
+    """Return the process-wide OpenAI client, creating it on first use.
+
+    Raises:
+        ValueError: if OPENAI_API_KEY isn't set.
+    """
+    global _CLIENT, _CLIENT_PID  # pylint: disable=global-statement
+
+    client = _CLIENT
+    if client is not None and _CLIENT_PID == os.getpid():
+        return client
+
+    with _CLIENT_LOCK:
+        if _CLIENT is None or _CLIENT_PID != os.getpid():
+            _CLIENT = create_openai_client(_require_api_key())
+            _CLIENT_PID = os.getpid()
+        return _CLIENT
+
+
+def get_async_openai_client() -> AsyncOpenAI:
+    """Return the process-wide AsyncOpenAI client, creating it on first use.
+
+    The client must only be used from one event loop (the ASGI server's).
+
+    Raises:
+        ValueError: if OPENAI_API_KEY isn't set.
+    """
+    global _ASYNC_CLIENT, _ASYNC_CLIENT_PID  # pylint: disable=global-statement
+    global _ASYNC_CLIENT_LOOP  # pylint: disable=global-statement
+
+    client = _ASYNC_CLIENT
+    if client is not None and _ASYNC_CLIENT_PID == os.getpid():
+        return client
+
+    with _CLIENT_LOCK:
+        if _ASYNC_CLIENT is None or _ASYNC_CLIENT_PID != os.getpid():
+            _ASYNC_CLIENT = create_async_openai_client(_require_api_key())
+            _ASYNC_CLIENT_PID = os.getpid()
+            try:
+                _ASYNC_CLIENT_LOOP = asyncio.get_running_loop()
+            except RuntimeError:
+                _ASYNC_CLIENT_LOOP = None
+        return _ASYNC_CLIENT
+
+
+def reset_openai_client() -> None:
+    """Forget the shared client so the next call builds a fresh one.
+
+    Call this after fork (e.g. from gunicorn's `post_fork` hook); the client
+    is also rebuilt automatically when the process id changes. The inherited
+    client is dropped without closing it, since closing would shut down
+    sockets that still belong to the parent process.
+    """
+    global _CLIENT, _CLIENT_PID  # pylint: disable=global-statement
+    global _ASYNC_CLIENT, _ASYNC_CLIENT_PID  # pylint: disable=global-statement
+    global _ASYNC_CLIENT_LOOP  # pylint: disable=global-statement
+    with _CLIENT_LOCK:
+        _CLIENT = None
+        _CLIENT_PID = None
+        _ASYNC_CLIENT = None
+        _ASYNC_CLIENT_PID = None
+        _ASYNC_CLIENT_LOOP = None
+
+
+def _take_clients() -> tuple[
+    Optional[OpenAI], Optional[AsyncOpenAI], Optional[asyncio.AbstractEventLoop]
+]:
+    # Forget the shared clients; return the ones this process owns.
+    global _CLIENT, _CLIENT_PID  # pylint: disable=global-statement
+    global _ASYNC_CLIENT, _ASYNC_CLIENT_PID  # pylint: disable=global-statement
+    global _ASYNC_CLIENT_LOOP  # pylint: disable=global-statement
+    with _CLIENT_LOCK:
+        pid = os.getpid()
+        client = _CLIENT if _CLIENT_PID == pid else None
+        async_client = _ASYNC_CLIENT if _ASYNC_CLIENT_PID == pid else None
+        loop = _ASYNC_CLIENT_LOOP
+        _CLIENT = None
+        _CLIENT_PID = None
+        _ASYNC_CLIENT = None
+        _ASYNC_CLIENT_PID = None
+        _ASYNC_CLIENT_LOOP = None
+    return client, async_client, loop
+
+
+def close_openai_client() -> None:
+    """Close the shared clients' connection pools (e.g. at shutdown).
+
+    The async client's connections belong to the event loop it was
+    created on, so it is closed there: on that loop's thread if the loop
+    is running elsewhere, or directly if it is idle. Called from the
+    loop itself, the close is scheduled as a task; await
+    `aclose_openai_client()` instead to wait for it. If the loop has
+    already been closed, its sockets can no longer be shut down cleanly
+    and the client is only dropped, so async servers should close the
+    clients before their loop stops (the async app does on shutdown).
+    """
+    client, async_client, loop = _take_clients()
+    if client is not None:
+        client.close()
+    if async_client is None:
+        return
+    if loop is None:
+        asyncio.run(async_client.close())
+    elif loop.is_closed():
+        return
+    elif loop.is_running():
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            task = loop.create_task(async_client.close())
+            _CLOSING.add(task)
+            task.add_done_callback(_CLOSING.discard)
+        else:
+            asyncio.run_coroutine_threadsafe(async_client.close(), loop).result()
+    else:
+        loop.run_until_complete(async_client.close())
+
+
+async def aclose_openai_client() -> None:
+    """Close the shared clients from the async client's event loop."""
+    client, async_client, _ = _take_clients()
+    if client is not None:
+        client.close()
+    if async_client is not None:
+        await async_client.close()
+
+
+def _after_fork_in_child() -> None:
+    # Another thread may have held the lock at fork time; replace it rather
+    # than risk waiting on a lock whose owner doesn't exist in the child.
+    global _CLIENT_LOCK, _CLIENT, _CLIENT_PID  # pylint: disable=global-statement
+    global _ASYNC_CLIENT, _ASYNC_CLIENT_PID  # pylint: disable=global-statement
+    global _ASYNC_CLIENT_LOOP  # pylint: disable=global-statement
+    _CLIENT_LOCK = threading.Lock()
+    _CLIENT = None
+    _CLIENT_PID = None
+    _ASYNC_CLIENT = None
+    _ASYNC_CLIENT_PID = None
+    _ASYNC_CLIENT_LOOP = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -0,0 +1,266 @@
+"""Lightweight in-process metrics in the Prometheus text format.
+
+Set `METRICS_ENABLED=1` to turn collection on; the apps then serve the
+registry at `/metrics`. While disabled, every recording call returns after
+one attribute check and `timed()` doesn't even read the clock.
+
+What is recorded:
+
+- `workshop_stage_seconds{stage}`: histogram per request stage (the same
+  stages as the `Server-Timing` header, plus `dataset_load` on reloads)
+- `workshop_requests_total{endpoint,status}`: requests served
+- `workshop_llm_tokens_total{kind}`: prompt/completion tokens reported by
+  the API
+- collector gauges registered by other modules (cache hits, executor
+  queue depth), computed when `/metrics` is scraped
+
+Values are per process: with several gunicorn workers each one reports its
+own numbers, so scrape them individually or aggregate in Prometheus.
+"""
+
+from __future__ import annotations
+
+import bisect
+import os
+import threading
+import time
+from contextlib import ContextDecorator
+from typing import Any, Callable, Iterable, Mapping, Optional
+
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# A collector returns (name, type, help, samples); each sample is a
+# (labels, value) pair.
+Sample = tuple[Mapping[str, str], float]
+Family = tuple[str, str, str, list[Sample]]
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    def __init__(self, name: str, help_text: str, labels: tuple[str, ...] = ()):
+        """Create a counter; `labels` are the label names."""
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values: dict[tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        """Add `amount` to the series for `label_values`."""
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def value(self, *label_values: str) -> float:
+        """Return the current value of one series."""
+        return self._values.get(label_values, 0.0)
+
+    def render(self) -> list[str]:
+        """Return the exposition lines for this counter."""
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for label_values, value in items:
+            labels = _labels(self.labels, label_values)
+            lines.append(f"{self.name}{labels} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with one label."""
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        label: str,
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        """Create a histogram keyed by one label (e.g. `stage`)."""
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = buckets
+        # label value -> [per-bucket counts..., +Inf count, sum]
+        self._series: dict[str, list[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value: str, value: float) -> None:
+        """Record one observation."""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [0.0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def count(self, label_value: str) -> int:
+        """Return the number of observations for one series."""
+        series = self._series.get(label_value)
+        return int(sum(series[:-1])) if series else 0
+
+    def render(self) -> list[str]:
+        """Return the exposition lines for this histogram."""
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        for label_value, series in items:
+            label = f'{self.label}="{_escape(label_value)}"'
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(
+                    f'{self.name}_bucket{{{label},le="{bound}"}} {_number(cumulative)}'
+                )
+            cumulative += series[len(self.buckets)]
+            lines.append(
+                f'{self.name}_bucket{{{label},le="+Inf"}} {_number(cumulative)}'
+            )
+            lines.append(f"{self.name}_sum{{{label}}} {series[-1]!r}")
+            lines.append(f"{self.name}_count{{{label}}} {_number(cumulative)}")
+        return lines
+
+
+class _Timed(ContextDecorator):
+    """Context manager/decorator that observes elapsed seconds for a stage."""
+
+    def __init__(self, registry: MetricsRegistry, stage: str) -> None:
+        self._registry = registry
+        self._stage = stage
+        self._start: Optional[float] = None
+
+    def _recreate_cm(self) -> _Timed:
+        # A fresh instance per decorated call keeps threads independent.
+        return _Timed(self._registry, self._stage)
+
+    def __enter__(self) -> _Timed:
+        if self._registry.enabled:
+            self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        if self._start is not None:
+            elapsed = time.perf_counter() - self._start
+            self._start = None
+            self._registry.stage_seconds.observe(self._stage, elapsed)
+
+
+class MetricsRegistry:
+    """The metrics of one process."""
+
+    def __init__(self, *, enabled: bool = False) -> None:
+        """Create the standard metric families."""
+        self.enabled = enabled
+        self.stage_seconds = Histogram(
+            "workshop_stage_seconds", "Time spent per request stage.", "stage"
+        )
+        self.requests = Counter(
+            "workshop_requests_total", "Requests served.", ("endpoint", "status")
+        )
+        self.llm_tokens = Counter(
+            "workshop_llm_tokens_total", "Tokens reported by the LLM API.", ("kind",)
+        )
+        self._collectors: list[Callable[[], Iterable[Family]]] = []
+
+    @classmethod
+    def from_env(cls) -> MetricsRegistry:
+        """Create a registry enabled by `METRICS_ENABLED`."""
+        flag = (os.getenv("METRICS_ENABLED") or "").lower()
+        return cls(enabled=flag in ("1", "true", "yes", "on"))
+
+    def timed(self, stage: str) -> _Timed:
+        """Time a block or function into `workshop_stage_seconds{stage}`."""
+        return _Timed(self, stage)
+
+    def observe_stages(self, durations: Mapping[str, float]) -> None:
+        """Record a request's stage durations (e.g. `StageTimings.durations`)."""
+        if not self.enabled:
+            return
+        for stage, seconds in durations.items():
+            self.stage_seconds.observe(stage, seconds)
+
+    def count_request(self, endpoint: str, status: int) -> None:
+        """Count one served request."""
+        if self.enabled:
+            self.requests.inc(endpoint, str(status))
+
+    def record_usage(self, usage: Any) -> None:
+        """Add the token counts of an OpenAI `usage` object, if present."""
+        if not self.enabled or usage is None:
+            return
+        for kind in ("prompt", "completion"):
+            tokens = getattr(usage, f"{kind}_tokens", None)
+            if tokens:
+                self.llm_tokens.inc(kind, amount=tokens)
+
+    def add_collector(self, collector: Callable[[], Iterable[Family]]) -> None:
+        """Register a callable evaluated at scrape time."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Return all metrics in the Prometheus text exposition format."""
+        lines = [
+            *self.stage_seconds.render(),
+            *self.requests.render(),
+            *self.llm_tokens.render(),
+        ]
+        for collector in self._collectors:
+            for name, kind, help_text, samples in collector():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    names = tuple(labels)
+                    values = tuple(labels[label] for label in names)
+                    lines.append(f"{name}{_labels(names, values)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+_REGISTRY: Optional[MetricsRegistry] = None
+_REGISTRY_LOCK = threading.Lock()
+
+
+def get_metrics() -> MetricsRegistry:
+    """Return the process-wide registry."""
+    global _REGISTRY  # pylint: disable=global-statement
+    if _REGISTRY is None:
+        with _REGISTRY_LOCK:
+            if _REGISTRY is None:
+                _REGISTRY = MetricsRegistry.from_env()
+    return _REGISTRY
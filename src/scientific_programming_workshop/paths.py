@@ -19,4 +19,5 @@ TEMPLATES_DIR = ROOT_DIR / "templates"
 STATIC_DIR = ROOT_DIR / "static"
 
 CSV_PATH = DATA_DIR / "autoscout24_data.csv"
+SNAPSHOT_DIR = DATA_DIR / "autoscout24_data.snapshot"
 GRAPHIC_PATH = STATIC_DIR / "graphic.png"
@@ -1,14 +1,62 @@
-"""Plotting configuration for server-side rendering."""
+"""Plotting configuration for server-side rendering.
+
+`plt` stands in for `matplotlib.pyplot`: importing pyplot takes about half
+a second, so it is only imported (with the Agg backend, and the style from
+`configure_plot_style()` applied) when `plt` is first used. Servers that
+fork workers can import it up front with `load_pyplot()` (see `startup`).
+"""
 
 from __future__ import annotations
 
-import matplotlib
-import matplotlib.pyplot as plt
+import os
+import threading
+from typing import Any, Optional
+
+STYLE = "dark_background"
+
+# Also for code that imports pyplot itself, before `load_pyplot()` runs.
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+_PYPLOT: Optional[Any] = None
+_PYPLOT_LOCK = threading.Lock()
+_STYLE_CONFIGURED = False
+
+
+def load_pyplot() -> Any:
+    """Import and return `matplotlib.pyplot`, configured for rendering."""
+    global _PYPLOT  # pylint: disable=global-statement
+    if _PYPLOT is None:
+        with _PYPLOT_LOCK:
+            if _PYPLOT is None:
+                import matplotlib
+
+                # Must be set before importing pyplot.
+                matplotlib.use("Agg")
+                import matplotlib.pyplot as pyplot
+
+                if _STYLE_CONFIGURED:
+                    pyplot.style.use(STYLE)
+                _PYPLOT = pyplot
+    return _PYPLOT
+
+
+class _LazyPyplot:
+    """Forwards attribute access to `matplotlib.pyplot`, importing it once."""
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(load_pyplot(), name)
+
+    def __repr__(self) -> str:
+        state = "loaded" if _PYPLOT is not None else "not loaded yet"
+        return f"<lazy matplotlib.pyplot ({state})>"
+
 
-# Must be set before importing pyplot.
-matplotlib.use("Agg")
+plt: Any = _LazyPyplot()
 
 
 def configure_plot_style() -> None:
     """Configure default plot style for server-side rendering."""
-    plt.style.use("dark_background")
+    global _STYLE_CONFIGURED  # pylint: disable=global-statement
+    _STYLE_CONFIGURED = True
+    if _PYPLOT is not None:
+        _PYPLOT.style.use(STYLE)
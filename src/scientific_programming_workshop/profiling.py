@@ -0,0 +1,299 @@
+"""Opt-in sampling profiler for slow code executions.
+
+Set `PROFILE_SLOW_EXEC` to a threshold in seconds to turn it on. Every
+execution registers with one background sampler thread per process; the
+sampler checks twice per threshold whether some execution has run longer
+than the threshold and only then samples that thread's stack every
+`PROFILE_INTERVAL` seconds (default 0.005). Executions that finish in time
+cost a few microseconds of bookkeeping and are never sampled.
+
+A slow execution produces a `SlowProfile` (wall/CPU time, the hottest
+frames and the hottest lines of the generated code), which travels back on
+`ExecResult.profile`, also from executor pool workers. `run_code` keeps the
+last `PROFILE_KEEP` (default 20) of them in a `ProfileBuffer`, which the
+apps show at `/admin/profiles`.
+"""
+
+from __future__ import annotations
+
+import functools
+import linecache
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import asdict, dataclass
+from types import CodeType, FrameType
+from typing import Any, Optional
+
+_USER_CODE = "<string>"
+
+
+@dataclass(frozen=True)
+class ProfilerSettings:
+    """When and how often to sample."""
+
+    threshold: float
+    interval: float = 0.005
+    keep: int = 20
+    max_frames: int = 15
+
+    @classmethod
+    def from_env(cls) -> Optional[ProfilerSettings]:
+        """Return settings from `PROFILE_*` variables, or None when disabled."""
+        threshold = os.environ.get("PROFILE_SLOW_EXEC")
+        if not threshold:
+            return None
+        return _parse_settings(
+            threshold,
+            os.environ.get("PROFILE_INTERVAL"),
+            os.environ.get("PROFILE_KEEP"),
+        )
+
+
+@functools.lru_cache(maxsize=8)
+def _parse_settings(
+    threshold: str, interval: Optional[str], keep: Optional[str]
+) -> Optional[ProfilerSettings]:
+    # Called on every execution; parsing once per distinct value keeps the
+    # enabled-but-fast path cheap.
+    if float(threshold) <= 0:
+        return None
+    return ProfilerSettings(
+        threshold=float(threshold),
+        interval=float(interval or 0.005),
+        keep=int(keep or 20),
+    )
+
+
+@dataclass(frozen=True)
+class FrameStat:
+    """How often one source location was on the sampled stacks."""
+
+    location: str
+    function: str
+    source: str
+    samples: int
+    self_samples: int
+
+
+@dataclass(frozen=True)
+class SlowProfile:
+    """Sampled profile of one execution that exceeded the threshold."""
+
+    code: str
+    wall_time: float
+    cpu_time: float
+    samples: int
+    interval: float
+    top_frames: tuple[FrameStat, ...]
+    hot_lines: tuple[tuple[int, str, int], ...]  # (line, source, samples)
+    created: float
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return a JSON-serialisable view."""
+        return asdict(self)
+
+
+class _Watch:
+    """One running execution, as seen by the sampler."""
+
+    def __init__(self, code: str, stop_code: CodeType, deadline: float) -> None:
+        self.code = code
+        self.thread_id = threading.get_ident()
+        self.stop_code = stop_code
+        self.deadline = deadline
+        self.samples = 0
+        self.inclusive: Counter[tuple[str, int, str]] = Counter()
+        self.leaf: Counter[tuple[str, int, str]] = Counter()
+        self.user_lines: Counter[int] = Counter()
+
+    def sample(self, frame: Optional[FrameType]) -> None:
+        seen = set()
+        user_line = None
+        leaf = None
+        while frame is not None and frame.f_code is not self.stop_code:
+            key = (frame.f_code.co_filename, frame.f_lineno, frame.f_code.co_name)
+            leaf = leaf or key
+            if user_line is None and key[0] == _USER_CODE:
+                user_line = key[1]
+            seen.add(key)
+            frame = frame.f_back
+        if leaf is None:
+            return
+        self.samples += 1
+        self.inclusive.update(seen)
+        self.leaf[leaf] += 1
+        if user_line is not None:
+            self.user_lines[user_line] += 1
+
+    def _source(self, filename: str, lineno: int) -> str:
+        if filename == _USER_CODE:
+            lines = self.code.splitlines()
+            return lines[lineno - 1].strip() if 0 < lineno <= len(lines) else ""
+        return linecache.getline(filename, lineno).strip()
+
+    def profile(
+        self, wall_time: float, cpu_time: float, settings: ProfilerSettings
+    ) -> SlowProfile:
+        ranked = sorted(
+            self.inclusive,
+            key=lambda key: (self.leaf[key], self.inclusive[key]),
+            reverse=True,
+        )[: settings.max_frames]
+        return SlowProfile(
+            code=self.code,
+            wall_time=wall_time,
+            cpu_time=cpu_time,
+            samples=self.samples,
+            interval=settings.interval,
+            top_frames=tuple(
+                FrameStat(
+                    location=f"{filename}:{lineno}",
+                    function=function,
+                    source=self._source(filename, lineno),
+                    samples=self.inclusive[(filename, lineno, function)],
+                    self_samples=self.leaf[(filename, lineno, function)],
+                )
+                for filename, lineno, function in ranked
+            ),
+            hot_lines=tuple(
+                (line, self._source(_USER_CODE, line), count)
+                for line, count in self.user_lines.most_common(settings.max_frames)
+            ),
+            created=time.time(),
+        )
+
+
+class _Sampler:
+    """Background thread sampling executions that are past their deadline."""
+
+    def __init__(self, interval: float, poll: float) -> None:
+        self.interval = interval
+        self.poll = poll
+        self._cond = threading.Condition()
+        self._active: dict[int, _Watch] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, watch: _Watch) -> None:
+        with self._cond:
+            self._active[id(watch)] = watch
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="exec-profiler", daemon=True
+                )
+                self._thread.start()
+
+    def remove(self, watch: _Watch) -> None:
+        with self._cond:
+            self._active.pop(id(watch), None)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if not self._active:
+                    # Polling instead of being notified keeps `add` from
+                    # waking this thread on every (usually fast) execution.
+                    self._cond.wait(self.poll)
+                    continue
+                now = time.perf_counter()
+                due = min(watch.deadline for watch in self._active.values())
+                if due > now:
+                    self._cond.wait(due - now)
+                    continue
+                frames = sys._current_frames()  # pylint: disable=protected-access
+                for watch in self._active.values():
+                    if watch.deadline <= now:
+                        watch.sample(frames.get(watch.thread_id))
+            time.sleep(self.interval)
+
+
+class ExecutionWatch:
+    """Handle returned by `watch_execution`; call `finish()` when done."""
+
+    def __init__(self, sampler: _Sampler, watch: _Watch, settings: ProfilerSettings):
+        """Track `watch` until `finish()` is called."""
+        self._sampler = sampler
+        self._watch = watch
+        self._settings = settings
+
+    def finish(self, wall_time: float, cpu_time: float) -> Optional[SlowProfile]:
+        """Stop sampling; return a profile if the execution was slow."""
+        self._sampler.remove(self._watch)
+        if wall_time < self._settings.threshold or not self._watch.samples:
+            return None
+        return self._watch.profile(wall_time, cpu_time, self._settings)
+
+
+_SAMPLER: Optional[_Sampler] = None
+_SAMPLER_LOCK = threading.Lock()
+
+
+def watch_execution(code: str) -> Optional[ExecutionWatch]:
+    """Start watching the calling thread's execution of `code`.
+
+    Returns None (and costs nothing further) when profiling is disabled.
+    Only frames below the caller are sampled.
+    """
+    global _SAMPLER  # pylint: disable=global-statement
+    settings = ProfilerSettings.from_env()
+    if settings is None:
+        return None
+    if _SAMPLER is None:
+        with _SAMPLER_LOCK:
+            if _SAMPLER is None:
+                _SAMPLER = _Sampler(settings.interval, settings.threshold / 2)
+    caller = sys._getframe(1).f_code  # pylint: disable=protected-access
+    watch = _Watch(code, caller, time.perf_counter() + settings.threshold)
+    _SAMPLER.add(watch)
+    return ExecutionWatch(_SAMPLER, watch, settings)
+
+
+class ProfileBuffer:
+    """Ring buffer of the most recent slow profiles."""
+
+    def __init__(self, maxlen: int = 20) -> None:
+        """Keep at most `maxlen` profiles."""
+        self._profiles: deque[SlowProfile] = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def add(self, profile: SlowProfile) -> None:
+        """Append a profile, dropping the oldest when full."""
+        with self._lock:
+            self._profiles.append(profile)
+
+    def snapshot(self) -> list[SlowProfile]:
+        """Return the stored profiles, newest first."""
+        with self._lock:
+            return list(reversed(self._profiles))
+
+    def clear(self) -> None:
+        """Drop all profiles."""
+        with self._lock:
+            self._profiles.clear()
+
+
+_BUFFER: Optional[ProfileBuffer] = None
+
+
+def get_profile_buffer() -> ProfileBuffer:
+    """Return the process-wide profile buffer."""
+    global _BUFFER  # pylint: disable=global-statement
+    if _BUFFER is None:
+        with _SAMPLER_LOCK:
+            if _BUFFER is None:
+                settings = ProfilerSettings.from_env()
+                _BUFFER = ProfileBuffer(settings.keep if settings else 20)
+    return _BUFFER
+
+
+def _after_fork_in_child() -> None:
+    # The sampler thread doesn't survive a fork; start a new one on demand.
+    global _SAMPLER, _SAMPLER_LOCK  # pylint: disable=global-statement
+    _SAMPLER = None
+    _SAMPLER_LOCK = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
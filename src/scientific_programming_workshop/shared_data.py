@@ -0,0 +1,261 @@
+"""Zero-copy handoff of DataFrames to executor processes.
+
+`publish_frame()` copies each column of a frame into a
+`multiprocessing.shared_memory` block once: numeric, datetime and
+timedelta columns as raw buffers (timezone-aware ones in UTC), nullable
+`Int64`/`Float64`/`boolean` columns as raw values plus a mask, and
+categorical and text (object or `string`) columns dictionary-encoded as
+integer codes plus a categories table. The tables and dtypes go into one
+more shared block. Text columns are decoded back to their own dtype on
+attach, so generated code sees the same dtypes with and without the
+executor pool. Columns of any other dtype (periods, intervals, Arrow
+types, unhashable objects) are pickled into that block and unpickled on
+attach. The returned `SharedFrameHandle` only holds block names and
+dtypes, so it is tiny to pickle no matter how many rows the frame has.
+
+`attach_frame()` rebuilds a DataFrame over those buffers in another
+process without copying the column data, and caches it per handle, so a
+job's setup cost is constant after the first attach. The shared buffers
+are flagged read-only and pandas copy-on-write is enabled (see
+`data_loading`), so a snippet that mutates `data` only changes its own
+copy.
+"""
+
+from __future__ import annotations
+
+import atexit
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+_KEEP_PUBLISHED = 4
+_KEEP_ATTACHED = 4
+
+
+@dataclass(frozen=True)
+class SharedColumn:
+    """Location and type of one column in shared memory."""
+
+    name: str
+    kind: str  # "numeric" | "datetime" | "masked" | "category" | "text" | "pickled"
+    dtype: str
+    block: str
+    mask_block: str = ""
+
+
+@dataclass(frozen=True)
+class SharedFrameHandle:
+    """Picklable description of a published frame."""
+
+    token: str
+    rows: int
+    columns: tuple[SharedColumn, ...]
+    categories_block: str  # pickled per-column tables, dtypes and fallbacks
+    categories_size: int
+
+
+def _to_shared(values: np.ndarray) -> shared_memory.SharedMemory:
+    values = np.ascontiguousarray(values)
+    block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+    np.ndarray(values.shape, values.dtype, buffer=block.buf)[...] = values
+    return block
+
+
+_MASKED = (pd.arrays.IntegerArray, pd.arrays.FloatingArray, pd.arrays.BooleanArray)
+
+
+def _dictionary_encoded(series: pd.Series) -> pd.Categorical | None:
+    try:
+        return pd.Categorical(series)
+    except TypeError:  # unhashable or unorderable values
+        return None
+
+
+class _Published:
+    """Blocks owned by the publishing process for one frame."""
+
+    def __init__(self, frame: pd.DataFrame, token: str) -> None:
+        self.blocks: list[shared_memory.SharedMemory] = []
+        columns = []
+        categories: dict[str, Any] = {}
+        for name in frame.columns:
+            series = frame[name]
+            dtype = series.dtype
+            key = str(name)
+            mask = None
+            categorical = None
+            if isinstance(dtype, (pd.CategoricalDtype, pd.StringDtype)) or (
+                pd.api.types.is_object_dtype(dtype)
+            ):
+                categorical = _dictionary_encoded(series)
+            if categorical is not None:
+                if isinstance(dtype, pd.CategoricalDtype):
+                    kind = "category"
+                    categories[key] = (
+                        categorical.categories.to_numpy(),
+                        categorical.ordered,
+                    )
+                else:
+                    kind = "text"
+                    categories[key] = (categorical.categories.to_numpy(), dtype)
+                values = categorical.codes
+            elif isinstance(dtype, pd.DatetimeTZDtype):
+                kind = "datetime"
+                categories[key] = dtype.tz
+                values = series.dt.tz_convert(None).to_numpy()
+            elif isinstance(series.array, _MASKED):
+                kind = "masked"
+                categories[key] = dtype
+                values = series.to_numpy(dtype=dtype.numpy_dtype, na_value=0)
+                mask = series.isna().to_numpy()
+            elif isinstance(dtype, np.dtype) and dtype.kind in "biufcmM":
+                kind = "numeric"
+                values = series.to_numpy()
+            else:
+                categories[key] = series.array
+                columns.append(SharedColumn(key, "pickled", str(dtype), ""))
+                continue
+            block = _to_shared(values)
+            self.blocks.append(block)
+            mask_block = ""
+            if mask is not None:
+                self.blocks.append(_to_shared(mask))
+                mask_block = self.blocks[-1].name
+            columns.append(
+                SharedColumn(key, kind, values.dtype.str, block.name, mask_block)
+            )
+
+        payload = np.frombuffer(pickle.dumps(categories), dtype=np.uint8)
+        categories_block = _to_shared(payload)
+        self.blocks.append(categories_block)
+        self.handle = SharedFrameHandle(
+            token=token,
+            rows=len(frame),
+            columns=tuple(columns),
+            categories_block=categories_block.name,
+            categories_size=payload.nbytes,
+        )
+
+    def release(self) -> None:
+        for block in self.blocks:
+            block.close()
+            try:
+                block.unlink()
+            except FileNotFoundError:
+                pass
+
+
+_PUBLISHED: OrderedDict[str, _Published] = OrderedDict()
+_PUBLISH_LOCK = threading.Lock()
+
+
+def publish_frame(frame: pd.DataFrame, token: str) -> SharedFrameHandle:
+    """Publish `frame` under `token` (e.g. its fingerprint), once per token.
+
+    The most recent few frames stay published; older ones are unlinked
+    (processes that already attached them keep their mappings).
+    """
+    with _PUBLISH_LOCK:
+        published = _PUBLISHED.get(token)
+        if published is None:
+            published = _Published(frame, token)
+            _PUBLISHED[token] = published
+            while len(_PUBLISHED) > _KEEP_PUBLISHED:
+                _, oldest = _PUBLISHED.popitem(last=False)
+                oldest.release()
+        _PUBLISHED.move_to_end(token)
+        return published.handle
+
+
+def release_all() -> None:
+    """Unlink every frame this process has published."""
+    with _PUBLISH_LOCK:
+        while _PUBLISHED:
+            _, published = _PUBLISHED.popitem()
+            published.release()
+
+
+def _after_fork_in_child() -> None:
+    # Published blocks belong to the parent; never unlink them from a child.
+    global _PUBLISH_LOCK  # pylint: disable=global-statement
+    _PUBLISHED.clear()
+    _PUBLISH_LOCK = threading.Lock()
+
+
+atexit.register(release_all)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+_ATTACHED: OrderedDict[str, tuple[pd.DataFrame, list[Any]]] = OrderedDict()
+_ATTACH_LOCK = threading.Lock()
+
+
+def _view(block: shared_memory.SharedMemory, dtype: str, rows: int) -> np.ndarray:
+    array = np.ndarray((rows,), dtype=np.dtype(dtype), buffer=block.buf)
+    array.flags.writeable = False
+    return array
+
+
+def _rebuild(handle: SharedFrameHandle) -> tuple[pd.DataFrame, list[Any]]:
+    blocks = [shared_memory.SharedMemory(name=handle.categories_block)]
+    raw = bytes(blocks[0].buf[: handle.categories_size])
+    categories: dict[str, Any] = pickle.loads(raw)  # nosec B301 - own payload
+
+    columns: dict[str, Any] = {}
+    for column in handle.columns:
+        if column.kind == "pickled":
+            columns[column.name] = categories[column.name]
+            continue
+        block = shared_memory.SharedMemory(name=column.block)
+        blocks.append(block)
+        values = _view(block, column.dtype, handle.rows)
+        if column.kind == "category":
+            labels, ordered = categories[column.name]
+            dtype = pd.CategoricalDtype(labels, ordered=ordered)
+            columns[column.name] = pd.Categorical.from_codes(values, dtype=dtype)
+        elif column.kind == "text":
+            # Decoded back to object so generated code sees the dtype it
+            # gets in-process. That is O(rows), but only on the first attach
+            # (see `attach_frame`), and equal strings stay one object.
+            labels, dtype = categories[column.name]
+            lookup = np.append(labels.astype(object), np.nan)  # code -1: NaN
+            decoded = lookup.take(values)
+            decoded.flags.writeable = False
+            if isinstance(dtype, pd.StringDtype):
+                decoded = pd.array(decoded, dtype=dtype)
+            columns[column.name] = decoded
+        elif column.kind == "datetime":
+            utc = pd.DatetimeIndex(values).tz_localize("UTC")
+            columns[column.name] = utc.tz_convert(categories[column.name])
+        elif column.kind == "masked":
+            mask_block = shared_memory.SharedMemory(name=column.mask_block)
+            blocks.append(mask_block)
+            mask = _view(mask_block, "|b1", handle.rows)
+            array_type = categories[column.name].construct_array_type()
+            columns[column.name] = array_type(values, mask)
+        else:
+            columns[column.name] = values
+    return pd.DataFrame(columns, copy=False), blocks
+
+
+def attach_frame(handle: SharedFrameHandle) -> pd.DataFrame:
+    """Return a read-only view of a published frame (cached per process)."""
+    with _ATTACH_LOCK:
+        cached = _ATTACHED.get(handle.token)
+        if cached is None:
+            cached = _rebuild(handle)
+            _ATTACHED[handle.token] = cached
+            while len(_ATTACHED) > _KEEP_ATTACHED:
+                # Running jobs may still use the frame; the mapping goes away
+                # once the last reference to it is dropped.
+                _ATTACHED.popitem(last=False)
+        _ATTACHED.move_to_end(handle.token)
+        return cached[0].copy(deep=False)
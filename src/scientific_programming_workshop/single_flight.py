@@ -0,0 +1,434 @@
+"""Coalesce identical in-flight requests into one computation.
+
+When many clients ask the same question at the same moment (a class
+following along, a dashboard refreshing), `SingleFlight.run(key, compute)`
+lets the first caller compute the answer while the others wait for it and
+share the result, instead of each calling the model and executing the
+same code:
+
+- within a worker, concurrent callers with the same key wait on the
+  leader's thread (or, with `run_async`, a task of the flight's own that
+  outlives a cancelled caller) and get its result or exception;
+- across workers, the leader holds an exclusive `flock` on
+  `<dir>/<key>.lock` while it computes and pickles its result next to it;
+  leaders of other workers that find the lock taken wait for a shared lock
+  and read the result. If there is none (the leader failed), or waiting
+  takes longer than `timeout`, they compute the answer themselves.
+
+A result file also answers callers that arrive up to `grace` seconds
+after its flight ended: a worker's requests queue behind its busy threads,
+and a worker that took the result from another one has nothing in its own
+caches for them. Anything that should be reused for longer belongs in a
+cache (see `llm_cache`, `exec_cache`). Result files, and lock files no
+flight holds, are removed after `result_ttl` seconds.
+
+Configured by `SINGLE_FLIGHT` (`workers`, the default; `process` to
+coalesce within a worker only; `off`), `SINGLE_FLIGHT_DIR` (default: a
+private directory under the system temp dir), `SINGLE_FLIGHT_TIMEOUT`
+(seconds, default 120) and `SINGLE_FLIGHT_GRACE` (seconds, default 2).
+
+Results are pickled, so the directory must be private: it has to be
+owned by the current user and closed to everyone else (mode 0o700), and
+result files must be owned by the current user too. An unsafe
+`SINGLE_FLIGHT_DIR` raises PermissionError; if the default directory is
+unsafe (e.g. another user created it first), answers are coalesced
+within each worker only, with a warning.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import pickle  # nosec B403 - only files this user wrote to a private dir
+import stat
+import tempfile
+import threading
+import time
+import warnings
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Iterator, Optional, TypeVar
+
+from .metrics import Family, get_metrics
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None  # type: ignore[assignment]
+
+T = TypeVar("T")
+
+_POLL = 0.01
+
+
+def flight_key(*parts: object) -> str:
+    """Return a key for the given request parts (e.g. prompt, fingerprint)."""
+    payload = json.dumps(parts, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+@dataclass
+class _Call:
+    event: threading.Event = field(default_factory=threading.Event)
+    result: Any = None
+    error: Optional[BaseException] = None
+
+
+@dataclass
+class _Flight:
+    task: asyncio.Task[Any]
+    waiters: int = 0
+
+
+class _LockFile:
+    """The cross-worker lock and result file of one key."""
+
+    def __init__(self, directory: Path, key: str) -> None:
+        self.result_path = directory / f"{key}.result"
+        self._path = directory / f"{key}.lock"
+        self._fd = os.open(self._path, os.O_CREAT | os.O_RDWR, 0o600)
+
+    def try_lead(self) -> bool:
+        while True:
+            try:
+                fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+            try:
+                current = os.stat(self._path).st_ino
+            except FileNotFoundError:
+                current = None
+            if current == os.fstat(self._fd).st_ino:
+                return True
+            # A sweep removed the file between our open and flock; a lock on
+            # the orphaned inode would exclude nobody, so take the new one.
+            os.close(self._fd)
+            self._fd = os.open(self._path, os.O_CREAT | os.O_RDWR, 0o600)
+
+    def wait(self, timeout: float) -> bool:
+        """Wait until the leader releases its lock; False on timeout."""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                fcntl.flock(self._fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    return False
+                time.sleep(_POLL)
+
+    def publish(self, result: Any) -> None:
+        temporary = self.result_path.with_suffix(f".{os.getpid()}.tmp")
+        with open(temporary, "wb") as handle:
+            pickle.dump(result, handle, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, self.result_path)
+
+    def read(self, since: float) -> tuple[bool, Any]:
+        """Return (True, result) if a result was published after `since`."""
+        try:
+            fd = os.open(self.result_path, os.O_RDONLY | _NOFOLLOW)
+            with open(fd, "rb") as handle:
+                status = os.fstat(fd)
+                if status.st_uid != os.getuid() or status.st_mtime < since:
+                    return False, None
+                return True, pickle.load(handle)  # nosec B301
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return False, None
+
+    def close(self) -> None:
+        os.close(self._fd)  # also releases the lock
+
+
+_NOFOLLOW = getattr(os, "O_NOFOLLOW", 0)
+
+
+def _private_directory(path: Path) -> Path:
+    """Create `path` if needed and check that only this user can use it.
+
+    Raises PermissionError if it is a symlink, not owned by the current
+    user, or accessible by group or others.
+    """
+    path.mkdir(mode=0o700, parents=True, exist_ok=True)
+    status = path.lstat()
+    if (
+        not stat.S_ISDIR(status.st_mode)
+        or status.st_uid != os.getuid()
+        or status.st_mode & 0o077
+    ):
+        raise PermissionError(
+            f"{path} must be a directory owned by this user with mode 0o700"
+        )
+    return path
+
+
+def _default_directory() -> Path:
+    user = os.getuid() if hasattr(os, "getuid") else 0
+    return Path(tempfile.gettempdir()) / f"workshop-single-flight-{user}"
+
+
+class SingleFlight:
+    """Runs at most one computation per key at a time; see the module doc."""
+
+    def __init__(
+        self,
+        directory: Path | str | None = None,
+        *,
+        timeout: float = 120.0,
+        grace: float = 2.0,
+        result_ttl: float = 60.0,
+    ) -> None:
+        """Coalesce within this process, and across processes via `directory`."""
+        self.directory = Path(directory) if directory is not None else None
+        if self.directory is not None:
+            if fcntl is None:
+                self.directory = None
+            else:
+                _private_directory(self.directory)
+        self.timeout = timeout
+        self.grace = grace
+        self.result_ttl = max(result_ttl, grace)
+        self.leaders = 0
+        self.followers = 0
+        self.remote_followers = 0
+        self._calls: dict[str, _Call] = {}
+        self._flights: dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+
+    @classmethod
+    def from_env(cls) -> Optional[SingleFlight]:
+        """Create from `SINGLE_FLIGHT*` variables; None when disabled."""
+        mode = (os.getenv("SINGLE_FLIGHT") or "workers").strip().lower()
+        if mode in ("off", "0", "false"):
+            return None
+        if mode not in ("workers", "process"):
+            raise ValueError(f"Unsupported SINGLE_FLIGHT mode: {mode!r}")
+        directory: Path | str | None = None
+        if mode == "workers":
+            directory = os.getenv("SINGLE_FLIGHT_DIR") or _default_directory()
+        timeout = float(os.getenv("SINGLE_FLIGHT_TIMEOUT", "120"))
+        grace = float(os.getenv("SINGLE_FLIGHT_GRACE", "2"))
+        try:
+            return cls(directory, timeout=timeout, grace=grace)
+        except PermissionError as ex:
+            if os.getenv("SINGLE_FLIGHT_DIR"):
+                raise
+            warnings.warn(
+                f"Not coalescing across workers: {ex}", RuntimeWarning, stacklevel=2
+            )
+            return cls(None, timeout=timeout, grace=grace)
+
+    def run(self, key: str, compute: Callable[[], T]) -> T:
+        """Return `compute()`, sharing it with concurrent calls for `key`."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if call is None:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.followers += 1
+        if not leader:
+            if not call.event.wait(self.timeout):
+                return compute()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = self._run_across_workers(key, compute)
+            return call.result
+        except BaseException as ex:
+            call.error = ex
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def _run_across_workers(self, key: str, compute: Callable[[], T]) -> T:
+        if self.directory is None:
+            return compute()
+        lock = _LockFile(self.directory, key)
+        try:
+            found, result = lock.read(time.time() - self.grace)
+            if found:
+                with self._lock:
+                    self.remote_followers += 1
+                return result
+            if not lock.try_lead():
+                # File times come from a coarse clock; any result published
+                # shortly before we started waiting is just as good.
+                since = time.time() - 1.0
+                if lock.wait(self.timeout):
+                    found, result = lock.read(since)
+                    if found:
+                        with self._lock:
+                            self.remote_followers += 1
+                        return result
+            result = compute()
+            lock.publish(result)
+            return result
+        finally:
+            lock.close()
+            self._sweep()
+
+    async def run_async(self, key: str, compute: Callable[[], Awaitable[T]]) -> T:
+        """Async `run()`: concurrent tasks for `key` await one `compute()`.
+
+        The computation runs in a task of its own, so a caller that is
+        cancelled (e.g. its client went away) leaves it running for the
+        others; it is cancelled only when no caller is left waiting.
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            task = asyncio.get_running_loop().create_task(
+                self._run_across_workers_async(key, compute)
+            )
+            flight = self._flights[key] = _Flight(task)
+            task.add_done_callback(lambda _: self._flights.pop(key, None))
+            with self._lock:
+                self.leaders += 1
+        else:
+            with self._lock:
+                self.followers += 1
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done():
+                flight.task.cancel()
+
+    async def _run_across_workers_async(
+        self, key: str, compute: Callable[[], Awaitable[T]]
+    ) -> T:
+        if self.directory is None:
+            return await compute()
+        # File I/O and (un)pickling run on threads, off the event loop.
+        lock = await asyncio.to_thread(_LockFile, self.directory, key)
+        try:
+            found, result = await asyncio.to_thread(lock.read, time.time() - self.grace)
+            if found:
+                with self._lock:
+                    self.remote_followers += 1
+                return result
+            if not lock.try_lead():
+                # File times come from a coarse clock; any result published
+                # shortly before we started waiting is just as good.
+                since = time.time() - 1.0
+                if await asyncio.to_thread(lock.wait, self.timeout):
+                    found, result = await asyncio.to_thread(lock.read, since)
+                    if found:
+                        with self._lock:
+                            self.remote_followers += 1
+                        return result
+            result = await compute()
+            await asyncio.to_thread(lock.publish, result)
+            return result
+        finally:
+            lock.close()
+            await asyncio.to_thread(self._sweep)
+
+    def _sweep(self) -> None:
+        """Remove files older than `result_ttl` (at most every ttl).
+
+        Lock files are only removed while no flight holds them.
+        """
+        now = time.time()
+        if self.directory is None or now - self._last_sweep < self.result_ttl:
+            return
+        self._last_sweep = now
+        for entry in os.scandir(self.directory):
+            try:
+                if now - entry.stat().st_mtime <= self.result_ttl:
+                    continue
+                if entry.name.endswith(".result"):
+                    os.unlink(entry.path)
+                elif entry.name.endswith(".lock"):
+                    _unlink_if_unlocked(entry.path)
+            except OSError:
+                pass
+
+
+def _unlink_if_unlocked(path: str) -> None:
+    fd = os.open(path, os.O_RDWR | _NOFOLLOW)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        pass  # a flight is running or waiting on it
+    else:
+        os.unlink(path)
+    finally:
+        os.close(fd)
+
+
+_FLIGHT: Optional[SingleFlight] = None
+_FLIGHT_CONFIG: Optional[tuple[Optional[str], ...]] = None
+_FLIGHT_LOCK = threading.Lock()
+
+
+def get_single_flight() -> Optional[SingleFlight]:
+    """Return the process-wide `SingleFlight`, or None when disabled."""
+    global _FLIGHT, _FLIGHT_CONFIG  # pylint: disable=global-statement
+    config = tuple(
+        os.getenv(name)
+        for name in (
+            "SINGLE_FLIGHT",
+            "SINGLE_FLIGHT_DIR",
+            "SINGLE_FLIGHT_TIMEOUT",
+            "SINGLE_FLIGHT_GRACE",
+        )
+    )
+    if config != _FLIGHT_CONFIG:
+        with _FLIGHT_LOCK:
+            if config != _FLIGHT_CONFIG:
+                _FLIGHT = SingleFlight.from_env()
+                _FLIGHT_CONFIG = config
+    return _FLIGHT
+
+
+def run_single_flight(key: str, compute: Callable[[], T]) -> T:
+    """Run `compute` through the process-wide `SingleFlight`, if enabled."""
+    flight = get_single_flight()
+    return flight.run(key, compute) if flight is not None else compute()
+
+
+async def run_single_flight_async(key: str, compute: Callable[[], Awaitable[T]]) -> T:
+    """Async `run_single_flight`."""
+    flight = get_single_flight()
+    if flight is None:
+        return await compute()
+    return await flight.run_async(key, compute)
+
+
+def _flight_metrics() -> Iterator[Family]:
+    flight = _FLIGHT
+    if flight is None:
+        return
+    yield (
+        "workshop_single_flight_total",
+        "counter",
+        "Requests by single-flight role: computed, or shared from a leader.",
+        [
+            ({"role": "leader"}, flight.leaders),
+            ({"role": "follower"}, flight.followers),
+            ({"role": "remote_follower"}, flight.remote_followers),
+        ],
+    )
+
+
+get_metrics().add_collector(_flight_metrics)
+
+
+def _after_fork_in_child() -> None:
+    # In-flight calls belong to the parent's threads; start with none.
+    global _FLIGHT, _FLIGHT_CONFIG, _FLIGHT_LOCK  # pylint: disable=global-statement
+    _FLIGHT = None
+    _FLIGHT_CONFIG = None
+    _FLIGHT_LOCK = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
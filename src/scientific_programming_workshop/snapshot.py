@@ -0,0 +1,163 @@
+"""Columnar binary snapshots of the workshop dataset.
+
+A snapshot is a directory with one `.npy` file per column plus a
+`manifest.json` recording the column layout and the SHA-256 of the source
+CSV. Numeric, datetime and categorical-code columns are memory-mapped on
+load, so forked workers share their pages through the OS page cache and a
+cold start does not parse any text.
+
+Build (or rebuild) the snapshot from the repository root with:
+
+    PYTHONPATH=src python -m scientific_programming_workshop.snapshot
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import shutil
+import sys
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from .paths import CSV_PATH, SNAPSHOT_DIR
+
+MANIFEST_NAME = "manifest.json"
+FORMAT_VERSION = 1
+
+
+def file_sha256(path: Path | str) -> str:
+    """Return the hex SHA-256 digest of a file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_column(snapshot_dir: Path, index: int, series: pd.Series) -> dict[str, Any]:
+    entry: dict[str, Any] = {"name": str(series.name), "file": f"{index:03d}.npy"}
+    dtype = series.dtype
+
+    if isinstance(dtype, pd.CategoricalDtype) or pd.api.types.is_object_dtype(dtype):
+        # Dictionary-encode text; codes are mmap-able, categories are small.
+        categorical = pd.Categorical(series)
+        entry["kind"] = "category" if isinstance(dtype, pd.CategoricalDtype) else "text"
+        entry["categories"] = [str(value) for value in categorical.categories]
+        np.save(snapshot_dir / entry["file"], categorical.codes)
+    elif pd.api.types.is_datetime64_any_dtype(dtype):
+        entry["kind"] = "datetime"
+        values = series.to_numpy(dtype="datetime64[ns]")
+        np.save(snapshot_dir / entry["file"], values.view("int64"))
+    else:
+        entry["kind"] = "numeric"
+        np.save(snapshot_dir / entry["file"], series.to_numpy())
+    return entry
+
+
+def build_snapshot(
+    data: pd.DataFrame,
+    snapshot_dir: Path | str = SNAPSHOT_DIR,
+    *,
+    source_path: Path | str = CSV_PATH,
+) -> Path:
+    """Write `data` as a columnar snapshot of `source_path`.
+
+    The snapshot is written to a temporary sibling directory and swapped in
+    at the end, so readers never observe a half-written snapshot.
+    """
+    snapshot_dir = Path(snapshot_dir)
+    tmp_dir = snapshot_dir.with_name(snapshot_dir.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    columns = [
+        _write_column(tmp_dir, index, data[name])
+        for index, name in enumerate(data.columns)
+    ]
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "source": Path(source_path).name,
+        "source_sha256": file_sha256(source_path),
+        "rows": len(data),
+        "columns": columns,
+    }
+    (tmp_dir / MANIFEST_NAME).write_text(json.dumps(manifest), encoding="utf-8")
+
+    shutil.rmtree(snapshot_dir, ignore_errors=True)
+    tmp_dir.rename(snapshot_dir)
+    return snapshot_dir
+
+
+def read_manifest(snapshot_dir: Path | str = SNAPSHOT_DIR) -> dict[str, Any] | None:
+    """Return the snapshot manifest, or None if there is no usable snapshot."""
+    manifest_path = Path(snapshot_dir) / MANIFEST_NAME
+    try:
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if manifest.get("format_version") != FORMAT_VERSION:
+        return None
+    return manifest
+
+
+def _read_column(snapshot_dir: Path, entry: dict[str, Any]) -> Any:
+    # A plain ndarray view keeps the mapping but hides the np.memmap subclass.
+    values = np.load(snapshot_dir / entry["file"], mmap_mode="r").view(np.ndarray)
+    kind = entry["kind"]
+    if kind == "category":
+        return pd.Categorical.from_codes(values, categories=entry["categories"])
+    if kind == "text":
+        categories = np.asarray(entry["categories"], dtype=object)
+        text = categories.take(values, mode="clip")
+        text[values < 0] = None
+        return text
+    if kind == "datetime":
+        return values.view("datetime64[ns]")
+    return values
+
+
+def load_snapshot(
+    snapshot_dir: Path | str = SNAPSHOT_DIR,
+    *,
+    expected_sha256: str | None = None,
+) -> pd.DataFrame | None:
+    """Memory-map a snapshot into a DataFrame.
+
+    Returns None when the snapshot is missing, from another format version,
+    or (if `expected_sha256` is given) built from a different source file.
+    """
+    snapshot_dir = Path(snapshot_dir)
+    manifest = read_manifest(snapshot_dir)
+    if manifest is None:
+        return None
+    if expected_sha256 is not None and manifest["source_sha256"] != expected_sha256:
+        return None
+
+    columns = {
+        entry["name"]: _read_column(snapshot_dir, entry)
+        for entry in manifest["columns"]
+    }
+    return pd.DataFrame(columns, copy=False)
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Build the snapshot for the workshop CSV (CLI entry point)."""
+    from .data_loading import read_autoscout_csv
+
+    argv = sys.argv[1:] if argv is None else argv
+    source = Path(argv[0]) if argv else CSV_PATH
+    target = Path(argv[1]) if len(argv) > 1 else SNAPSHOT_DIR
+
+    snapshot_dir = build_snapshot(
+        read_autoscout_csv(source), target, source_path=source
+    )
+    print(f"Wrote snapshot of {source} to {snapshot_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
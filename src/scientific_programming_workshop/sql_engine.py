@@ -0,0 +1,334 @@
+"""Embedded SQL backend for generated analyses.
+
+With `QUERY_BACKEND=sql` the model is asked to do the heavy lifting
+(filters, group-bys, joins, window functions) in SQL. Generated code gets
+a function `sql(query)` next to `data`; it runs the query against a table
+called `data` with the same columns and returns a pandas DataFrame, which
+the code then prints or plots as usual:
+
+    result = sql("SELECT make, AVG(price) AS price FROM data GROUP BY make")
+    result.plot.bar(x="make", y="price")
+
+A model answer in a ```sql block is run the same way (see
+`code_exec.extract_python_code`).
+
+The engine is DuckDB when it is installed: it scans the DataFrame in
+place, without copying, and runs queries vectorized on all cores. The
+fallback is SQLite from the standard library, which needs one copy of
+the dataset (in memory, or in a temporary file for out-of-core datasets)
+and runs on one core. `SQL_ENGINE` forces `duckdb` or `sqlite`.
+
+A dataset is only registered with the engine the first time a query
+runs against it; the `SQL_KEEP_DATASETS` (default 4) most recently used
+registrations are kept per process. Only single read-only queries are
+accepted: DuckDB parses the query and runs nothing but one SELECT, on a
+connection without file system access (an out-of-core copy is reopened
+read-only once loaded); SQLite refuses anything but reading through an
+authorizer and runs one statement at a time. The registered frame is a
+snapshot of `data` taken before the generated code runs, so changes the
+code makes to `data` never reach `sql()` results, neither its own nor
+those of later requests.
+"""
+
+from __future__ import annotations
+
+import functools
+import importlib
+import importlib.util
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+import pandas as pd
+
+from .metrics import Family, get_metrics
+from .out_of_core import ChunkedFrame
+
+TABLE = "data"
+ENGINES = ("duckdb", "sqlite")
+
+_READ_ONLY = re.compile(r"^\s*(select|with|values)\b", re.IGNORECASE)
+_DUCKDB_CONFIG = {"enable_external_access": False}
+_SQLITE_READS = frozenset(
+    {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION}
+    | {getattr(sqlite3, "SQLITE_RECURSIVE", sqlite3.SQLITE_SELECT)}
+)
+
+
+def _sqlite_authorizer(action: int, *_: Any) -> int:
+    return sqlite3.SQLITE_OK if action in _SQLITE_READS else sqlite3.SQLITE_DENY
+
+
+@dataclass(frozen=True)
+class SqlSettings:
+    """Which engine runs `sql()` queries."""
+
+    engine: str
+    keep: int = 4
+
+    @classmethod
+    def from_env(cls) -> Optional[SqlSettings]:
+        """Return settings from `QUERY_BACKEND`/`SQL_*`, or None for pandas."""
+        if os.getenv("QUERY_BACKEND", "pandas").strip().lower() != "sql":
+            return None
+        engine = os.getenv("SQL_ENGINE", "").strip().lower() or default_engine()
+        if engine not in ENGINES:
+            raise ValueError(f"Unsupported SQL_ENGINE: {engine!r}")
+        if engine == "duckdb" and not duckdb_installed():
+            raise ImportError("SQL_ENGINE=duckdb needs the duckdb package")
+        return cls(engine=engine, keep=int(os.getenv("SQL_KEEP_DATASETS", "4")))
+
+    @property
+    def dialect(self) -> str:
+        """Return the SQL dialect name for the model prompt."""
+        return "DuckDB" if self.engine == "duckdb" else "SQLite"
+
+
+@functools.lru_cache(maxsize=1)
+def duckdb_installed() -> bool:
+    """Return whether duckdb can be imported (without importing it)."""
+    return importlib.util.find_spec("duckdb") is not None
+
+
+def default_engine() -> str:
+    """Return "duckdb" if it is installed, else "sqlite"."""
+    return "duckdb" if duckdb_installed() else "sqlite"
+
+
+class SqlSession:
+    """One dataset registered with one engine.
+
+    Queries may come from several threads: DuckDB gets a cursor per query
+    and runs them concurrently, SQLite queries are serialized.
+    """
+
+    def __init__(self, engine: str, data: Any) -> None:
+        """Register `data` (a DataFrame or `ChunkedFrame`) as table `data`."""
+        self.engine = engine
+        self.queries = 0
+        self._lock = threading.Lock()
+        self._path: Optional[str] = None
+        self._frame: Optional[pd.DataFrame] = None
+        self._duckdb: Any = None
+        self._errors: tuple[type[Exception], ...] = (
+            sqlite3.Error,
+            pd.errors.DatabaseError,
+        )
+        start = time.perf_counter()
+        if engine == "duckdb":
+            self._connection = self._open_duckdb(data)
+        elif engine == "sqlite":
+            self._connection = self._open_sqlite(data)
+        else:
+            raise ValueError(f"Unsupported SQL engine: {engine!r}")
+        self.load_time = time.perf_counter() - start
+
+    def _open_duckdb(self, data: Any) -> Any:
+        duckdb = self._duckdb = importlib.import_module("duckdb")  # slow
+        self._errors = (duckdb.Error,)
+        if not isinstance(data, ChunkedFrame):
+            # Scanned in place; registrations are per cursor (see `query`).
+            self._frame = data
+            return duckdb.connect(config=_DUCKDB_CONFIG)
+        # Spill to a temporary database file rather than holding all rows.
+        self._path = _temporary_path(".duckdb")
+        connection = duckdb.connect(self._path)
+        for number, chunk in enumerate(data.iter_chunks()):
+            connection.register("chunk", chunk)
+            if number == 0:
+                connection.execute(f"CREATE TABLE {TABLE} AS SELECT * FROM chunk")
+            else:
+                connection.execute(f"INSERT INTO {TABLE} SELECT * FROM chunk")
+            connection.unregister("chunk")
+        connection.close()
+        return duckdb.connect(self._path, read_only=True, config=_DUCKDB_CONFIG)
+
+    def _open_sqlite(self, data: Any) -> sqlite3.Connection:
+        chunks: Iterable[pd.DataFrame] = [data]
+        target = ":memory:"
+        if isinstance(data, ChunkedFrame):
+            chunks = data.iter_chunks()
+            self._path = target = _temporary_path(".sqlite")
+        connection = sqlite3.connect(target, check_same_thread=False)
+        for chunk in chunks:
+            chunk.to_sql(TABLE, connection, index=False, if_exists="append")
+        connection.execute("PRAGMA query_only = ON")
+        connection.set_authorizer(_sqlite_authorizer)
+        return connection
+
+    def query(self, sql: str) -> pd.DataFrame:
+        """Run a read-only `sql` query and return the result as a DataFrame."""
+        if not _READ_ONLY.match(sql):
+            raise ValueError("sql() only runs SELECT, WITH or VALUES queries")
+        with self._lock:
+            self.queries += 1
+            if self.engine == "sqlite":
+                try:
+                    return pd.read_sql_query(sql, self._connection)
+                except self._errors as ex:
+                    raise ValueError(f"SQL error: {ex}") from ex
+            cursor = self._connection.cursor()
+        try:
+            statements = self._duckdb.extract_statements(sql)
+            if len(statements) != 1 or (
+                statements[0].type != self._duckdb.StatementType.SELECT
+            ):
+                raise ValueError("sql() only runs a single SELECT query")
+            if self._frame is not None:
+                cursor.register(TABLE, self._frame)
+            return cursor.execute(statements[0]).df()
+        except self._errors as ex:
+            raise ValueError(f"SQL error: {ex}") from ex
+        finally:
+            cursor.close()
+
+    def close(self) -> None:
+        """Close the connection and remove any temporary database file."""
+        self._connection.close()
+        if self._path is not None:
+            try:
+                os.unlink(self._path)
+            except OSError:
+                pass
+
+
+def _temporary_path(suffix: str) -> str:
+    handle, path = tempfile.mkstemp(prefix="workshop-sql-", suffix=suffix)
+    os.close(handle)
+    os.unlink(path)  # the engine creates its own file
+    return path
+
+
+class SqlSessions:
+    """Sessions by dataset fingerprint, keeping the most recently used."""
+
+    def __init__(self, settings: SqlSettings) -> None:
+        """Create an empty set of sessions for `settings.engine`."""
+        self.settings = settings
+        self._sessions: OrderedDict[str, SqlSession] = OrderedDict()
+        self._loading: dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def _cached(self, key: str) -> Optional[SqlSession]:
+        session = self._sessions.get(key)
+        if session is not None:
+            self._sessions.move_to_end(key)
+        return session
+
+    def session(self, key: str, data: Any) -> SqlSession:
+        """Return the session for the dataset `key`, registering `data` once.
+
+        Registering can take a while (out-of-core datasets are copied to a
+        file); it holds a lock for `key` only, so queries on other
+        datasets are not held up.
+        """
+        with self._lock:
+            session = self._cached(key)
+            if session is not None:
+                return session
+            loading = self._loading.setdefault(key, threading.Lock())
+        with loading:
+            with self._lock:
+                session = self._cached(key)
+            if session is not None:
+                return session
+            session = SqlSession(self.settings.engine, data)
+            dropped = []
+            with self._lock:
+                self._loading.pop(key, None)
+                self._sessions[key] = session
+                while len(self._sessions) > self.settings.keep:
+                    dropped.append(self._sessions.popitem(last=False)[1])
+        for old in dropped:
+            old.close()
+        return session
+
+    def function(self, key: str, data: Any) -> Callable[[str], pd.DataFrame]:
+        """Return the `sql()` function for generated code on dataset `key`.
+
+        Call it before the code runs: a DataFrame is registered as it is
+        now (a shallow copy), not as the code may leave `data`.
+        """
+        if isinstance(data, pd.DataFrame):
+            data = data.copy(deep=False)
+
+        def sql(query: str) -> pd.DataFrame:
+            return self.session(key, data).query(query)
+
+        return sql
+
+    def stats(self) -> Iterator[tuple[str, int]]:
+        """Yield (dataset key, queries run) for each registered dataset."""
+        with self._lock:
+            items = list(self._sessions.items())
+        for key, session in items:
+            yield key, session.queries
+
+    def close(self) -> None:
+        """Close every session."""
+        with self._lock:
+            sessions, self._sessions = self._sessions, OrderedDict()
+        for session in sessions.values():
+            session.close()
+
+
+_SESSIONS: Optional[SqlSessions] = None
+_SESSIONS_LOCK = threading.Lock()
+
+
+def get_sql_sessions() -> Optional[SqlSessions]:
+    """Return the process-wide sessions, or None unless `QUERY_BACKEND=sql`."""
+    global _SESSIONS  # pylint: disable=global-statement
+    settings = SqlSettings.from_env()
+    if settings is None:
+        return None
+    if _SESSIONS is None or _SESSIONS.settings != settings:
+        with _SESSIONS_LOCK:
+            if _SESSIONS is None or _SESSIONS.settings != settings:
+                if _SESSIONS is not None:
+                    _SESSIONS.close()
+                _SESSIONS = SqlSessions(settings)
+    return _SESSIONS
+
+
+def sql_globals(key: Optional[str], data: Any) -> dict[str, Any]:
+    """Return `{"sql": ...}` for generated code, or {} when SQL is off."""
+    sessions = get_sql_sessions()
+    if sessions is None or key is None:
+        return {}
+    return {"sql": sessions.function(key, data)}
+
+
+def _sql_metrics() -> Iterator[Family]:
+    sessions = _SESSIONS
+    if sessions is None:
+        return
+    yield (
+        "workshop_sql_queries_total",
+        "counter",
+        "sql() queries run per registered dataset.",
+        [
+            ({"engine": sessions.settings.engine, "dataset": key}, count)
+            for key, count in sessions.stats()
+        ],
+    )
+
+
+get_metrics().add_collector(_sql_metrics)
+
+
+def _after_fork_in_child() -> None:
+    # Connections must not be shared with the parent; children reconnect.
+    global _SESSIONS, _SESSIONS_LOCK  # pylint: disable=global-statement
+    _SESSIONS = None
+    _SESSIONS_LOCK = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
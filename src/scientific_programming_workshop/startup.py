@@ -0,0 +1,76 @@
+"""Warm-up for servers that import the app once and fork workers.
+
+Importing the app is kept cheap: pyplot, openai, pyarrow and duckdb are
+imported on first use. A preforking server (gunicorn with `preload_app`,
+see `gunicorn.conf.py`) can instead pay for everything once in the master
+with `warm_up()`:
+
+- the default dataset (frame and aggregate cube) is loaded, and the data
+  explorer's indexes of it are built,
+- pyplot is imported with the plot style applied, and a figure with text
+  is rendered so the font cache and Agg renderer are initialised,
+- openai and the modules in `PRELOAD_MODULES` (comma-separated, e.g.
+  `seaborn,sklearn` for libraries generated code often imports) are
+  imported,
+- `gc.freeze()` moves everything into the permanent generation, so the
+  workers' garbage collector does not write to (and thereby copy) the
+  pages they share with the master.
+
+Forked workers then start with all of it in copy-on-write memory. Nothing
+here starts threads or opens connections, which would not survive fork.
+"""
+
+from __future__ import annotations
+
+import gc
+import importlib
+import io
+import os
+import time
+from contextlib import suppress
+from typing import Callable, Sequence
+
+from .dataset_registry import get_dataset_registry
+from .plotting import configure_plot_style, load_pyplot
+
+
+def _render_text_figure() -> None:
+    pyplot = load_pyplot()
+    figure, axes = pyplot.subplots(figsize=(2, 2))
+    axes.plot([0, 1], [0, 1], label="warm-up")
+    axes.set_title("warm-up")
+    axes.legend()
+    figure.savefig(io.BytesIO(), format="png")
+    pyplot.close(figure)
+
+
+def warm_up(
+    *, modules: Sequence[str] = (), dataset: bool = True, freeze: bool = True
+) -> dict[str, float]:
+    """Load shared state before forking; return seconds spent per step."""
+    timings: dict[str, float] = {}
+
+    def step(name: str, action: Callable[[], object]) -> None:
+        start = time.perf_counter()
+        action()
+        timings[name] = time.perf_counter() - start
+
+    if dataset:
+        registry = get_dataset_registry()
+        step("dataset", lambda: registry.current(registry.default))
+        with suppress(ValueError):  # out-of-core datasets have no index
+            step("data index", lambda: registry.current(registry.default).index)
+    configure_plot_style()
+    step("pyplot", load_pyplot)
+    step("fonts", _render_text_figure)
+    for name in ("openai", *modules):
+        step(name, lambda name=name: importlib.import_module(name))
+    if freeze:
+        step("gc.freeze", lambda: (gc.collect(), gc.freeze()))
+    return timings
+
+
+def preload_modules_from_env() -> list[str]:
+    """Return the module names listed in `PRELOAD_MODULES`."""
+    names = os.getenv("PRELOAD_MODULES", "").split(",")
+    return [name.strip() for name in names if name.strip()]
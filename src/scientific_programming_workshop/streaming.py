@@ -0,0 +1,489 @@
+"""Server-sent events for streaming an analysis to the browser.
+
+`stream_analysis()` yields SSE messages while the pipeline runs:
+
+- `token`: a piece of model output, as soon as it arrives
+- `code`: the extracted code, as soon as its closing fence has streamed
+  (after `code_advisor` has rewritten any slow pandas idioms)
+- `advice`: the advisor's findings for that code, if any (list of strings)
+- `stdout`: one line of execution output
+- `error`: an error message (API or execution)
+- `graphic`: URL of a rendered figure (one event per figure)
+- `done`: end of the stream (empty payload)
+
+Execution starts as soon as the code block is complete, so it overlaps
+with the rest of the model's answer (usually an explanation). Streams ask
+for token usage, which arrives with the last chunk and goes to the
+metrics like that of other completions.
+
+`astream_analysis()` is the same pipeline for the async app: it awaits an
+`AsyncOpenAI` stream and runs the code through `run_code_async`.
+
+`coalesced_stream()` (and `acoalesced_stream()`) put a stream through the
+single flight (see `single_flight`): the first request for a question
+streams the pipeline as it runs, identical requests in the meantime wait
+for its answer and get it as one burst of the same events
+(`replay_events()`).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import queue
+import threading
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Iterable,
+    Iterator,
+    TypeVar,
+)
+
+import pandas as pd
+
+from .code_advisor import advise_from_env
+from .code_exec import CodeBlockScanner, ExecResult, RenderedFigure
+from .executor import run_code, run_code_async
+from .llm_cache import ResponseCache, cache_key, get_response_cache
+from .metrics import get_metrics
+from .single_flight import run_single_flight, run_single_flight_async
+
+T = TypeVar("T")
+
+# Called with the model's answer, the code run, the advice and the result.
+OnAnswer = Callable[[str, str, list[str], ExecResult], None]
+
+
+def sse_event(event: str, data: Any) -> str:
+    """Format one server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class _BackgroundExecution:
+    """Run code on a background thread and queue its output lines."""
+
+    _DONE = object()
+
+    def __init__(self, run: Callable[[Callable[[str], None]], ExecResult]) -> None:
+        self.result: ExecResult | None = None
+        self._lines: queue.Queue[Any] = queue.Queue()
+        self._thread = threading.Thread(target=self._run, args=(run,), daemon=True)
+        self._thread.start()
+
+    def _run(self, run: Callable[[Callable[[str], None]], ExecResult]) -> None:
+        try:
+            self.result = run(self._lines.put)
+        finally:
+            self._lines.put(self._DONE)
+
+    def ready_lines(self) -> Iterator[str]:
+        """Yield the lines printed so far without blocking."""
+        while True:
+            try:
+                line = self._lines.get_nowait()
+            except queue.Empty:
+                return
+            if line is self._DONE:
+                self._lines.put(line)
+                return
+            yield line
+
+    def remaining_lines(self) -> Iterator[str]:
+        """Yield lines until execution finishes."""
+        while (line := self._lines.get()) is not self._DONE:
+            yield line
+        self._thread.join()
+
+
+def _advised(
+    code: str, data: pd.DataFrame, check: bool
+) -> tuple[str, list[str], list[str]]:
+    """Return the code to run, the advice and its `code` (and `advice`) events.
+
+    Without `check` the code is run as is (e.g. from `intent_router`).
+    """
+    if not check:
+        return code, [], [sse_event("code", code)]
+    advice = advise_from_env(code, columns=data.columns)
+    messages = advice.messages() if advice.findings else []
+    events = [sse_event("code", advice.code)]
+    if messages:
+        events.append(sse_event("advice", messages))
+    return advice.code, messages, events
+
+
+def stream_analysis(
+    *,
+    client: Any,
+    model: str,
+    messages: list[dict[str, str]],
+    max_tokens: int,
+    user_prompt: str,
+    fingerprint: str,
+    data: pd.DataFrame,
+    plt: Any,
+    figure_format: str = "png",
+    figure_url: Callable[[RenderedFigure], str] | None = None,
+    cache: ResponseCache | None = None,
+    answer: str | None = None,
+    variant: str = "",
+    on_answer: OnAnswer | None = None,
+) -> Iterator[str]:
+    """Yield SSE messages for the generate -> extract -> execute pipeline.
+
+    Completed answers are stored in (and served from) the response cache,
+    with the same key as `cached_chat_completion` (including `variant`).
+    An `answer` given by the caller (e.g. from `intent_router`) is used
+    instead of calling the model (`client` may then be None), and its code
+    runs without `code_advisor`. `on_answer` is called with the whole
+    answer before the final `done` event.
+    """
+    cache = cache or get_response_cache()
+    key = cache_key(
+        model=model,
+        prompt=user_prompt,
+        max_tokens=max_tokens,
+        fingerprint=fingerprint,
+        variant=variant,
+    )
+    scanner = CodeBlockScanner()
+    execution: _BackgroundExecution | None = None
+    code, advice = "", []
+
+    def start(code: str) -> _BackgroundExecution:
+        return _BackgroundExecution(
+            lambda on_output: run_code(
+                code=code,
+                data=data,
+                plt=plt,
+                on_output=on_output,
+                fingerprint=fingerprint,
+                figure_format=figure_format,
+            )
+        )
+
+    cached = answer
+    if cached is None and cache.enabled:
+        cached = cache.get(key)
+    chunks = (
+        [cached]
+        if cached is not None
+        else _stream_tokens(
+            client, model=model, messages=messages, max_tokens=max_tokens
+        )
+    )
+    for chunk in chunks:
+        yield sse_event("token", chunk)
+        block = scanner.feed(chunk)
+        if block is not None:
+            code, advice, events = _advised(block, data, answer is None)
+            yield "".join(events)
+            execution = start(code)
+        if execution is not None:
+            for line in execution.ready_lines():
+                yield sse_event("stdout", line)
+
+    if cached is None and scanner.text and cache.enabled:
+        cache.put(key, scanner.text)
+
+    if execution is None:
+        code, advice, events = _advised(scanner.finish(), data, answer is None)
+        yield "".join(events)
+        execution = start(code)
+
+    for line in execution.remaining_lines():
+        yield sse_event("stdout", line)
+
+    result = execution.result
+    if result is not None and result.error:
+        yield sse_event("error", result.error)
+    if result is not None and figure_url is not None:
+        for figure in result.figures:
+            yield sse_event("graphic", figure_url(figure))
+    if result is not None and on_answer is not None:
+        on_answer(scanner.text, code, advice, result)
+    yield sse_event("done", {})
+
+
+def replay_events(
+    response: str,
+    code: str,
+    advice: Iterable[str],
+    result: ExecResult,
+    figure_url: Callable[[RenderedFigure], str] | None = None,
+) -> Iterator[str]:
+    """Yield the events `stream_analysis` sent for an answer, all at once."""
+    yield sse_event("token", response)
+    yield sse_event("code", code)
+    if advice := list(advice):
+        yield sse_event("advice", advice)
+    for line in result.stdout.splitlines(keepends=True):
+        yield sse_event("stdout", line)
+    if result.error:
+        yield sse_event("error", result.error)
+    if figure_url is not None:
+        for figure in result.figures:
+            yield sse_event("graphic", figure_url(figure))
+    yield sse_event("done", {})
+
+
+class _Replay:
+    """Queue item: this request followed another; replay its answer."""
+
+    def __init__(self, answer: Any) -> None:
+        self.answer = answer
+
+
+_END = object()
+
+
+def coalesced_stream(
+    key: str,
+    run: Callable[[Callable[[str], None]], T],
+    replay: Callable[[T], Iterable[str]],
+) -> Iterator[str]:
+    """Yield the events of a stream, sharing it with identical streams.
+
+    `run(emit)` runs the pipeline, passing each event to `emit`, and
+    returns its answer; it is called on a helper thread (wrap it with
+    e.g. `flask.copy_current_request_context` if it needs the request).
+    If another request with `key` is in flight (see `single_flight`),
+    `run` is not called and the events of `replay(answer)` are yielded
+    once that request has its answer. Exceptions from `run` are raised
+    here, in leaders and followers alike.
+    """
+    events: queue.Queue[Any] = queue.Queue()
+    led = False
+
+    def compute() -> T:
+        nonlocal led
+        led = True
+        return run(events.put)
+
+    def flight() -> None:
+        try:
+            answer = run_single_flight(key, compute)
+            if not led:
+                events.put(_Replay(answer))
+        except BaseException as ex:  # pylint: disable=broad-exception-caught
+            events.put(ex)
+        finally:
+            events.put(_END)
+
+    threading.Thread(target=flight, daemon=True).start()
+    while (item := events.get()) is not _END:
+        if isinstance(item, _Replay):
+            yield from replay(item.answer)
+        elif isinstance(item, BaseException):
+            raise item
+        else:
+            yield item
+
+
+# Flights keep running when their client disconnects; hold on to them.
+_FLIGHT_TASKS: set[asyncio.Task[Any]] = set()
+
+
+async def acoalesced_stream(
+    key: str,
+    run: Callable[[Callable[[str], None]], Awaitable[T]],
+    replay: Callable[[T], Iterable[str]],
+) -> AsyncIterator[str]:
+    """Async `coalesced_stream`; `run` runs as a task of the current loop."""
+    events: asyncio.Queue[Any] = asyncio.Queue()
+    led = False
+
+    async def compute() -> T:
+        nonlocal led
+        led = True
+        return await run(events.put_nowait)
+
+    async def flight() -> None:
+        try:
+            answer = await run_single_flight_async(key, compute)
+            if not led:
+                events.put_nowait(_Replay(answer))
+        except Exception as ex:  # pylint: disable=broad-exception-caught
+            events.put_nowait(ex)
+        finally:
+            events.put_nowait(_END)
+
+    task = asyncio.ensure_future(flight())
+    _FLIGHT_TASKS.add(task)
+    task.add_done_callback(_FLIGHT_TASKS.discard)
+    while (item := await events.get()) is not _END:
+        if isinstance(item, _Replay):
+            for event in replay(item.answer):
+                yield event
+        elif isinstance(item, BaseException):
+            raise item
+        else:
+            yield item
+
+
+def _stream_tokens(
+    client: Any, *, model: str, messages: list[dict[str, str]], max_tokens: int
+) -> Iterator[str]:
+    stream = client.chat.completions.create(
+        model=model,
+        messages=messages,
+        max_tokens=max_tokens,
+        stream=True,
+        stream_options={"include_usage": True},
+    )
+    try:
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+            get_metrics().record_usage(getattr(chunk, "usage", None))  # last chunk
+    finally:
+        stream.close()
+
+
+class _AsyncExecution:
+    """Run code as an asyncio task and queue its output lines."""
+
+    _DONE = object()
+
+    def __init__(
+        self, run: Callable[[Callable[[str], None]], Awaitable[ExecResult]]
+    ) -> None:
+        self.result: ExecResult | None = None
+        self._lines: asyncio.Queue[Any] = asyncio.Queue()
+        self._task = asyncio.ensure_future(self._run(run))
+
+    async def _run(
+        self, run: Callable[[Callable[[str], None]], Awaitable[ExecResult]]
+    ) -> None:
+        try:
+            self.result = await run(self._lines.put_nowait)
+        finally:
+            self._lines.put_nowait(self._DONE)
+
+    def ready_lines(self) -> Iterator[str]:
+        """Yield the lines printed so far without waiting."""
+        while True:
+            try:
+                line = self._lines.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            if line is self._DONE:
+                self._lines.put_nowait(line)
+                return
+            yield line
+
+    async def remaining_lines(self) -> AsyncIterator[str]:
+        """Yield lines until execution finishes."""
+        while (line := await self._lines.get()) is not self._DONE:
+            yield line
+        await self._task
+
+
+async def astream_analysis(
+    *,
+    client: Any,
+    model: str,
+    messages: list[dict[str, str]],
+    max_tokens: int,
+    user_prompt: str,
+    fingerprint: str,
+    data: pd.DataFrame,
+    plt: Any,
+    figure_format: str = "png",
+    figure_url: Callable[[RenderedFigure], str] | None = None,
+    cache: ResponseCache | None = None,
+    answer: str | None = None,
+    variant: str = "",
+    on_answer: OnAnswer | None = None,
+) -> AsyncIterator[str]:
+    """Async version of `stream_analysis` for an `AsyncOpenAI` client."""
+    cache = cache or get_response_cache()
+    key = cache_key(
+        model=model,
+        prompt=user_prompt,
+        max_tokens=max_tokens,
+        fingerprint=fingerprint,
+        variant=variant,
+    )
+    scanner = CodeBlockScanner()
+    execution: _AsyncExecution | None = None
+    code, advice = "", []
+
+    def start(code: str) -> _AsyncExecution:
+        return _AsyncExecution(
+            lambda on_output: run_code_async(
+                code=code,
+                data=data,
+                plt=plt,
+                on_output=on_output,
+                fingerprint=fingerprint,
+                figure_format=figure_format,
+            )
+        )
+
+    cached = answer
+    if cached is None and cache.enabled:
+        cached = cache.get(key)
+    async for chunk in _astream_tokens(
+        client, model=model, messages=messages, max_tokens=max_tokens, cached=cached
+    ):
+        yield sse_event("token", chunk)
+        block = scanner.feed(chunk)
+        if block is not None:
+            code, advice, events = _advised(block, data, answer is None)
+            yield "".join(events)
+            execution = start(code)
+        if execution is not None:
+            for line in execution.ready_lines():
+                yield sse_event("stdout", line)
+
+    if cached is None and scanner.text and cache.enabled:
+        cache.put(key, scanner.text)
+
+    if execution is None:
+        code, advice, events = _advised(scanner.finish(), data, answer is None)
+        yield "".join(events)
+        execution = start(code)
+
+    async for line in execution.remaining_lines():
+        yield sse_event("stdout", line)
+
+    result = execution.result
+    if result is not None and result.error:
+        yield sse_event("error", result.error)
+    if result is not None and figure_url is not None:
+        for figure in result.figures:
+            yield sse_event("graphic", figure_url(figure))
+    if result is not None and on_answer is not None:
+        on_answer(scanner.text, code, advice, result)
+    yield sse_event("done", {})
+
+
+async def _astream_tokens(
+    client: Any,
+    *,
+    model: str,
+    messages: list[dict[str, str]],
+    max_tokens: int,
+    cached: str | None,
+) -> AsyncIterator[str]:
+    if cached is not None:
+        yield cached
+        return
+    stream = await client.chat.completions.create(
+        model=model,
+        messages=messages,
+        max_tokens=max_tokens,
+        stream=True,
+        stream_options={"include_usage": True},
+    )
+    try:
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+            get_metrics().record_usage(getattr(chunk, "usage", None))  # last chunk
+    finally:
+        await stream.close()
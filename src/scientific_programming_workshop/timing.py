@@ -0,0 +1,58 @@
+"""Per-request stage timings.
+
+The apps time the stages of a request (dataset load, intent routing,
+prompt build, LLM wait, code extraction, execution, figure rendering,
+template rendering) with a `StageTimings` and report them in a
+`Server-Timing` header, which browsers show in their dev tools and the
+benchmarks in `benchmarks/` aggregate. With metrics enabled they also
+feed the `/metrics` histograms.
+"""
+
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+# "figures" (rendering plots to images) is part of "exec".
+STAGES = ("load", "route", "prompt", "llm", "extract", "exec", "figures", "render")
+
+
+class StageTimings:
+    """Accumulate wall-clock seconds per named stage."""
+
+    def __init__(self) -> None:
+        """Start with no recorded stages."""
+        self.durations: dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time the body of a `with` block and add it to stage `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name: str, seconds: float) -> None:
+        """Add a duration measured elsewhere to stage `name`."""
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    def server_timing(self) -> str:
+        """Return the timings as a `Server-Timing` header value (in ms)."""
+        return ", ".join(
+            f"{name};dur={seconds * 1000:.3f}"
+            for name, seconds in self.durations.items()
+        )
+
+
+def parse_server_timing(header: str) -> dict[str, float]:
+    """Parse a `Server-Timing` header into milliseconds per metric."""
+    durations: dict[str, float] = {}
+    for metric in filter(None, (part.strip() for part in header.split(","))):
+        name, *params = (part.strip() for part in metric.split(";"))
+        for param in params:
+            key, _, value = param.partition("=")
+            if key == "dur":
+                durations[name] = float(value)
+    return durations
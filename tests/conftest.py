@@ -28,3 +28,25 @@ def _flask_app_step_04():
 def client_step_04(flask_app_step_04):
     """Return a Flask test client for step 04."""
     return flask_app_step_04.test_client()
+
+
+@pytest.fixture()
+def fake_llm(monkeypatch, tmp_path):
+    """Run a stub OpenAI server and point the shared client at it.
+
+    The response cache is cleared, and answers are coalesced in a fresh
+    directory, so every test starts with a cold cache.
+    """
+    from scientific_programming_workshop import llm_client
+    from scientific_programming_workshop.fake_llm import FakeLLMServer
+    from scientific_programming_workshop.llm_cache import get_response_cache
+
+    with FakeLLMServer() as server:
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+        monkeypatch.setenv("OPENAI_BASE_URL", server.base_url)
+        monkeypatch.setenv("SINGLE_FLIGHT_DIR", str(tmp_path / "flights"))
+        llm_client.reset_openai_client()
+        get_response_cache().clear()
+        yield server
+        llm_client.close_openai_client()
+        get_response_cache().clear()
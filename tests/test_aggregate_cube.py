@@ -0,0 +1,134 @@
+"""Tests for the precomputed aggregate cube."""
+
+from __future__ import annotations
+
+import os
+
+import pandas as pd
+import pytest
+
+from scientific_programming_workshop.aggregate_cube import AggregateCube
+from scientific_programming_workshop.data_loading import (
+    DatasetStore,
+    get_dataset_store,
+)
+
+CSV_TEXT = (
+    "make,fuel_type,transmission,dealer_city,init_regist_year,price,hp\n"
+    "AUDI,Diesel,Automat,Zürich,2014,22500,150\n"
+    "BMW,Benzin,Schaltgetriebe,Bern,2013,18000,\n"
+    "AUDI,Benzin,Automat,Bern,2019,31000,190\n"
+)
+
+
+def _assert_same(got: pd.Series, expected: pd.Series) -> None:
+    pd.testing.assert_series_equal(
+        got,
+        expected,
+        check_names=False,
+        check_dtype=False,
+        check_index_type=False,
+        check_categorical=False,
+    )
+
+
+@pytest.fixture(name="data", scope="module")
+def _data():
+    return get_dataset_store().current().frame
+
+
+@pytest.mark.parametrize(
+    "by", ["fuel_type", ["make", "transmission"], ["dealer_city", "make"]]
+)
+@pytest.mark.parametrize("stat", ["count", "sum", "min", "max", "mean"])
+def test_query_matches_groupby(data, by, stat):
+    """Every cube query equals the corresponding pandas group-by."""
+    cube = get_dataset_store().current().cube
+
+    for measure in ("price", "mileage", "hp"):
+        expected = getattr(data.groupby(by, observed=True)[measure], stat)()
+        _assert_same(cube.query(by, measure, stat), expected)
+    _assert_same(cube.size(by), data.groupby(by, observed=True).size())
+
+
+def test_value_and_level_order(data):
+    """Single cells and any order of dimensions are served from the cube."""
+    cube = AggregateCube.build(data)
+
+    audi = data[data["make"] == "AUDI"]
+    assert cube.value("price", "max", make="AUDI") == audi["price"].max()
+    assert cube.value("hp", "mean", fuel_type="Diesel", make="AUDI") == (
+        pytest.approx(audi.loc[audi["fuel_type"] == "Diesel", "hp"].mean())
+    )
+    swapped = cube.query(["transmission", "make"], "price", "sum")
+    assert swapped.index.names == ["transmission", "make"]
+    assert not cube.covers("price") and cube.covers("make", "hp")
+
+
+def test_missing_values_match_pandas(tmp_path):
+    """NaN measures are skipped like pandas does; all-NaN groups give NaN."""
+    path = tmp_path / "cars.csv"
+    path.write_text(CSV_TEXT, encoding="utf-8")
+    data = DatasetStore(path).frame()
+
+    cube = AggregateCube.build(data)
+
+    grouped = data.groupby("make", observed=True)["hp"]
+    _assert_same(cube.query("make", "hp", "mean"), grouped.mean())
+    _assert_same(cube.query("make", "hp", "count"), grouped.count())
+
+
+def test_extend_equals_rebuild(data):
+    """Merging appended rows gives the same aggregates as a full rebuild."""
+    full = AggregateCube.build(data)
+    extended = AggregateCube.build(data.iloc[:3000]).extend(data.iloc[3000:])
+
+    for by in ("fuel_type", ["make", "dealer_city"]):
+        pd.testing.assert_frame_equal(
+            extended.table(by), full.table(by), check_dtype=False
+        )
+
+
+def test_store_extends_cube_when_rows_are_appended(tmp_path, monkeypatch):
+    """Appending rows refreshes the cube incrementally; edits rebuild it."""
+    path = tmp_path / "cars.csv"
+    path.write_text(CSV_TEXT, encoding="utf-8")
+    store = DatasetStore(path)
+    assert store.current().cube.value("price", "sum", make="AUDI") == 53500
+
+    def touch(text: str) -> None:
+        path.write_text(text, encoding="utf-8")
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    builds = []
+    build = AggregateCube.build.__func__
+    monkeypatch.setattr(
+        AggregateCube,
+        "build",
+        classmethod(lambda cls, frame: builds.append(len(frame)) or build(cls, frame)),
+    )
+
+    touch(CSV_TEXT + "AUDI,Diesel,Automat,Basel,2020,9000,110\n")
+    assert store.current().cube.value("price", "sum", make="AUDI") == 62500
+    assert builds == []
+
+    touch(CSV_TEXT.replace("22500", "20000"))
+    assert store.current().cube.value("price", "sum", make="AUDI") == 51000
+    assert builds == [3]
+
+
+def test_generated_code_can_query_cube(client_step_04, fake_llm):
+    """Generated code sees the cube as `cube`; the prompt mentions it."""
+    prompts = []
+    code = "print(cube.query('fuel_type', 'price').idxmax())"
+    fake_llm.answer = lambda prompt: prompts.append(prompt) or f"```python\n{code}\n```"
+
+    html = client_step_04.post("/", data={"prompt": "priciest fuel"}).get_data(
+        as_text=True
+    )
+
+    data = get_dataset_store().current().frame
+    expected = data.groupby("fuel_type", observed=True)["price"].mean().idxmax()
+    assert f"{expected}\n" in html
+    assert "cube.query(by, measure, stat)" in prompts[0]
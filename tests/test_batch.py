@@ -0,0 +1,79 @@
+"""Tests for the offline batch mode."""
+
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from scientific_programming_workshop.batch import (
+    RESULTS_NAME,
+    main,
+    read_checkpoint,
+    read_questions,
+)
+
+
+def write_lines(path, *entries):
+    """Write `entries` to `path` as JSON Lines; return the path."""
+    path.write_text("".join(json.dumps(entry) + "\n" for entry in entries))
+    return path
+
+
+def test_read_questions_defaults_and_rejects_duplicates(tmp_path):
+    """Ids default to line numbers; duplicate ids and missing prompts fail."""
+    path = tmp_path / "q.jsonl"
+    path.write_text('{"prompt": "a"}\n\n{"id": "x", "prompt": "b", "dataset": "d"}\n')
+    first, second = read_questions(path)
+    assert (first.id, first.dataset) == ("1", None)
+    assert (second.id, second.dataset) == ("x", "d")
+
+    write_lines(path, {"id": "x", "prompt": "a"}, {"id": "x", "prompt": "b"})
+    with pytest.raises(ValueError, match="duplicate id"):
+        read_questions(path)
+    write_lines(path, {"id": "x"})
+    with pytest.raises(ValueError, match="prompt"):
+        read_questions(path)
+
+
+def test_checkpoint_drops_a_partial_last_record(tmp_path):
+    """A record cut short by a crash is removed so appends start cleanly."""
+    path = tmp_path / RESULTS_NAME
+    path.write_text('{"id": "a", "status": "done"}\n{"id": "b", "sta')
+    assert list(read_checkpoint(path)) == ["a"]
+    assert path.read_text() == '{"id": "a", "status": "done"}\n'
+
+
+def test_batch_answers_records_and_resumes(fake_llm, monkeypatch, tmp_path):
+    """Answered questions are skipped on the next run; failures are reported."""
+    monkeypatch.setenv("EXEC_POOL_SIZE", "0")
+    monkeypatch.setenv("INTENT_ROUTER", "off")
+    fake_llm.answer = "```python\nprint(len(data) > 0)\nplt.plot([1, 2])\n```"
+    questions = write_lines(
+        tmp_path / "q.jsonl",
+        {"id": "plot/1", "prompt": "Plot something."},
+        {"id": "count", "prompt": "Any rows?"},
+        {"id": "other", "prompt": "Any rows?", "dataset": "missing"},
+    )
+    output = tmp_path / "out"
+
+    assert main([str(questions), str(output), "--concurrency", "2"]) == 1
+    records = read_checkpoint(output / RESULTS_NAME)
+    assert records["plot/1"]["status"] == "done"
+    assert records["plot/1"]["output"] == "True\n"
+    assert (output / records["plot/1"]["figures"][0]).read_bytes()
+    assert records["plot/1"]["figures"][0].startswith("figures/plot_1-0.")
+    assert records["other"]["status"] == "failed"
+    assert "Unknown dataset" in records["other"]["error"]
+    summary = json.loads((output / "summary.json").read_text())
+    assert (summary["done"], summary["failed"], summary["skipped"]) == (2, 1, 0)
+    assert summary["failures"][0]["id"] == "other"
+
+    calls = fake_llm.request_count
+    assert main([str(questions), str(output)]) == 0
+    summary = json.loads((output / "summary.json").read_text())
+    assert (summary["answered"], summary["skipped"]) == (0, 3)
+    assert fake_llm.request_count == calls
+
+    assert main([str(questions), str(output), "--retry-failed"]) == 1
+    assert json.loads((output / "summary.json").read_text())["answered"] == 1
@@ -0,0 +1,182 @@
+"""Tests for the vectorization advisor."""
+
+from __future__ import annotations
+
+import contextlib
+import io
+import json
+import time
+
+import pytest
+
+from scientific_programming_workshop.code_advisor import advise
+from scientific_programming_workshop.data_loading import get_dataset_store
+
+# (name, code, expected rule, whether it is rewritten)
+CORPUS = [
+    (
+        "iterrows-sum",
+        "total = 0\n"
+        "for _, row in data.iterrows():\n"
+        "    total += row['price']\n"
+        "print(total)\n",
+        "iterrows",
+        True,
+    ),
+    (
+        "iterrows-count-if",
+        "count = 0\n"
+        "for idx, row in data.iterrows():\n"
+        "    if row['price'] > 20000 and row['fuel_type'] == 'Diesel':\n"
+        "        count += 1\n"
+        "print(count)\n",
+        "iterrows",
+        True,
+    ),
+    (
+        "iterrows-sum-if-attribute",
+        "total = 0.0\n"
+        "for _, row in data.iterrows():\n"
+        "    if row.make == 'BMW':\n"
+        "        total += row.price / row.hp\n"
+        "print(round(total, 6))\n",
+        "iterrows",
+        True,
+    ),
+    (
+        "apply-axis1",
+        "data['ratio'] = data.apply(lambda r: r['price'] / r['hp'], axis=1)\n"
+        "print(data['ratio'].describe())\n",
+        "apply-axis1",
+        True,
+    ),
+    (
+        "iterrows-dict",
+        "counts = {}\n"
+        "for _, row in data.iterrows():\n"
+        "    counts[row['make']] = counts.get(row['make'], 0) + 1\n",
+        "iterrows",
+        False,
+    ),
+    (
+        "row-used-after-loop",
+        "total = 0\n"
+        "for _, row in data.iterrows():\n"
+        "    total += row['price']\n"
+        "print(total, row['price'])\n",
+        "iterrows",
+        False,
+    ),
+    (
+        "filter-in-loop",
+        "for fuel in data['fuel_type'].unique():\n"
+        "    subset = data[data['fuel_type'] == fuel]\n"
+        "    print(fuel, subset['price'].mean())\n",
+        "filter-in-loop",
+        False,
+    ),
+    (
+        "string-concat-loop",
+        "out = ''\nfor make in data['make'].unique():\n    out += f'{make}, '\n",
+        "string-concat-loop",
+        False,
+    ),
+    (
+        "index-loop",
+        "for i in range(len(data)):\n    print(data.loc[i, 'price'])\n",
+        "index-loop",
+        False,
+    ),
+]
+
+
+def _run(code: str, data) -> tuple[str, float]:
+    namespace = {"data": data.copy()}
+    output = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(output):
+        exec(code, namespace)  # pylint: disable=exec-used
+    return output.getvalue(), time.perf_counter() - start
+
+
+@pytest.fixture(name="data", scope="module")
+def _data():
+    return get_dataset_store().current().frame
+
+
+@pytest.mark.parametrize(
+    "code,rule,rewritten", [case[1:] for case in CORPUS], ids=[c[0] for c in CORPUS]
+)
+def test_corpus_findings(code, rule, rewritten, data):
+    """Each corpus entry is flagged, and only the safe shapes are rewritten."""
+    advice = advise(code, columns=data.columns)
+
+    assert [finding.rule for finding in advice.findings] == [rule]
+    assert advice.rewritten is rewritten
+    assert (advice.code != code) is rewritten
+    assert bool(advice.reprompt_hint()) is not rewritten
+
+
+@pytest.mark.parametrize(
+    "code", [case[1] for case in CORPUS if case[3]], ids=[c[0] for c in CORPUS if c[3]]
+)
+def test_rewrites_print_the_same_output(code, data):
+    """Rewritten code prints exactly what the original printed."""
+    advice = advise(code, columns=data.columns)
+
+    assert "iterrows" not in advice.code and "apply" not in advice.code
+    assert _run(advice.code, data)[0] == _run(code, data)[0]
+
+
+def test_iterrows_rewrite_is_much_faster(data):
+    """On the full dataset the vectorized sum beats the row loop by >10x."""
+    code = CORPUS[0][1]
+    rewritten = advise(code, columns=data.columns).code
+
+    slow = min(_run(code, data)[1] for _ in range(3))
+    fast = min(_run(rewritten, data)[1] for _ in range(3))
+
+    assert slow > 10 * fast
+
+
+def test_rewrite_keeps_surrounding_source_and_warn_mode_keeps_code(data):
+    """Only the loop is replaced; rewrite=False reports without changing code."""
+    code = "# total price\n" + CORPUS[0][1]
+
+    rewritten = advise(code, columns=data.columns)
+    warned = advise(code, columns=data.columns, rewrite=False)
+
+    assert rewritten.code.startswith("# total price\ntotal = 0\n")
+    assert warned.code == code
+    assert warned.warnings == warned.findings and warned.findings
+
+
+def test_clean_and_unparsable_code_pass_through():
+    """Vectorized code has no findings; syntax errors are left to exec."""
+    assert advise("print(data.groupby('make')['price'].mean())").findings == ()
+    assert advise("for x in").code == "for x in"
+
+
+def test_stream_emits_rewritten_code_and_advice(client_step_04, fake_llm):
+    """/stream sends the rewritten code plus an `advice` event."""
+    fake_llm.answer = f"```python\n{CORPUS[0][1]}```"
+
+    body = client_step_04.post("/stream", data={"prompt": "sum"}).get_data(as_text=True)
+
+    events = {}
+    for message in body.strip().split("\n\n"):
+        name, payload = message.split("\n", 1)
+        events.setdefault(name.removeprefix("event: "), json.loads(payload[6:]))
+    assert "iterrows" not in events["code"]
+    assert "(rewritten)" in events["advice"][0]
+
+
+def test_index_shows_performance_notes(client_step_04, fake_llm, monkeypatch):
+    """POST / lists the advisor's findings; CODE_ADVISOR=warn keeps the code."""
+    monkeypatch.setenv("CODE_ADVISOR", "warn")
+    fake_llm.answer = f"```python\n{CORPUS[0][1]}```"
+
+    html = client_step_04.post("/", data={"prompt": "sum"}).get_data(as_text=True)
+
+    assert "Performance Notes" in html
+    assert "data.iterrows()" in html
@@ -0,0 +1,81 @@
+"""Tests for the indexed data explorer."""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from scientific_programming_workshop.data_explorer import DataIndex, ExplorerQuery
+
+
+@pytest.fixture()
+def frame():
+    """A small frame with ties and missing values."""
+    return pd.DataFrame(
+        {
+            "make": pd.Categorical(["VW", "AUDI", None, "BMW", "VW", "AUDI"]),
+            "fuel_type": ["Diesel", "Benzin", "Diesel", "Diesel", "Benzin", "Diesel"],
+            "dealer_plz": [8000, 8488, 8000, 3000, 8000, 3000],
+            "price": [12000.0, 25000.0, np.nan, 18000.0, 9000.0, 25000.0],
+            "hp": [110, 245, 90, 190, 75, 150],
+        }
+    )
+
+
+def query(index: DataIndex, **args: str) -> pd.DataFrame:
+    """Return the rows of the page `args` ask for."""
+    page = index.query(ExplorerQuery.from_args(args))
+    return page.rows
+
+
+def test_filters_sort_and_paginate_like_pandas(frame):
+    """Index answers match boolean masks and sorts on the frame."""
+    index = DataIndex(frame)
+    rows = query(index, make="AUDI,VW", price_min="10000", sort="-price")
+    assert list(rows.index) == [5, 1, 0]
+    assert list(query(index, dealer_plz="8000", fuel_type="Diesel").index) == [0, 2]
+    rows = query(index, hp_max="150", sort="hp", offset="1", limit="2")
+    assert list(rows.index) == [2, 0]
+    # Descending reverses the ascending order; missing values stay last.
+    assert list(query(index, sort="price").index) == [4, 0, 3, 1, 5, 2]
+    assert list(query(index, sort="-price").index) == [5, 1, 3, 0, 4, 2]
+    assert list(query(index, sort="-make").index) == [4, 0, 3, 5, 1, 2]
+    assert query(index, make="SEAT").empty
+
+    page = index.query(ExplorerQuery.from_args({"columns": "make,hp", "limit": "2"}))
+    assert page.total == 6 and list(page.rows.columns) == ["make", "hp"]
+    assert page.to_dict()["rows"] == [["VW", 110], ["AUDI", 245]]
+
+
+def test_query_arguments_round_trip_and_validate(frame):
+    """Arguments parse back into the same query; bad ones raise ValueError."""
+    args = {"price_min": "1000", "make": "AUDI,BMW", "sort": "-hp", "offset": "50"}
+    parsed = ExplorerQuery.from_args(args)
+    assert parsed.to_args() == args
+    assert parsed.to_args(offset=0) == {k: v for k, v in args.items() if k != "offset"}
+    assert ExplorerQuery.from_args({"limit": "100000"}).limit == 500
+    for bad in ({"price_min": "cheap"}, {"offset": "-1"}):
+        with pytest.raises(ValueError):
+            ExplorerQuery.from_args(bad)
+    for bad in ({"sort": "transmission"}, {"columns": "nope"}):
+        with pytest.raises(ValueError):
+            DataIndex(frame).query(ExplorerQuery.from_args(bad))
+
+
+def test_data_routes(client_step_04):
+    """`/data/rows` returns JSON or an HTML fragment; `/data` pages through."""
+    resp = client_step_04.get("/data/rows?make=AUDI&sort=-price&columns=make,price")
+    body = resp.get_json()
+    assert resp.status_code == 200 and body["columns"] == ["make", "price"]
+    assert body["total"] == int(resp.headers["X-Total-Count"]) > 0
+    prices = [price for _, price in body["rows"]]
+    assert prices == sorted(prices, reverse=True)
+
+    resp = client_step_04.get("/data/rows?format=html&limit=3")
+    assert resp.get_data(as_text=True).count("<tr") == 4
+
+    assert client_step_04.get("/data/rows?sort=nope").status_code == 400
+
+    page = client_step_04.get("/data?fuel_type=Diesel&offset=25").get_data(as_text=True)
+    assert "Rows 26–50 of" in page and "offset=50" in page and "previous" in page
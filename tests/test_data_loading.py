@@ -0,0 +1,114 @@
+"""Tests for the cached dataset store."""
+
+from __future__ import annotations
+
+import os
+
+import pandas as pd
+
+from scientific_programming_workshop import data_loading
+from scientific_programming_workshop.data_loading import (
+    DatasetStore,
+    dataset_fingerprint,
+    describe_dataframe,
+    load_autoscout_data,
+)
+
+CSV_TEXT = (
+    "make,fuel_type,transmission,dealer_city,init_regist_dt,price\n"
+    "AUDI,Diesel,Automat,Zürich,2014-10,22500\n"
+    "BMW,Benzin,Schaltgetriebe,Bern,2013-06,18000\n"
+)
+
+
+def test_store_parses_typed_columns(tmp_path):
+    """Categorical and date columns get explicit dtypes."""
+    path = tmp_path / "cars.csv"
+    path.write_text(CSV_TEXT, encoding="utf-8")
+
+    data = DatasetStore(path).get()
+
+    assert isinstance(data["make"].dtype, pd.CategoricalDtype)
+    assert isinstance(data["dealer_city"].dtype, pd.CategoricalDtype)
+    assert pd.api.types.is_datetime64_any_dtype(data["init_regist_dt"])
+
+
+def test_store_loads_once_and_reloads_on_change(tmp_path):
+    """The file is parsed once and re-read only when it changes."""
+    path = tmp_path / "cars.csv"
+    path.write_text(CSV_TEXT, encoding="utf-8")
+    store = DatasetStore(path)
+
+    store.get()
+    store.get()
+    assert store.load_count == 1
+
+    path.write_text(CSV_TEXT + "VW,Benzin,Automat,Basel,2020-01,9000\n")
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    assert len(store.get()) == 3
+    assert store.load_count == 2
+
+
+def test_views_do_not_mutate_cached_frame(tmp_path):
+    """Mutating a returned view leaves the cached frame untouched."""
+    path = tmp_path / "cars.csv"
+    path.write_text(CSV_TEXT, encoding="utf-8")
+    store = DatasetStore(path)
+
+    view = store.get()
+    view.loc[0, "price"] = -1
+    view["extra"] = 1
+    view.drop(columns=["make"], inplace=True)
+
+    fresh = store.get()
+    assert fresh.loc[0, "price"] == 22500
+    assert "extra" not in fresh.columns
+    assert "make" in fresh.columns
+
+
+def test_load_autoscout_data_reads_workshop_csv():
+    """The default store serves the bundled workshop dataset."""
+    data = load_autoscout_data()
+    assert {"price", "make", "fuel_type"} <= set(data.columns)
+
+
+def test_describe_dataframe_is_memoized_by_fingerprint(tmp_path, monkeypatch):
+    """Repeated descriptions of the same dataset are served from the cache."""
+    path = tmp_path / "cars.csv"
+    path.write_text(CSV_TEXT, encoding="utf-8")
+    dataset = DatasetStore(path).current()
+
+    first = describe_dataframe(dataset.view(), fingerprint=dataset.fingerprint)
+
+    def fail(*_args, **_kwargs):
+        raise AssertionError("description was rebuilt")
+
+    monkeypatch.setattr(data_loading, "_build_description", fail)
+    again = describe_dataframe(dataset.view(), fingerprint=dataset.fingerprint)
+    assert again == first
+
+
+def test_fingerprint_tracks_content_and_schema():
+    """Changing a value or a dtype changes the fingerprint."""
+    data = pd.DataFrame({"price": [1, 2], "make": ["a", "b"]})
+
+    assert dataset_fingerprint(data) == dataset_fingerprint(data.copy())
+    assert dataset_fingerprint(data) != dataset_fingerprint(data.assign(price=[1, 3]))
+    assert dataset_fingerprint(data) != dataset_fingerprint(
+        data.astype({"make": "category"})
+    )
+
+
+def test_extended_description_includes_column_statistics(tmp_path):
+    """Extended mode adds per-column ranges, nulls and top categories."""
+    path = tmp_path / "cars.csv"
+    path.write_text(CSV_TEXT, encoding="utf-8")
+    data = DatasetStore(path).get()
+
+    description = describe_dataframe(data, extended=True)
+
+    assert "Column statistics:" in description
+    assert "- price: nulls=0, min=18000, max=22500" in description
+    assert "- make: nulls=0, distinct=2" in description
@@ -0,0 +1,97 @@
+"""Tests for the multi-dataset registry."""
+
+from __future__ import annotations
+
+import time
+
+import pytest
+
+from scientific_programming_workshop import dataset_registry
+from scientific_programming_workshop.dataset_registry import DatasetRegistry
+
+HEADER = "make,fuel_type,transmission,dealer_city,init_regist_year,price\n"
+
+
+def _write(path, make, rows=2):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    lines = [f"{make},Diesel,Automat,Bern,2015,{20000 + n}\n" for n in range(rows)]
+    path.write_text(HEADER + "".join(lines), encoding="utf-8")
+
+
+@pytest.fixture(name="data_dir")
+def _data_dir(tmp_path):
+    _write(tmp_path / "ch" / "2024-05.csv", "AUDI")
+    _write(tmp_path / "de" / "2024-05.csv", "BMW")
+    _write(tmp_path / "de" / "2024-06.csv", "SKODA")
+    (tmp_path / "de" / "2024-05.snapshot").mkdir()
+    (tmp_path / "de" / "2024-05.snapshot" / "ignored.csv").write_text(HEADER)
+    return tmp_path
+
+
+def test_discovers_datasets_without_loading_them(data_dir):
+    """Every CSV is a dataset named by its relative path; nothing is read."""
+    registry = DatasetRegistry(data_dir)
+    assert registry.names() == ["ch/2024-05", "de/2024-05", "de/2024-06"]
+    assert registry.default == "ch/2024-05"
+    assert registry.store("de/2024-05").load_count == 0
+    assert registry.memory_usage() == {}
+
+    assert registry.current("de/2024-05").frame["make"].tolist() == ["BMW", "BMW"]
+    assert list(registry.memory_usage()) == ["de/2024-05"]
+
+
+def test_unknown_and_added_datasets(data_dir, monkeypatch):
+    """Unknown names raise KeyError; added files are found by a later rescan."""
+    registry = DatasetRegistry(data_dir, rescan_interval=0.2)
+    with pytest.raises(KeyError):
+        registry.current("fr/2024-05")
+    _write(data_dir / "fr" / "2024-05.csv", "PEUGEOT")
+
+    scans = []
+    scan = registry._scan
+    monkeypatch.setattr(registry, "_scan", lambda: scans.append(1) or scan())
+    for _ in range(20):
+        with pytest.raises(KeyError):
+            registry.current("fr/2024-05")
+    assert scans == []  # unknown names do not rescan within the interval
+
+    time.sleep(0.25)
+    assert registry.current("fr/2024-05").frame["make"].iloc[0] == "PEUGEOT"
+    assert scans == [1]
+
+
+def test_memory_budget_evicts_least_recently_used(data_dir):
+    """Loading past the budget drops the least recently used other dataset."""
+    probe = DatasetRegistry(data_dir)
+    probe.current("ch/2024-05")
+    size = probe.size_bytes
+
+    registry = DatasetRegistry(data_dir, max_bytes=int(size * 2.5))
+    registry.current("ch/2024-05")
+    registry.current("de/2024-05")
+    registry.current("ch/2024-05")
+    registry.current("de/2024-06")
+
+    assert set(registry.memory_usage()) == {"ch/2024-05", "de/2024-06"}
+    assert registry.evictions == 1
+    assert registry.size_bytes <= registry.max_bytes
+    registry.current("de/2024-05")
+    assert registry.store("de/2024-05").load_count == 2
+
+
+def test_app_answers_about_the_selected_dataset(
+    client_step_04, fake_llm, data_dir, monkeypatch
+):
+    """The `dataset` form field selects what the question is about."""
+    monkeypatch.setattr(dataset_registry, "_REGISTRY", DatasetRegistry(data_dir))
+    resp = client_step_04.post(
+        "/", data={"prompt": "number of cars per make", "dataset": "de/2024-06"}
+    )
+    page = resp.get_data(as_text=True)
+    assert resp.status_code == 200
+    assert "SKODA" in page and "AUDI" not in page
+    assert 'value="de/2024-06" selected' in page
+    assert fake_llm.request_count == 0
+
+    resp = client_step_04.post("/", data={"prompt": "hi", "dataset": "nope"})
+    assert resp.status_code == 404
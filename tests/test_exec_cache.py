@@ -0,0 +1,113 @@
+"""Tests for the compiled-code and result cache."""
+
+from __future__ import annotations
+
+import ast
+
+import matplotlib.pyplot as plt
+import pandas as pd
+import pytest
+
+from scientific_programming_workshop import executor
+from scientific_programming_workshop.code_exec import ExecResult
+from scientific_programming_workshop.exec_cache import ExecCache, is_pure
+
+
+@pytest.mark.parametrize(
+    ("code", "pure"),
+    [
+        ("print(data.groupby('make')['price'].mean())", True),
+        ("import numpy as np\nprint(np.log(data['price']).max())", True),
+        ("result = data.copy()\nresult['x'] = 1\nprint(result)", True),
+        ("print(data.to_string())", True),
+        ("print(data.sample(5))", False),
+        ("import numpy as np\nprint(np.random.rand())", False),
+        ("from numpy.random import rand\nprint(rand())", False),
+        ("import time\nprint(time.time())", False),
+        ("print(pd.Timestamp.now())", False),
+        ("data['x'] = 1", False),
+        ("data.loc[0, 'price'] += 1", False),
+        ("data.dropna(inplace=True)", False),
+        ("data.to_csv('out.csv')", False),
+        ("data.to_csv(path_or_buf='out.csv')", False),
+        ("plt.savefig('plot.png')", False),
+        ("open('x').read()", False),
+        ("import requests", False),
+        ("print(data.__class__)", False),
+    ],
+)
+def test_purity(code, pure):
+    """Randomness, clocks, I/O and writes into `data` make a snippet impure."""
+    assert is_pure(ast.parse(code)) is pure
+
+
+def test_compile_is_cached():
+    """A repeated snippet reuses its code object."""
+    cache = ExecCache()
+    first = cache.compile("print(1)")
+    assert cache.compile("print(1)") is first
+    assert (cache.stats.compile_hits, cache.stats.compile_misses) == (1, 1)
+    with pytest.raises(SyntaxError):
+        cache.compile("print(")
+
+
+def test_byte_budget_evicts_least_recently_used():
+    """Entries beyond the budget are evicted oldest first."""
+    cache = ExecCache(max_bytes=4000)
+    snippet = cache.compile("print(1)")
+    for number in range(10):
+        result = ExecResult(stdout="x" * 1000, error="", show_graphic=False)
+        cache.put_result(snippet, f"data-{number}", "png", result)
+    assert cache.size_bytes <= 4000
+    assert cache.get_result(snippet, "data-9", "png") is not None
+    assert cache.get_result(snippet, "data-0", "png") is None
+
+
+@pytest.fixture(name="runs")
+def _runs(monkeypatch):
+    """Use a fresh in-process cache and count real executions."""
+    cache = ExecCache()
+    monkeypatch.setattr(executor, "get_exec_cache", lambda: cache)
+    monkeypatch.setattr(executor, "get_executor_pool", lambda: None)
+    calls = []
+    execute = executor.execute_user_code
+
+    def counting(**kwargs):
+        calls.append(kwargs["code"])
+        return execute(**kwargs)
+
+    monkeypatch.setattr(executor, "execute_user_code", counting)
+    return calls
+
+
+def _run(code, fingerprint="fp", on_output=None):
+    return executor.run_code(
+        code=code,
+        data=pd.DataFrame({"price": [1, 2, 3]}),
+        plt=plt,
+        fingerprint=fingerprint,
+        figure_format="png",
+        on_output=on_output,
+    )
+
+
+def test_pure_result_is_replayed_without_running(runs):
+    """A repeat of a pure snippet on the same data skips execution."""
+    code = "print(data['price'].sum())\nprint('done', end='')"
+    first = _run(code)
+    lines: list[str] = []
+    second = _run(code, on_output=lines.append)
+    assert len(runs) == 1
+    assert second.stdout == first.stdout == "6\ndone"
+    assert lines == ["6\n", "done"]
+
+    _run(code, fingerprint="other")
+    assert len(runs) == 2
+
+
+def test_impure_and_failing_snippets_always_run(runs):
+    """Impure snippets and errors are never served from the cache."""
+    for code in ("import random\nprint(random.random())", "print(data['nope'])"):
+        _run(code)
+        _run(code)
+    assert len(runs) == 4
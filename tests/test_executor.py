@@ -0,0 +1,70 @@
+"""Tests for the process-pool execution engine."""
+
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from scientific_programming_workshop.code_exec import execute_user_code
+from scientific_programming_workshop.executor import ExecLimits, ExecutorPool
+
+
+@pytest.fixture(scope="module", name="pool")
+def _pool():
+    """A small pool with short limits, shared by the tests in this module."""
+    with ExecutorPool(2, limits=ExecLimits(wall_time=5, cpu_time=2)) as pool:
+        yield pool
+
+
+def test_runs_code_against_the_dataset(pool):
+    """Workers have the dataset loaded and capture stdout, stderr and timing."""
+    result = pool.run(
+        "import sys\nprint(len(data) > 0)\nprint('warn', file=sys.stderr)"
+    )
+    assert result.error == ""
+    assert result.stdout == "True\n"
+    assert result.stderr == "warn\n"
+    assert result.wall_time > 0
+
+
+def test_concurrent_jobs_do_not_mix_output(pool):
+    """Jobs running at the same time each see only their own output."""
+    code = "import time\nfor _ in range(3):\n    print({n})\n    time.sleep(0.05)"
+    with ThreadPoolExecutor(2) as threads:
+        results = list(threads.map(lambda n: pool.run(code.format(n=n)), [1, 2]))
+    assert [r.stdout for r in results] == ["1\n1\n1\n", "2\n2\n2\n"]
+
+
+def test_in_process_threads_do_not_mix_output():
+    """In-process executions on different threads keep their stdout apart."""
+    code = "import time\nfor _ in range(3):\n    print({n})\n    time.sleep(0.05)"
+
+    def run(n: int) -> str:
+        return execute_user_code(code=code.format(n=n), data=None, plt=None).stdout
+
+    with ThreadPoolExecutor(3) as threads:
+        outputs = list(threads.map(run, [1, 2, 3]))
+    assert outputs == ["1\n1\n1\n", "2\n2\n2\n", "3\n3\n3\n"]
+
+
+def test_streams_output_lines(pool):
+    """`on_output` receives lines from the worker as they are printed."""
+    lines: list[str] = []
+    pool.run("print('a')\nprint('b')", on_output=lines.append)
+    assert lines == ["a\n", "b\n"]
+
+
+def test_wall_clock_limit_kills_and_replaces_worker(pool):
+    """A hung snippet times out and the pool keeps serving."""
+    result = pool.run("import time\ntime.sleep(10)", timeout=0.5)
+    assert "timed out" in result.error
+
+    assert pool.run("print('still alive')").stdout == "still alive\n"
+
+
+def test_cpu_limit_interrupts_busy_loop(pool):
+    """A CPU-bound loop is stopped by the CPU time limit."""
+    result = pool.run("while True:\n    pass")
+    assert "CPU time limit exceeded" in result.error
+    assert result.cpu_time < 5
@@ -0,0 +1,91 @@
+"""Tests for in-memory figure rendering and the figure store."""
+
+from __future__ import annotations
+
+import re
+
+from scientific_programming_workshop.code_exec import RenderedFigure, execute_user_code
+from scientific_programming_workshop.image_store import ImageStore
+from scientific_programming_workshop.plotting import plt
+
+TWO_PLOTS = (
+    "plt.figure()\nplt.plot([1, 2, 3])\n"
+    "fig, ax = plt.subplots()\nax.bar(['a', 'b'], [1, 2])"
+)
+
+
+def test_all_figures_are_rendered_in_memory():
+    """Every figure becomes one image and no figure is left open."""
+    result = execute_user_code(code=TWO_PLOTS, data=None, plt=plt, figure_format="svg")
+
+    assert result.show_graphic
+    assert [figure.format for figure in result.figures] == ["svg", "svg"]
+    assert result.figures[0].data.lstrip().startswith(b"<?xml")
+    assert plt.get_fignums() == []
+
+
+def test_figures_are_closed_when_code_fails():
+    """A failing snippet doesn't leak its figures into the next request."""
+    result = execute_user_code(
+        code="plt.figure()\nraise ValueError('boom')",
+        data=None,
+        plt=plt,
+        figure_format="png",
+    )
+    assert "boom" in result.error
+    assert result.figures == ()
+    assert plt.get_fignums() == []
+
+
+def test_image_store_is_content_addressed_and_bounded():
+    """Identical images share a key and the byte budget evicts old ones."""
+    render = execute_user_code(code=TWO_PLOTS, data=None, plt=plt, figure_format="png")
+    first, second = render.figures
+    store = ImageStore(max_bytes=len(first.data) + len(second.data) - 1)
+
+    key = store.put(first)
+    assert store.put(first) == key
+    assert key.endswith(".png")
+    store.put(second)
+
+    assert store.get(key) is None
+    assert len(store) == 1
+
+
+def test_index_serves_each_figure_with_cache_headers(client_step_04, fake_llm):
+    """POST / links every figure to a cacheable, content-addressed URL."""
+    fake_llm.answer = f"```python\n{TWO_PLOTS}\n```"
+
+    page = client_step_04.post("/", data={"prompt": "plot"}).get_data(as_text=True)
+    urls = re.findall(r'<img src="(/figures/[0-9a-f]+\.png)"', page)
+
+    assert len(urls) == 2
+    resp = client_step_04.get(urls[0])
+    assert resp.status_code == 200
+    assert resp.mimetype == "image/png"
+    assert "immutable" in resp.headers["Cache-Control"]
+    etag = resp.headers["ETag"]
+    assert client_step_04.get(urls[0], headers={"If-None-Match": etag}).status_code == (
+        304
+    )
+    assert client_step_04.get("/figures/unknown.png").status_code == 404
+
+
+def test_workers_share_figures_through_the_directory(tmp_path):
+    """A figure put by one worker is served by another; tampered files are not."""
+    render = execute_user_code(code=TWO_PLOTS, data=None, plt=plt, figure_format="png")
+    first, second = render.figures
+    key = ImageStore(directory=tmp_path).put(first)
+
+    other = ImageStore(directory=tmp_path)
+    assert other.get(key) == first
+    assert other.get("../" + key) is None
+
+    forged = other.put(second)
+    (tmp_path / forged).write_bytes(first.data)
+    assert ImageStore(directory=tmp_path).get(forged) is None
+
+    small = ImageStore(max_bytes=len(second.data), directory=tmp_path, trim_every=1)
+    small.put(RenderedFigure(b"x", "png"))
+    sizes = [path.stat().st_size for path in tmp_path.iterdir()]
+    assert 0 < sum(sizes) <= len(second.data)
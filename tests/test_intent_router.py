@@ -0,0 +1,121 @@
+"""Tests for answering simple aggregate questions without the model."""
+
+from __future__ import annotations
+
+import contextlib
+import io
+from types import SimpleNamespace
+
+import pytest
+
+from scientific_programming_workshop.data_loading import get_dataset_store
+from scientific_programming_workshop.intent_router import route_prompt
+from scientific_programming_workshop.out_of_core import ChunkedFrame, write_partitions
+from scientific_programming_workshop.paths import CSV_PATH
+from scientific_programming_workshop.timing import parse_server_timing
+
+ROUTED = [
+    ("What is the average price of cars by fuel type?", "mean of price by fuel_type"),
+    (
+        "Provide a pivot table with the average price by transmission type!",
+        "mean of price by transmission",
+    ),
+    ("median mileage by year", "median of mileage by init_regist_year"),
+    ("How many cars are there per brand?", "number of rows by make"),
+    ("top 5 makes by price", "top 5 make by mean price"),
+    ("the ten cheapest makes", "bottom 10 make by mean price"),
+    ("What is the maximum mileage of all cars?", "max of mileage"),
+]
+NOT_ROUTED = [
+    "Show the number of cars per 'fuel type' in a bar chart!",
+    "Which are the 5 most expensive cars? Show type, price, hp and mileage!",
+    "average price by colour",
+    "Use k-means clustering based on price, mileage and hp.",
+]
+
+
+@pytest.fixture(name="dataset", scope="module")
+def _dataset():
+    return get_dataset_store().current()
+
+
+def _run(code: str, dataset) -> str:
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        exec(code, {"data": dataset.frame, "cube": dataset.cube})  # pylint: disable=exec-used
+    return output.getvalue()
+
+
+@pytest.mark.parametrize("prompt,description", ROUTED)
+def test_known_shapes_are_routed(dataset, prompt, description):
+    """Template questions produce a local answer that runs."""
+    routed = route_prompt(prompt, dataset.frame, cube=dataset.cube)
+
+    assert routed is not None
+    assert routed.description == description
+    assert _run(routed.code, dataset)
+
+
+@pytest.mark.parametrize("prompt", NOT_ROUTED)
+def test_other_questions_go_to_the_model(dataset, prompt):
+    """Charts, row listings, unknown columns and free-form asks aren't routed."""
+    assert route_prompt(prompt, dataset.frame, cube=dataset.cube) is None
+
+
+def test_routed_answer_matches_pandas(dataset):
+    """The cube-backed answer prints the same numbers as a plain group-by."""
+    data = dataset.frame
+    routed = route_prompt("average price by fuel type", data, cube=dataset.cube)
+    without_cube = route_prompt("average price by fuel type", data)
+
+    assert "cube.query" in routed.code and "groupby" in without_cube.code
+    assert _run(routed.code, dataset) == _run(without_cube.code, dataset)
+    expected = data.groupby("fuel_type", observed=True)["price"].mean().round(2)
+    assert _run(routed.code, dataset) == expected.to_string() + "\n"
+
+
+def test_out_of_core_group_bys_route_only_supported_stats(tmp_path):
+    """Medians by group aren't streamed out of core, so the model gets them."""
+    data = ChunkedFrame.open(
+        write_partitions(CSV_PATH, tmp_path / "cars.parts", file_format="csv")
+    )
+
+    assert route_prompt("median price by make", data) is None
+    routed = route_prompt("average price by make", data)
+    assert routed is not None
+    assert _run(routed.code, SimpleNamespace(frame=data, cube=None))
+
+
+def test_index_answers_without_calling_the_model(client_step_04, fake_llm):
+    """A routed POST / never reaches the LLM and skips its stages."""
+    resp = client_step_04.post("/", data={"prompt": "average price by fuel type"})
+
+    html = resp.get_data(as_text=True)
+    assert fake_llm.request_count == 0
+    assert "Answered without the model" in html and "Diesel" in html
+    timings = parse_server_timing(resp.headers["Server-Timing"])
+    assert "route" in timings and "exec" in timings and "llm" not in timings
+
+
+def test_stream_answers_without_calling_the_model(
+    client_step_04, fake_llm, monkeypatch
+):
+    """/stream sends the routed answer through the usual SSE events."""
+    monkeypatch.delenv("OPENAI_API_KEY")  # routed answers need no API key
+    body = client_step_04.post(
+        "/stream", data={"prompt": "number of cars per make"}
+    ).get_data(as_text=True)
+
+    assert fake_llm.request_count == 0 and "event: error" not in body
+    assert "event: code" in body and "cube.size" in body
+    assert "event: stdout" in body and "BMW" in body
+
+
+def test_router_can_be_disabled(client_step_04, fake_llm, monkeypatch):
+    """With INTENT_ROUTER=off every question goes to the model."""
+    monkeypatch.setenv("INTENT_ROUTER", "off")
+    fake_llm.answer = "```python\nprint(1)\n```"
+
+    client_step_04.post("/", data={"prompt": "average price by fuel type"})
+
+    assert fake_llm.request_count == 1
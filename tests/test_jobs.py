@@ -0,0 +1,107 @@
+"""Tests for the background job queue and its routes."""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+
+import pytest
+
+from scientific_programming_workshop.code_exec import RenderedFigure
+from scientific_programming_workshop.jobs import (
+    DONE,
+    FAILED,
+    JobQueue,
+    JobResult,
+    JobSettings,
+    JobStore,
+    QueueFull,
+)
+
+
+def wait_for(store: JobStore, job_id: str, timeout: float = 10.0):
+    """Poll `store` until the job finished; return it."""
+    deadline = time.monotonic() + timeout
+    while True:
+        job = store.get(job_id)
+        if job.status in (DONE, FAILED) or time.monotonic() > deadline:
+            return job
+        time.sleep(0.02)
+
+
+def test_store_keeps_results_until_they_expire(tmp_path):
+    """Results and figures are readable by any connection until the TTL."""
+    store = JobStore(tmp_path / "jobs.sqlite3", ttl=0.3)
+    job = store.create("plot it", "cars")
+    store.start(job.id)
+    figure = RenderedFigure(b"\x89PNG...", "png")
+    store.finish(job.id, JobResult("ok", "plt.plot()", output="1\n", figures=(figure,)))
+
+    other = JobStore(tmp_path / "jobs.sqlite3", ttl=0.3)
+    stored = other.get(job.id)
+    assert stored.status == DONE and stored.figures == 1
+    assert stored.result["output"] == "1\n" and stored.result["code"] == "plt.plot()"
+    assert other.figure(job.id, 0) == figure and other.figure(job.id, 1) is None
+    assert other.counts()[DONE] == 1
+
+    time.sleep(0.4)
+    assert other.get(job.id) is None and other.figure(job.id, 0) is None
+    assert other.sweep() == 1
+
+
+def test_queue_reports_depth_and_records_failures(tmp_path):
+    """One worker: the second job waits; a raising job is marked failed."""
+    settings = JobSettings(workers=1, database=tmp_path / "jobs.sqlite3", max_queued=1)
+    queue = JobQueue(settings)
+    release = threading.Event()
+
+    def slow():
+        release.wait(10)
+        return JobResult("slow", "")
+
+    def broken():
+        raise ValueError("No code found in the answer.")
+
+    first = queue.submit("a", "cars", slow)
+    second = queue.submit("b", "cars", broken)
+    time.sleep(0.1)
+    stats = queue.stats()
+    assert (stats["busy"], stats["queued"], stats["utilization"]) == (1, 1, 1.0)
+    with pytest.raises(QueueFull):
+        queue.submit("c", "cars", slow)
+
+    release.set()
+    assert wait_for(queue.store, first.id).result["response"] == "slow"
+    failed = wait_for(queue.store, second.id)
+    assert failed.status == FAILED and failed.error == "No code found in the answer."
+    queue.close()
+    assert queue.finished == {DONE: 1, FAILED: 1}
+
+
+def test_job_routes_run_the_pipeline(client_step_04, fake_llm, monkeypatch, tmp_path):
+    """POST /jobs answers at once; the result and figure can be fetched later."""
+    monkeypatch.setenv("JOB_DB", str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setenv("INTENT_ROUTER", "off")
+    fake_llm.answer = "```python\nprint(len(data) > 0)\nplt.plot([1, 2])\n```"
+    fake_llm.latency = 0.2
+
+    resp = client_step_04.post("/jobs", json={"prompt": "rows and a plot?"})
+    assert resp.status_code == 202
+    assert resp.get_json()["status"] in ("queued", "running")
+
+    events = client_step_04.get(resp.headers["Location"] + "/events")
+    statuses = [
+        json.loads(block.split("\ndata: ", 1)[1])
+        for block in events.get_data(as_text=True).strip().split("\n\n")
+        if block.startswith("event: status")
+    ]
+    assert statuses[-1]["status"] == DONE
+
+    job = client_step_04.get(resp.headers["Location"]).get_json()
+    assert job["result"]["output"] == "True\n"
+    figure = client_step_04.get(job["result"]["figure_urls"][0])
+    assert figure.status_code == 200 and figure.mimetype.startswith("image/")
+    assert client_step_04.get("/jobs").get_json()["jobs"][DONE] == 1
+    assert client_step_04.post("/jobs", data={"prompt": " "}).status_code == 400
+    assert client_step_04.get("/jobs/unknown").status_code == 404
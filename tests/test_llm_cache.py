@@ -0,0 +1,103 @@
+"""Tests for the LLM response cache."""
+
+from __future__ import annotations
+
+import pytest
+from openai import OpenAI
+
+from scientific_programming_workshop.fake_llm import FakeLLMServer
+from scientific_programming_workshop.llm_cache import (
+    ResponseCache,
+    _SQLiteTier,
+    cache_key,
+    cached_chat_completion,
+    normalize_prompt,
+)
+
+
+def test_normalize_prompt_ignores_case_spacing_and_punctuation():
+    """Trivially different spellings of a question share a key."""
+    assert normalize_prompt("  Average price\nby Fuel type? ") == (
+        "average price by fuel type"
+    )
+    key = cache_key(model="m", prompt="Count by make", max_tokens=300, fingerprint="f")
+    assert key == cache_key(
+        model="m", prompt="count  by make.", max_tokens=300, fingerprint="f"
+    )
+    assert key != cache_key(
+        model="m", prompt="count by make", max_tokens=300, fingerprint="other"
+    )
+
+
+def test_memory_tier_expires_and_evicts():
+    """Entries expire after the TTL and the LRU keeps `max_entries`."""
+    now = [0.0]
+    cache = ResponseCache(max_entries=2, ttl=10, clock=lambda: now[0])
+
+    cache.put("a", "1")
+    cache.put("b", "2")
+    assert cache.get("a") == "1"
+    cache.put("c", "3")  # evicts "b", the least recently used
+    assert cache.get("b") is None
+
+    now[0] = 11
+    assert cache.get("a") is None
+    assert cache.stats.memory_hits == 1
+    assert cache.stats.misses == 2
+
+
+def test_sqlite_tier_is_shared_between_caches(tmp_path):
+    """A second cache instance (another worker) sees entries on disk."""
+    path = tmp_path / "llm_cache.sqlite"
+    ResponseCache(path=path).put("key", "answer")
+
+    other = ResponseCache(path=path)
+    assert other.get("key") == "answer"
+    assert other.stats.disk_hits == 1
+    assert other.get("key") == "answer"
+    assert other.stats.memory_hits == 1
+
+
+def test_unusable_sqlite_path_falls_back_to_memory(tmp_path):
+    """A path that can't be opened warns once and leaves the memory tier."""
+    blocker = tmp_path / "not-a-directory"
+    blocker.write_text("")
+    with pytest.warns(RuntimeWarning, match="shared LLM cache"):
+        cache = ResponseCache(path=blocker / "llm_cache.sqlite")
+
+    cache.put("key", "answer")
+    assert cache.get("key") == "answer" and cache.enabled
+
+
+def test_sqlite_tier_trims_to_the_newest_rows_periodically(tmp_path):
+    """Surplus rows are removed every `trim_every` writes, oldest first."""
+    tier = _SQLiteTier(tmp_path / "llm_cache.sqlite", max_rows=5, trim_every=10)
+    count = "SELECT COUNT(*) FROM responses"
+    for number in range(9):
+        tier.put(f"k{number}", "v", min_created=0)
+    assert tier._connect().execute(count).fetchone()[0] == 9
+    tier.put("k9", "v", min_created=0)
+    assert tier._connect().execute(count).fetchone()[0] <= 5
+    assert tier.get("k9", 0) == "v" and tier.get("k0", 0) is None
+
+
+def test_cached_chat_completion_skips_repeat_api_calls():
+    """Repeated questions are answered without calling the API again."""
+    cache = ResponseCache()
+    with FakeLLMServer(answer="print(1)") as server:
+        client = OpenAI(api_key="test", base_url=server.base_url)
+        for prompt in ("Average price by fuel type?", "average price by fuel type"):
+            content = cached_chat_completion(
+                client,
+                model="gpt-4.1-mini",
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=300,
+                user_prompt=prompt,
+                fingerprint="abc",
+                cache=cache,
+            )
+            assert content == "print(1)"
+        client.close()
+
+    assert server.request_count == 1
+    assert cache.stats.hit_rate == 0.5
@@ -0,0 +1,86 @@
+"""Tests for the shared, pooled OpenAI client."""
+
+from __future__ import annotations
+
+import os
+
+import pytest
+
+from scientific_programming_workshop import llm_client
+from scientific_programming_workshop.fake_llm import FakeLLMServer
+
+
+@pytest.fixture(name="fake_llm")
+def _fake_llm(monkeypatch):
+    """Run a stub OpenAI server and point the shared client at it."""
+    with FakeLLMServer(answer="hello") as server:
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+        monkeypatch.setenv("OPENAI_BASE_URL", server.base_url)
+        llm_client.reset_openai_client()
+        yield server
+        llm_client.close_openai_client()
+
+
+def _ask(client) -> str:
+    response = client.chat.completions.create(
+        model="gpt-4.1-mini", messages=[{"role": "user", "content": "hi"}]
+    )
+    return response.choices[0].message.content or ""
+
+
+def test_client_is_shared_and_reuses_connection(fake_llm):
+    """Consecutive calls share one client and one keep-alive connection."""
+    client = llm_client.get_openai_client()
+    assert llm_client.get_openai_client() is client
+
+    assert [_ask(client) for _ in range(3)] == ["hello"] * 3
+    assert fake_llm.request_count == 3
+    assert fake_llm.connection_count == 1
+
+
+def test_client_is_rebuilt_in_a_new_process(fake_llm, monkeypatch):
+    """A changed pid (as after fork) yields a fresh client."""
+    client = llm_client.get_openai_client()
+    monkeypatch.setattr(os, "getpid", lambda: -1)
+    assert llm_client.get_openai_client() is not client
+
+
+def test_settings_read_from_environment(monkeypatch):
+    """Pool limits and timeouts come from OPENAI_* variables."""
+    monkeypatch.setenv("OPENAI_MAX_IN_FLIGHT", "3")
+    monkeypatch.setenv("OPENAI_POOL_TIMEOUT", "1.5")
+
+    settings = llm_client.ClientSettings.from_env()
+
+    assert settings.limits().max_connections == 3
+    assert settings.limits().max_keepalive_connections == 3
+    assert settings.timeouts().pool == 1.5
+
+
+def test_missing_api_key_raises(monkeypatch):
+    """Without an API key the client cannot be created."""
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    llm_client.reset_openai_client()
+    with pytest.raises(ValueError):
+        llm_client.get_openai_client()
+
+
+def test_close_also_closes_the_async_client(fake_llm):
+    """Both shared clients are closed, the async one on its own loop."""
+    import asyncio
+
+    async def ask():
+        client = llm_client.get_async_openai_client()
+        await client.chat.completions.create(
+            model="gpt-4.1-mini", messages=[{"role": "user", "content": "hi"}]
+        )
+        return client
+
+    loop = asyncio.new_event_loop()
+    try:
+        async_client = loop.run_until_complete(ask())
+        client = llm_client.get_openai_client()
+        llm_client.close_openai_client()
+        assert async_client.is_closed() and client.is_closed()
+    finally:
+        loop.close()
@@ -0,0 +1,85 @@
+"""Tests for the metrics registry and the /metrics route."""
+
+from __future__ import annotations
+
+import pytest
+
+from scientific_programming_workshop.metrics import MetricsRegistry, get_metrics
+
+
+@pytest.fixture(name="metrics_on")
+def _metrics_on(monkeypatch):
+    """Enable the process-wide registry for one test."""
+    registry = get_metrics()
+    monkeypatch.setattr(registry, "enabled", True)
+    return registry
+
+
+def test_histogram_renders_cumulative_buckets():
+    """Buckets are cumulative and end with +Inf, _sum and _count."""
+    registry = MetricsRegistry(enabled=True)
+    registry.observe_stages({"llm": 0.2, "exec": 0.004})
+    registry.observe_stages({"llm": 40.0})
+
+    text = registry.render()
+
+    assert 'workshop_stage_seconds_bucket{stage="llm",le="0.25"} 1' in text
+    assert 'workshop_stage_seconds_bucket{stage="llm",le="+Inf"} 2' in text
+    assert 'workshop_stage_seconds_count{stage="exec"} 1' in text
+    assert "# TYPE workshop_stage_seconds histogram" in text
+
+
+def test_disabled_registry_records_nothing():
+    """While disabled, recording calls and `timed` are no-ops."""
+    registry = MetricsRegistry(enabled=False)
+
+    @registry.timed("work")
+    def work() -> int:
+        return 1
+
+    assert work() == 1
+    registry.observe_stages({"llm": 1.0})
+    registry.count_request("index", 200)
+
+    assert registry.stage_seconds.count("work") == 0
+    assert registry.stage_seconds.count("llm") == 0
+    assert registry.requests.value("index", "200") == 0
+
+
+def test_metrics_route_is_hidden_when_disabled(client_step_04, monkeypatch):
+    """GET /metrics is a 404 unless METRICS_ENABLED is set."""
+    monkeypatch.setattr(get_metrics(), "enabled", False)
+    assert client_step_04.get("/metrics").status_code == 404
+
+
+def test_metrics_route_reports_request_stages_and_tokens(
+    client_step_04, fake_llm, metrics_on
+):
+    """A POST / shows up as stage timings, tokens, cache lookups and a count."""
+    fake_llm.answer = "```python\nprint(2)\n```"
+    before_llm = metrics_on.stage_seconds.count("llm")
+    before_tokens = metrics_on.llm_tokens.value("completion")
+
+    assert client_step_04.post("/", data={"prompt": "two"}).status_code == 200
+    resp = client_step_04.get("/metrics")
+
+    assert resp.status_code == 200
+    assert resp.mimetype == "text/plain"
+    text = resp.get_data(as_text=True)
+    assert metrics_on.stage_seconds.count("llm") == before_llm + 1
+    assert metrics_on.llm_tokens.value("completion") > before_tokens
+    assert 'workshop_requests_total{endpoint="index",status="200"}' in text
+    assert 'workshop_llm_cache_lookups_total{result="miss"}' in text
+
+
+def test_streamed_answers_record_token_usage(client_step_04, fake_llm, metrics_on):
+    """/stream asks for usage and counts the tokens of the last chunk."""
+    fake_llm.answer = "```python\nprint(3)\n```"
+    before = metrics_on.llm_tokens.value("prompt")
+
+    body = client_step_04.post("/stream", data={"prompt": "three"}).get_data(
+        as_text=True
+    )
+
+    assert "event: done" in body
+    assert metrics_on.llm_tokens.value("prompt") > before
@@ -0,0 +1,130 @@
+"""Tests for partitioned, out-of-core datasets."""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from scientific_programming_workshop import dataset_registry, out_of_core
+from scientific_programming_workshop.data_loading import read_autoscout_csv
+from scientific_programming_workshop.dataset_registry import DatasetRegistry
+from scientific_programming_workshop.out_of_core import ChunkedFrame, write_partitions
+from scientific_programming_workshop.paths import CSV_PATH
+
+
+@pytest.fixture(scope="module", name="full")
+def _full():
+    return read_autoscout_csv(CSV_PATH)
+
+
+@pytest.fixture(scope="module", name="parts", params=["csv", "parquet"])
+def _parts(request, tmp_path_factory):
+    """The workshop CSV written as small partitions in each file format."""
+    if request.param == "parquet":
+        pytest.importorskip("pyarrow")
+    target = tmp_path_factory.mktemp(request.param) / "cars.parts"
+    return write_partitions(
+        CSV_PATH, target, chunk_rows=1000, file_format=request.param
+    )
+
+
+@pytest.fixture(name="data")
+def _data(parts):
+    return ChunkedFrame.open(parts, chunk_rows=500)
+
+
+def test_chunks_are_bounded(data, full):
+    """Rows are streamed in chunks of at most `chunk_rows`, all of them once."""
+    sizes = [len(chunk) for chunk in data[["price"]].iter_chunks()]
+    assert max(sizes) <= 500
+    assert sum(sizes) == len(data) == len(full)
+    assert list(data.columns) == list(full.columns)
+
+
+def test_groupby_matches_pandas(data, full):
+    """Partial aggregates merged across chunks equal the in-memory result."""
+    stats = ["count", "sum", "min", "max", "mean", "std"]
+    got = data.groupby(["make", "fuel_type"])[["price", "hp"]].agg(stats)
+    expected = full.groupby(["make", "fuel_type"], observed=True)[["price", "hp"]].agg(
+        stats
+    )
+    np.testing.assert_allclose(
+        got.astype(float).to_numpy(),
+        expected.astype(float).reindex(got.index).to_numpy(),
+    )
+    sizes = data.groupby("fuel_type").size()
+    assert sizes.to_dict() == full.groupby("fuel_type", observed=True).size().to_dict()
+
+
+def test_filters_and_series_aggregates(data, full):
+    """Conditions filter lazily; series aggregates stream one column."""
+    subset = data[(data["price"] > 20000) & (data["init_regist_year"] >= 2015)]
+    expected = full[(full["price"] > 20000) & (full["init_regist_year"] >= 2015)]
+    assert len(subset) == len(expected)
+    assert subset["hp"].mean() == pytest.approx(expected["hp"].mean())
+    assert subset["hp"].std() == pytest.approx(expected["hp"].std())
+    assert len(data.query("make == 'AUDI'")) == (full["make"] == "AUDI").sum()
+
+    counts = data["fuel_type"].value_counts()
+    assert counts.to_dict() == full["fuel_type"].value_counts().to_dict()
+    top = data.nlargest(3, "price")["price"].tolist()
+    assert top == full.nlargest(3, "price")["price"].tolist()
+    described = data.describe()["price"]
+    assert described["mean"] == pytest.approx(full["price"].mean())
+    assert described["50%"] == pytest.approx(full["price"].median())
+
+    with pytest.raises(TypeError):
+        _ = (data["price"] > 1) | (data["hp"] > 1)
+    with pytest.raises(AttributeError, match="to_pandas"):
+        data.pivot_table()
+
+
+def test_parquet_without_pyarrow_fails_loudly(tmp_path, monkeypatch):
+    """The default format never quietly falls back to CSV partitions."""
+    monkeypatch.setattr(out_of_core, "_have_pyarrow", lambda: False)
+    with pytest.raises(ImportError, match="pyarrow"):
+        write_partitions(CSV_PATH, tmp_path / "cars.parts")
+    assert not (tmp_path / "cars.parts").exists()
+
+
+def test_partition_filters_skip_files(tmp_path):
+    """Files whose partition value cannot match are never opened."""
+    parts = write_partitions(CSV_PATH, tmp_path / "cars.parts", file_format="csv")
+    data = ChunkedFrame.open(parts)
+    keep = data[data["init_regist_year"] == 2015]
+    expected = len(keep)
+    for path in parts.iterdir():
+        if path.is_dir() and path.name != "init_regist_year=2015.0":
+            for file in path.iterdir():
+                file.unlink()
+    assert len(keep) == expected > 0
+
+
+def test_app_runs_against_an_out_of_core_dataset(
+    client_step_04, fake_llm, tmp_path, monkeypatch, full
+):
+    """The registry lists .parts directories; questions run on the chunks."""
+    write_partitions(CSV_PATH, tmp_path / "big.parts", chunk_rows=1000)
+    registry = DatasetRegistry(tmp_path)
+    assert registry.names() == ["big"]
+    monkeypatch.setattr(dataset_registry, "_REGISTRY", registry)
+
+    resp = client_step_04.post(
+        "/", data={"prompt": "average price by fuel type", "dataset": "big"}
+    )
+    page = resp.get_data(as_text=True)
+    assert resp.status_code == 200
+    mean = full.groupby("fuel_type", observed=True)["price"].mean().round(2)
+    assert f"{mean['Diesel']:.2f}" in page
+    assert fake_llm.request_count == 0
+    assert isinstance(registry.current("big").frame, ChunkedFrame)
+    assert registry.memory_usage() == {"big": 0}
+
+
+def test_empty_result_keeps_schema(data):
+    """A filter that matches nothing still yields typed, empty results."""
+    empty = data[data["price"] < 0]
+    assert len(empty) == 0
+    assert list(empty.head().columns) == list(data.columns)
+    assert isinstance(empty["price"].value_counts(), pd.Series)
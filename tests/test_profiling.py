@@ -0,0 +1,77 @@
+"""Tests for slow-execution profiling."""
+
+from __future__ import annotations
+
+import pytest
+
+from scientific_programming_workshop.code_exec import execute_user_code
+from scientific_programming_workshop.profiling import get_profile_buffer
+
+SLOW_CODE = (
+    "import time\n"
+    "def busy():\n"
+    "    end = time.perf_counter() + 0.3\n"
+    "    while time.perf_counter() < end:\n"
+    "        pass\n"
+    "busy()\n"
+)
+
+
+@pytest.fixture(name="profiling_on")
+def _profiling_on(monkeypatch):
+    """Profile executions slower than 0.1 s."""
+    monkeypatch.setenv("PROFILE_SLOW_EXEC", "0.1")
+    monkeypatch.setenv("PROFILE_INTERVAL", "0.002")
+    get_profile_buffer().clear()
+    yield
+    get_profile_buffer().clear()
+
+
+def test_fast_execution_is_not_profiled(profiling_on):
+    """Runs under the threshold never carry a profile."""
+    result = execute_user_code(code="print(1)", data=None, plt=None)
+    assert result.profile is None
+
+
+def test_slow_execution_reports_hot_frames_and_lines(profiling_on):
+    """A slow run carries sampled frames pointing at the busy loop."""
+    result = execute_user_code(code=SLOW_CODE, data=None, plt=None)
+
+    profile = result.profile
+    assert profile is not None
+    assert profile.samples > 0
+    assert profile.wall_time >= 0.3
+    assert profile.top_frames[0].function == "busy"
+    assert profile.hot_lines[0][1].split()[0] in ("while", "pass:", "pass")
+
+
+def test_admin_route_lists_slow_profiles(client_step_04, fake_llm, profiling_on):
+    """Slow executions from POST / are listed at /admin/profiles."""
+    fake_llm.answer = f"```python\n{SLOW_CODE}```"
+
+    client_step_04.post("/", data={"prompt": "slow"})
+    resp = client_step_04.get("/admin/profiles")
+
+    assert resp.status_code == 200
+    profiles = resp.get_json()
+    assert len(profiles) == 1
+    assert profiles[0]["top_frames"][0]["function"] == "busy"
+
+
+def test_admin_route_requires_token_when_configured(
+    client_step_04, profiling_on, monkeypatch
+):
+    """With ADMIN_TOKEN set, /admin/profiles needs a matching bearer token."""
+    monkeypatch.setenv("ADMIN_TOKEN", "s3cret")
+
+    assert client_step_04.get("/admin/profiles").status_code == 403
+    resp = client_step_04.get(
+        "/admin/profiles", headers={"Authorization": "Bearer s3cret"}
+    )
+    assert resp.status_code == 200
+
+
+def test_admin_route_is_hidden_when_profiling_is_off(client_step_04, monkeypatch):
+    """Without PROFILE_SLOW_EXEC the admin route doesn't exist."""
+    monkeypatch.delenv("PROFILE_SLOW_EXEC", raising=False)
+    assert client_step_04.get("/admin/profiles").status_code == 404
@@ -0,0 +1,95 @@
+"""Tests for publishing DataFrames to shared memory."""
+
+from __future__ import annotations
+
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from scientific_programming_workshop.data_loading import load_autoscout_data
+from scientific_programming_workshop.executor import ExecLimits, ExecutorPool
+from scientific_programming_workshop.shared_data import attach_frame, publish_frame
+
+
+def _frame() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "price": [100, 200, 300],
+            "hp": [1.5, 2.5, np.nan],
+            "make": pd.Categorical(["AUDI", "BMW", "AUDI"]),
+            "type": ["a", "b", np.nan],  # missing text comes back as NaN
+            "init_regist_dt": pd.to_datetime(["2014-10", "2013-06", "2020-01"]),
+        }
+    )
+
+
+def test_attach_round_trips_values_without_copying():
+    """An attached frame has the published values and shares its buffers."""
+    frame = _frame()
+    handle = publish_frame(frame, "test-round-trip")
+
+    attached = attach_frame(handle)
+
+    pd.testing.assert_frame_equal(attached, frame)
+    assert attached["type"].dtype == object and attached["type"].isna()[2]
+    assert not attached["price"].to_numpy().flags.writeable
+    assert len(pickle.dumps(handle)) < 2_000
+
+
+def test_mutating_an_attached_view_leaves_shared_data_intact():
+    """Copy-on-write keeps snippets from changing the shared buffers."""
+    handle = publish_frame(_frame(), "test-mutation")
+
+    view = attach_frame(handle)
+    view.loc[0, "price"] = -1
+    view["make"] = "VW"
+
+    fresh = attach_frame(handle)
+    assert fresh.loc[0, "price"] == 100
+    assert list(fresh["make"]) == ["AUDI", "BMW", "AUDI"]
+
+
+def test_pool_workers_receive_the_published_frame():
+    """Executor jobs run against the frame behind the handle."""
+    data = load_autoscout_data()
+    handle = publish_frame(data.head(7), "test-pool")
+
+    with ExecutorPool(1, limits=ExecLimits(wall_time=10)) as pool:
+        result = pool.run("print(len(data))", data_handle=handle)
+        mutated = pool.run(
+            "data.loc[0, 'price'] = -1\nprint(data.loc[0, 'price'])",
+            data_handle=handle,
+        )
+        again = pool.run("print(data.loc[0, 'price'] > 0)", data_handle=handle)
+
+    assert result.stdout == "7\n"
+    assert mutated.stdout == "-1\n"
+    assert again.stdout == "True\n"
+
+
+def test_extension_dtypes_survive_the_trip_to_a_worker():
+    """Nullable, string, tz-aware and other pandas dtypes arrive intact."""
+    frame = pd.DataFrame(
+        {
+            "name": pd.array(["a", None, "b"], dtype="string"),
+            "count": pd.array([1, None, 3], dtype="Int64"),
+            "flag": pd.array([True, None, False], dtype="boolean"),
+            "at": pd.to_datetime(["2020-01-01", "2021-06-01", None]).tz_localize(
+                "Europe/Berlin"
+            ),
+            "month": pd.period_range("2020-01", periods=3, freq="M"),
+            "tags": [["x"], [], None],
+        }
+    )
+    handle = publish_frame(frame, "test-extension-dtypes")
+    pd.testing.assert_frame_equal(attach_frame(handle), frame)
+
+    code = "print(dict(data.dtypes.astype(str)))\nprint(data.astype(str).to_json())"
+    with ExecutorPool(1, limits=ExecLimits(wall_time=10)) as pool:
+        result = pool.run(code, data_handle=handle)
+
+    assert not result.error, result.error
+    dtypes, values = result.stdout.splitlines()
+    assert dtypes == str(dict(frame.dtypes.astype(str)))
+    assert values == frame.astype(str).to_json()
@@ -0,0 +1,177 @@
+"""Tests for coalescing identical in-flight requests."""
+
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from scientific_programming_workshop import single_flight
+from scientific_programming_workshop.single_flight import SingleFlight
+
+
+def test_concurrent_callers_share_one_computation():
+    """Callers that overlap with the leader get its result or exception."""
+    flight = SingleFlight()
+    calls = []
+    started = threading.Event()
+
+    def compute():
+        calls.append(1)
+        started.set()
+        time.sleep(0.2)
+        return object()
+
+    with ThreadPoolExecutor(8) as pool:
+        first = pool.submit(flight.run, "k", compute)
+        started.wait()
+        rest = [pool.submit(flight.run, "k", compute) for _ in range(7)]
+        results = {id(future.result()) for future in [first, *rest]}
+    assert len(calls) == 1 and len(results) == 1
+    assert (flight.leaders, flight.followers) == (1, 7)
+
+    def fail():
+        started.set()
+        time.sleep(0.1)
+        raise ValueError("boom")
+
+    started.clear()
+    with ThreadPoolExecutor(2) as pool:
+        futures = [pool.submit(flight.run, "k", fail)]
+        started.wait()
+        futures.append(pool.submit(flight.run, "k", fail))
+        for future in futures:
+            with pytest.raises(ValueError, match="boom"):
+                future.result()
+
+
+def test_async_callers_share_one_computation():
+    """Concurrent tasks with one key await a single computation."""
+    flight = SingleFlight()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return len(calls)
+
+    async def main():
+        return await asyncio.gather(*(flight.run_async("k", compute) for _ in range(5)))
+
+    assert asyncio.run(main()) == [1] * 5
+    assert len(calls) == 1
+
+
+def test_cancelled_async_leader_leaves_the_flight_to_followers():
+    """Followers still get the answer when the caller that started it leaves."""
+    flight = SingleFlight()
+
+    async def compute():
+        await asyncio.sleep(0.2)
+        return 42
+
+    async def main():
+        leader = asyncio.create_task(flight.run_async("k", compute))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(flight.run_async("k", compute))
+        await asyncio.sleep(0.05)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(main()) == 42
+
+
+def _worker(directory, log, barrier, results):
+    def compute():
+        with open(log, "a", encoding="utf-8") as handle:
+            handle.write("computed\n")
+        time.sleep(0.5)
+        return {"answer": 42}
+
+    barrier.wait()
+    results.put(SingleFlight(directory).run("question", compute))
+
+
+def test_workers_share_results_through_the_lock_file(tmp_path):
+    """A second process waits for the first one's result instead of computing."""
+    ctx = multiprocessing.get_context("fork")
+    barrier, results = ctx.Barrier(3), ctx.Queue()
+    log = tmp_path / "log"
+    processes = [
+        ctx.Process(target=_worker, args=(tmp_path / "flights", log, barrier, results))
+        for _ in range(3)
+    ]
+    for process in processes:
+        process.start()
+    answers = [results.get(timeout=10) for _ in processes]
+    for process in processes:
+        process.join(timeout=10)
+    assert answers == [{"answer": 42}] * 3
+    assert log.read_text(encoding="utf-8").count("computed") == 1
+
+
+def test_late_callers_reuse_a_fresh_result(tmp_path):
+    """A result published within `grace` seconds answers new callers."""
+    calls = []
+    first = SingleFlight(tmp_path, grace=0.5)
+    second = SingleFlight(tmp_path, grace=0.5)
+    assert first.run("k", lambda: calls.append(1) or "a") == "a"
+    assert second.run("k", lambda: calls.append(1) or "b") == "a"
+    time.sleep(0.6)
+    assert second.run("k", lambda: calls.append(1) or "c") == "c"
+    assert len(calls) == 2 and second.remote_followers == 1
+
+
+def test_sweep_removes_stale_lock_files_not_in_use(tmp_path):
+    """Old lock files go away unless a flight still holds them."""
+    flight = SingleFlight(tmp_path, grace=0.05, result_ttl=0.1)
+    flight.run("old", lambda: 1)
+    held = single_flight._LockFile(tmp_path, "held")
+    assert held.try_lead()
+    try:
+        time.sleep(0.2)
+        flight.run("new", lambda: 2)
+        names = {path.name for path in tmp_path.iterdir()}
+    finally:
+        held.close()
+    assert "old.lock" not in names and "old.result" not in names
+    assert "held.lock" in names and "new.lock" in names
+
+
+def test_app_coalesces_identical_questions(flask_app_step_04, fake_llm, monkeypatch):
+    """Identical concurrent questions make one model call."""
+    monkeypatch.setenv("INTENT_ROUTER", "off")
+    fake_llm.latency = 0.3
+
+    def ask(_):
+        client = flask_app_step_04.test_client()
+        return client.post("/", data={"prompt": "Tell me about fuel types?"})
+
+    with ThreadPoolExecutor(5) as pool:
+        pages = [resp.get_data(as_text=True) for resp in pool.map(ask, range(5))]
+    assert fake_llm.request_count == 1
+    assert len(set(pages)) == 1 and "Diesel" in pages[0]
+
+
+def test_results_are_only_read_from_a_private_directory(tmp_path, monkeypatch):
+    """A directory others can write to is refused; the default falls back."""
+    shared = tmp_path / "shared"
+    shared.mkdir(mode=0o777)
+    shared.chmod(0o777)
+    with pytest.raises(PermissionError, match="0o700"):
+        SingleFlight(shared)
+
+    monkeypatch.setenv("SINGLE_FLIGHT_DIR", str(shared))
+    with pytest.raises(PermissionError):
+        SingleFlight.from_env()
+    monkeypatch.delenv("SINGLE_FLIGHT_DIR")
+    monkeypatch.setattr(single_flight, "_default_directory", lambda: shared)
+    with pytest.warns(RuntimeWarning, match="across workers"):
+        flight = SingleFlight.from_env()
+    assert flight is not None and flight.directory is None
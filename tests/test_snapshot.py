@@ -0,0 +1,61 @@
+"""Tests for columnar dataset snapshots."""
+
+from __future__ import annotations
+
+import mmap
+
+import numpy as np
+import pandas as pd
+
+from scientific_programming_workshop.data_loading import (
+    DatasetStore,
+    read_autoscout_csv,
+)
+from scientific_programming_workshop.snapshot import build_snapshot, load_snapshot
+
+CSV_TEXT = (
+    "type,make,fuel_type,transmission,dealer_city,init_regist_dt,price\n"
+    "AUDI A5,AUDI,Diesel,Automat,Zürich,2014-10,22500\n"
+    "BMW 320d,BMW,Benzin,Schaltgetriebe,Bern,2013-06,18000\n"
+)
+
+
+def _is_memory_mapped(array: np.ndarray) -> bool:
+    base = array
+    while isinstance(base, np.ndarray):
+        if isinstance(base, np.memmap):
+            return True
+        base = base.base
+    return isinstance(base, mmap.mmap)
+
+
+def test_snapshot_round_trips_typed_frame(tmp_path):
+    """A snapshot reproduces the typed CSV frame exactly."""
+    csv_path = tmp_path / "cars.csv"
+    csv_path.write_text(CSV_TEXT, encoding="utf-8")
+    expected = read_autoscout_csv(csv_path)
+
+    snapshot_dir = build_snapshot(expected, tmp_path / "snap", source_path=csv_path)
+    loaded = load_snapshot(snapshot_dir)
+
+    assert loaded is not None
+    pd.testing.assert_frame_equal(loaded, expected)
+    assert _is_memory_mapped(loaded["price"].to_numpy())
+
+
+def test_store_ignores_snapshot_of_other_source(tmp_path):
+    """A snapshot whose checksum doesn't match the CSV falls back to parsing."""
+    csv_path = tmp_path / "cars.csv"
+    csv_path.write_text(CSV_TEXT, encoding="utf-8")
+    snapshot_dir = build_snapshot(
+        read_autoscout_csv(csv_path), tmp_path / "snap", source_path=csv_path
+    )
+
+    store = DatasetStore(csv_path, snapshot_dir=snapshot_dir)
+    store.get()
+    assert store.from_snapshot
+
+    csv_path.write_text(CSV_TEXT.replace("22500", "21000"), encoding="utf-8")
+    store.clear()
+    assert store.get().loc[0, "price"] == 21000
+    assert not store.from_snapshot
@@ -0,0 +1,158 @@
+"""Tests for the embedded SQL backend."""
+
+from __future__ import annotations
+
+import os
+
+import pandas as pd
+import pytest
+
+from scientific_programming_workshop.code_exec import extract_python_code
+from scientific_programming_workshop.data_loading import load_autoscout_data
+from scientific_programming_workshop.out_of_core import ChunkedFrame, write_partitions
+from scientific_programming_workshop.paths import CSV_PATH
+from scientific_programming_workshop.plotting import plt
+from scientific_programming_workshop.sql_engine import (
+    SqlSession,
+    get_sql_sessions,
+    sql_globals,
+)
+
+QUERY = (
+    "SELECT make, COUNT(*) AS n, AVG(price) AS price FROM data "
+    "GROUP BY make ORDER BY n DESC, make LIMIT 5"
+)
+
+
+@pytest.fixture(name="sql_backend")
+def _sql_backend(monkeypatch):
+    monkeypatch.setenv("QUERY_BACKEND", "sql")
+    monkeypatch.setenv("SQL_ENGINE", "sqlite")
+    monkeypatch.setenv("INTENT_ROUTER", "off")
+    yield get_sql_sessions()
+    get_sql_sessions().close()
+
+
+def _expected(data: pd.DataFrame) -> pd.DataFrame:
+    grouped = data.groupby("make", observed=True)["price"].agg(["size", "mean"])
+    grouped = grouped.reset_index().sort_values(["size", "make"], ascending=[0, 1])
+    return grouped.head(5)
+
+
+@pytest.fixture(name="engine", params=["sqlite", "duckdb"])
+def _engine(request):
+    if request.param == "duckdb":
+        pytest.importorskip("duckdb")
+    return request.param
+
+
+def test_session_matches_pandas(engine):
+    """A query on the registered frame gives the pandas answer."""
+    data = load_autoscout_data()
+    session = SqlSession(engine, data)
+    result = session.query(QUERY)
+    expected = _expected(data)
+    assert result["make"].tolist() == expected["make"].tolist()
+    assert result["n"].tolist() == expected["size"].tolist()
+    assert result["price"].tolist() == pytest.approx(expected["mean"].tolist())
+
+    with pytest.raises(ValueError, match="only runs SELECT"):
+        session.query("DROP TABLE data")
+    with pytest.raises(ValueError, match="SQL error"):
+        session.query("SELECT nope FROM data")
+    session.close()
+
+
+def test_changes_to_data_do_not_reach_sql(monkeypatch, engine):
+    """Code that overwrites a column of `data` still queries the dataset."""
+    monkeypatch.setenv("QUERY_BACKEND", "sql")
+    monkeypatch.setenv("SQL_ENGINE", engine)
+    frame = load_autoscout_data()
+    expected = frame["price"].mean()
+    try:
+        for _ in range(2):
+            data = frame.copy(deep=False)
+            sql = sql_globals("cars", data)["sql"]
+            data["price"] = 0
+            result = sql("SELECT AVG(price) AS price FROM data")
+            assert result["price"][0] == pytest.approx(expected)
+    finally:
+        get_sql_sessions().close()
+
+
+def test_out_of_core_dataset_spills_to_a_file(tmp_path, engine):
+    """Partitions are copied chunk by chunk into a temporary database."""
+    data = ChunkedFrame.open(
+        write_partitions(CSV_PATH, tmp_path / "cars.parts", file_format="csv"),
+        chunk_rows=1000,
+    )
+    session = SqlSession(engine, data)
+    assert session.query("SELECT COUNT(*) AS n FROM data")["n"][0] == len(data)
+    path = session._path  # pylint: disable=protected-access
+    assert path is not None and os.path.exists(path)
+    session.close()
+    assert not os.path.exists(path)
+
+
+@pytest.mark.parametrize("out_of_core", [False, True])
+def test_only_a_single_read_only_query_runs(tmp_path, engine, out_of_core):
+    """Stacked statements, writes and file access are refused."""
+    data = load_autoscout_data()
+    if out_of_core:
+        parts = write_partitions(CSV_PATH, tmp_path / "p.parts", file_format="csv")
+        data = ChunkedFrame.open(parts)
+    session = SqlSession(engine, data)
+    try:
+        for query in (
+            "SELECT 1; CREATE TABLE evil AS SELECT 42 x",
+            "SELECT 1; DROP TABLE data",
+            "SELECT * FROM read_csv('/etc/hostname')",
+            "SELECT * FROM evil",
+        ):
+            with pytest.raises(ValueError):
+                session.query(query)
+        assert session.query("SELECT COUNT(*) AS n FROM data")["n"][0] == len(data)
+    finally:
+        session.close()
+
+
+def test_sql_blocks_become_sql_calls():
+    """A ```sql answer is run through `sql()` and printed."""
+    code = extract_python_code("Here:\n```sql\nSELECT 1 AS one\n```")
+    assert code == (
+        "result = sql('SELECT 1 AS one')\nprint(result.to_string(index=False))"
+    )
+    assert extract_python_code("```python\nprint(1)\n```") == "print(1)"
+
+
+def test_app_asks_for_sql_and_runs_it(client_step_04, fake_llm, sql_backend):
+    """With QUERY_BACKEND=sql the prompt offers `sql()` and answers use it."""
+    prompts: list[str] = []
+
+    def answer(prompt: str) -> str:
+        prompts.append(prompt)
+        return f"```sql\n{QUERY}\n```"
+
+    fake_llm.answer = answer
+    resp = client_step_04.post("/", data={"prompt": "which makes are common?"})
+    page = resp.get_data(as_text=True)
+    assert resp.status_code == 200
+    assert "SQLite SQL query" in prompts[0]
+    top = _expected(load_autoscout_data())["make"].iloc[0]
+    assert f"{top} " in page and "Error executing code" not in page
+    assert [count for _, count in sql_backend.stats()] == [1]
+
+
+def test_sql_is_only_offered_when_enabled(monkeypatch):
+    """Without QUERY_BACKEND=sql generated code gets no `sql()`."""
+    from scientific_programming_workshop.executor import run_code
+
+    monkeypatch.delenv("QUERY_BACKEND", raising=False)
+    assert get_sql_sessions() is None
+    result = run_code(
+        code="print(sql('SELECT 1'))",
+        data=load_autoscout_data(),
+        plt=plt,
+        fingerprint="f",
+    )
+    assert "sql" in result.error
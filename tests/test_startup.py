@@ -0,0 +1,49 @@
+"""Tests for lazy imports and the preforking warm-up."""
+
+from __future__ import annotations
+
+import json
+import runpy
+import subprocess
+import sys
+from pathlib import Path
+
+from scientific_programming_workshop import plotting
+from scientific_programming_workshop.startup import warm_up
+
+ROOT = Path(__file__).resolve().parents[1]
+
+CHECK_IMPORTS = """
+import json, sys
+import app_step_04
+heavy = ["matplotlib.pyplot", "openai", "duckdb"]
+print(json.dumps([name for name in heavy if name in sys.modules]))
+"""
+
+
+def test_importing_the_app_defers_heavy_modules():
+    """pyplot, openai and duckdb are not imported until first used."""
+    output = subprocess.run(
+        [sys.executable, "-c", CHECK_IMPORTS],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    assert json.loads(output) == []
+
+
+def test_warm_up_loads_pyplot_and_modules():
+    """Warm-up imports pyplot and the listed modules and times each step."""
+    timings = warm_up(modules=["json"], dataset=False, freeze=False)
+    assert list(timings) == ["pyplot", "fonts", "openai", "json"]
+    assert "not loaded" not in repr(plotting.plt)
+    assert plotting.plt.get_backend().lower() == "agg"
+
+
+def test_gunicorn_config_preloads_by_default(monkeypatch):
+    """`preload_app` is on unless GUNICORN_PRELOAD turns it off."""
+    config = ROOT / "gunicorn.conf.py"
+    assert runpy.run_path(str(config))["preload_app"] is True
+    monkeypatch.setenv("GUNICORN_PRELOAD", "0")
+    assert runpy.run_path(str(config))["preload_app"] is False
@@ -0,0 +1,167 @@
+"""Tests for the async (Quart) step 04 app."""
+
+from __future__ import annotations
+
+import asyncio
+import importlib
+import json
+import time
+
+import pytest
+
+
+@pytest.fixture(name="async_app")
+def _async_app():
+    """Create a Quart app instance for the async step 04 app."""
+    module = importlib.import_module(
+        "scientific_programming_workshop.apps.step_04_async"
+    )
+    app = module.create_app()
+    app.config.update(TESTING=True)
+    return app
+
+
+def _post(app, path: str, prompt: str) -> tuple[int, str, str]:
+    async def go():
+        response = await app.test_client().post(path, form={"prompt": prompt})
+        body = await response.get_data(as_text=True)
+        return response.status_code, response.mimetype, body
+
+    return asyncio.run(go())
+
+
+def test_async_index_answers_and_executes(async_app, fake_llm):
+    """POST / awaits the model, runs the code off-loop and renders output."""
+    fake_llm.answer = "```python\nprint(len(data) > 0)\n```"
+
+    status, _, body = _post(async_app, "/", "rows?")
+
+    assert status == 200
+    assert "print(len(data) &gt; 0)" in body
+    assert "True" in body
+    assert fake_llm.request_count == 1
+
+
+def test_async_index_reports_stage_timings(async_app, fake_llm, monkeypatch):
+    """POST / sends Server-Timing and feeds the stage histograms."""
+    from scientific_programming_workshop.metrics import get_metrics
+    from scientific_programming_workshop.timing import parse_server_timing
+
+    metrics = get_metrics()
+    monkeypatch.setattr(metrics, "enabled", True)
+    monkeypatch.setenv("INTENT_ROUTER", "off")
+    fake_llm.answer = "```python\nprint(4)\n```"
+    before = metrics.stage_seconds.count("llm")
+
+    async def go():
+        return await async_app.test_client().post("/", form={"prompt": "four"})
+
+    response = asyncio.run(go())
+
+    timings = parse_server_timing(response.headers["Server-Timing"])
+    assert {"load", "route", "llm", "exec", "render"} <= set(timings)
+    assert metrics.stage_seconds.count("llm") == before + 1
+
+
+def test_async_stream_emits_code_and_output(async_app, fake_llm):
+    """POST /stream streams tokens, code and stdout as SSE."""
+    fake_llm.answer = "Sure:\n```python\nprint('hi')\n```\nDone."
+
+    status, mimetype, body = _post(async_app, "/stream", "hello")
+
+    assert status == 200
+    assert mimetype == "text/event-stream"
+    events = [
+        (name.removeprefix("event: "), json.loads(data[6:]))
+        for name, data in (m.split("\n", 1) for m in body.strip().split("\n\n"))
+    ]
+    tokens = "".join(data for name, data in events if name == "token")
+    assert tokens == fake_llm.answer
+    assert ("code", "print('hi')") in events
+    assert ("stdout", "hi\n") in events
+    assert events[-1] == ("done", {})
+
+
+def test_async_identical_streams_share_one_answer(async_app, fake_llm, monkeypatch):
+    """Concurrent identical streams make one model call; followers replay it."""
+    monkeypatch.setenv("INTENT_ROUTER", "off")
+    fake_llm.answer = "```python\nprint('hi')\n```"
+    fake_llm.latency = 0.3
+
+    async def go():
+        client = async_app.test_client()
+        responses = await asyncio.gather(
+            *(client.post("/stream", form={"prompt": "hello"}) for _ in range(4))
+        )
+        return [await response.get_data(as_text=True) for response in responses]
+
+    bodies = asyncio.run(go())
+    assert fake_llm.request_count == 1
+    for body in bodies:
+        assert 'event: stdout\ndata: "hi\\n"' in body
+        assert body.endswith("event: done\ndata: {}\n\n")
+
+
+def test_async_requests_overlap_on_one_event_loop(async_app, fake_llm):
+    """Concurrent requests wait on the model together, not one after another."""
+    fake_llm.answer = "```python\nprint(1)\n```"
+    fake_llm.latency = 0.3
+
+    async def go():
+        client = async_app.test_client()
+        prompts = [f"question {i}" for i in range(4)]
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        responses = await asyncio.gather(
+            *(client.post("/", form={"prompt": p}) for p in prompts)
+        )
+        return loop.time() - start, [r.status_code for r in responses]
+
+    elapsed, statuses = asyncio.run(go())
+
+    assert statuses == [200] * 4
+    assert elapsed < 4 * 0.3
+
+
+def test_async_blocking_steps_run_off_the_event_loop(async_app, fake_llm, monkeypatch):
+    """Slow synchronous steps (here intent routing) do not stall other requests."""
+    module = importlib.import_module(
+        "scientific_programming_workshop.apps.step_04_async"
+    )
+
+    def slow_route(*args, **kwargs):
+        time.sleep(0.3)
+
+    monkeypatch.setattr(module, "route_from_env", slow_route)
+    fake_llm.answer = "```python\nprint(1)\n```"
+
+    async def go():
+        client = async_app.test_client()
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await asyncio.gather(
+            *(client.post("/", form={"prompt": f"q{i}"}) for i in range(4))
+        )
+        return loop.time() - start
+
+    assert asyncio.run(go()) < 4 * 0.3
+
+
+def test_async_jobs_run_off_the_event_loop(async_app, fake_llm, monkeypatch, tmp_path):
+    """POST /jobs returns 202 at once; polling the job yields the result."""
+    monkeypatch.setenv("JOB_DB", str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setenv("INTENT_ROUTER", "off")
+    fake_llm.answer = "```python\nprint('from a job')\n```"
+
+    async def go():
+        client = async_app.test_client()
+        response = await client.post("/jobs", form={"prompt": "job?"})
+        assert response.status_code == 202
+        for _ in range(200):
+            job = await (await client.get(response.headers["Location"])).get_json()
+            if job["status"] == "done":
+                return job
+            await asyncio.sleep(0.05)
+        return job
+
+    assert asyncio.run(go())["result"]["output"] == "from a job\n"
@@ -2,6 +2,8 @@
 
 from __future__ import annotations
 
+from scientific_programming_workshop.timing import STAGES, parse_server_timing
+
 
 def test_index_get_ok(client_step_04):
     """The index route renders successfully."""
@@ -19,3 +21,14 @@ def test_questions_get_ok(client_step_04):
     """The questions page renders successfully."""
     resp = client_step_04.get("/questions")
     assert resp.status_code == 200
+
+
+def test_index_post_reports_stage_timings(client_step_04, fake_llm):
+    """POST / reports per-stage durations in a Server-Timing header."""
+    fake_llm.answer = "```python\nprint(1)\n```"
+    resp = client_step_04.post("/", data={"prompt": "one"})
+
+    assert resp.status_code == 200
+    timings = parse_server_timing(resp.headers["Server-Timing"])
+    assert set(timings) == set(STAGES)
+    assert all(duration >= 0 for duration in timings.values())
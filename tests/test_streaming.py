@@ -0,0 +1,87 @@
+"""Tests for streaming answers over server-sent events."""
+
+from __future__ import annotations
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from scientific_programming_workshop.code_exec import (
+    CodeBlockScanner,
+    execute_user_code,
+)
+from scientific_programming_workshop.plotting import plt
+
+
+def _events(body: str) -> list[tuple[str, object]]:
+    events = []
+    for message in body.strip().split("\n\n"):
+        name, data = message.split("\n", 1)
+        events.append((name.removeprefix("event: "), json.loads(data[6:])))
+    return events
+
+
+def test_code_block_scanner_returns_code_once_fence_closes():
+    """The code is available as soon as the closing fence has streamed."""
+    scanner = CodeBlockScanner()
+    chunks = ["Here:\n``", "`python\nprint(1)\n", "``", "`\nDone."]
+
+    results = [scanner.feed(chunk) for chunk in chunks]
+
+    assert results == [None, None, None, "print(1)"]
+    assert scanner.finish() == "print(1)"
+
+
+def test_execute_user_code_reports_lines_as_printed():
+    """`on_output` receives each stdout line, including a trailing partial one."""
+    lines: list[str] = []
+    result = execute_user_code(
+        code="print('a')\nprint('b', end='')",
+        data=None,
+        plt=plt,
+        on_output=lines.append,
+    )
+    assert lines == ["a\n", "b"]
+    assert result.stdout == "a\nb"
+
+
+def test_stream_route_emits_tokens_code_and_output(client_step_04, fake_llm):
+    """POST /stream returns tokens, the code and its stdout as SSE."""
+    fake_llm.answer = "Sure:\n```python\nprint(len(data) > 0)\n```\nThat's it."
+
+    resp = client_step_04.post("/stream", data={"prompt": "rows?"})
+
+    assert resp.status_code == 200
+    assert resp.mimetype == "text/event-stream"
+    events = _events(resp.get_data(as_text=True))
+    names = [name for name, _ in events]
+    tokens = "".join(data for name, data in events if name == "token")
+    assert tokens == fake_llm.answer
+    assert ("code", "print(len(data) > 0)") in events
+    assert ("stdout", "True\n") in events
+    assert names[-1] == "done"
+    assert names.index("code") < max(
+        i for i, name in enumerate(names) if name == "token"
+    )
+
+
+def test_identical_streams_share_one_answer(flask_app_step_04, fake_llm, monkeypatch):
+    """Concurrent identical streams make one model call; followers replay it."""
+    monkeypatch.setenv("INTENT_ROUTER", "off")
+    fake_llm.answer = "```python\nprint(len(data) > 0)\nplt.plot([1, 2])\n```"
+    fake_llm.latency = 0.3
+
+    def ask(_):
+        client = flask_app_step_04.test_client()
+        resp = client.post("/stream", data={"prompt": "rows and a plot?"})
+        return _events(resp.get_data(as_text=True))
+
+    with ThreadPoolExecutor(4) as pool:
+        streams = list(pool.map(ask, range(4)))
+    assert fake_llm.request_count == 1
+    for events in streams:
+        assert "".join(data for name, data in events if name == "token") == (
+            fake_llm.answer
+        )
+        assert ("stdout", "True\n") in events
+        assert [name for name, _ in events].count("graphic") == 1
+        assert events[-1] == ("done", {})